@@ -1,13 +1,36 @@
+import logging
+
 from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
+from app import tracing
+from app.admission import make_admission_control
+from app.chat_sessions import make_session_manager
+from app.coalescing import make_request_coalescer
+from app.response_cache import make_response_cache
+from app.thread_pool import make_thread_pool
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     CORS(app)
     app.config.from_object(config_class)
+    logging.basicConfig(level=app.config['LOG_LEVEL'],
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    # One line per OpenAI request is too much below DEBUG
+    if logging.getLogger().getEffectiveLevel() > logging.DEBUG:
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+    tracing.configure(app.config['CHAT_TRACE_FILE'])
+    if app.config['TRUSTED_PROXIES']:
+        # request.remote_addr is then the client, for per-client rate limits
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
     
-    from app.routes import main
+    from app.routes import client, context_prompt, main, mesh_manager
     app.register_blueprint(main)
+    app.extensions['response_cache'] = make_response_cache(app.config, mesh_manager)
+    app.extensions['chat_sessions'] = make_session_manager(app.config)
+    app.extensions['admission'] = make_admission_control(app.config)
+    app.extensions['request_coalescer'] = make_request_coalescer(app.config, mesh_manager)
+    app.extensions['thread_pool'] = make_thread_pool(app.config, client, context_prompt, mesh_manager)
     
     return app
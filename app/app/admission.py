@@ -0,0 +1,318 @@
+# admission.py
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import logging
+import math
+import threading
+import time
+
+import openai
+
+from app.tracing import record
+
+logger = logging.getLogger(__name__)
+
+# Weight of the latest model turn in the running average used for Retry-After
+TURN_SECONDS_WEIGHT = 0.2
+
+
+class Overloaded(Exception):
+    """A chat turn turned away; retry_after is in whole seconds"""
+
+    def __init__(self, reason, retry_after, status=429):
+        super().__init__(f"Too many chat requests ({reason}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+        self.status = status
+
+
+def out_of_quota(error):
+    return isinstance(error, openai.RateLimitError) and getattr(error, 'code', None) == 'insufficient_quota'
+
+
+def upstream_overload(error):
+    """Overloaded for an OpenAI 429 or 5xx the client's own retries didn't get past, else None"""
+    if isinstance(error, openai.RateLimitError) and not out_of_quota(error):
+        reason, status = 'openai_rate_limit', 429
+    elif isinstance(error, openai.InternalServerError):
+        reason, status = 'openai_unavailable', 503
+    else:
+        return None
+    response = getattr(error, 'response', None)
+    try:
+        retry_after = float(response.headers.get('retry-after')) if response is not None else None
+    except (TypeError, ValueError):
+        retry_after = None
+    return Overloaded(reason, max(1, math.ceil(retry_after or 1)), status)
+
+
+def upstream_failure(error):
+    """Message for an OpenAI failure that retrying soon won't fix, else None.
+
+    Unreachable API (DNS, network, proxy settings) or a billing quota used
+    up: reported as a 502 without Retry-After, not as backpressure.
+    """
+    if isinstance(error, openai.APIConnectionError):
+        return "Could not reach the OpenAI API"
+    if out_of_quota(error):
+        return "The OpenAI account has run out of quota"
+    return None
+
+
+class TokenBucket:
+    """rate tokens a second, up to burst saved up"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """0 if a token was taken, else seconds until there is one"""
+        # now can predate a bucket made for the same turn
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def give_back(self):
+        """Return a token taken for a turn that was turned away after all"""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class _Waiter:
+    def __init__(self):
+        self.granted = False
+        self.event = threading.Event()
+
+    def wake(self):
+        self.event.set()
+
+
+class _AsyncWaiter:
+    def __init__(self):
+        self.granted = False
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Slot:
+    """A model turn's place among the running ones; release it exactly once, when the turn ends"""
+
+    def __init__(self, admission):
+        self.admission = admission
+        self.admitted = time.perf_counter()
+        self.released = False
+
+    def release(self):
+        with self.admission.lock:
+            if self.released:
+                return
+            self.released = True
+        self.admission._release(time.perf_counter() - self.admitted)
+
+
+class AdmissionControl:
+    """Backpressure in front of model turns.
+
+    A turn needs a token from its client's bucket and from the global one,
+    then one of ``max_running`` slots. Without a free slot it waits in a
+    queue of at most ``max_queue`` turns for up to ``queue_timeout``
+    seconds. Whatever doesn't fit is turned away at once with Overloaded,
+    so an overloaded worker answers "retry in N seconds" quickly instead
+    of letting every turn get slower. A limit of 0 turns that check off.
+    """
+
+    def __init__(self, client_rate=0.5, client_burst=10, global_rate=10.0, global_burst=60,
+                 max_running=64, max_queue=128, queue_timeout=10.0, max_clients=10000):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst) if global_rate > 0 else None
+        self.max_running = max_running
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self.clients = OrderedDict()  # client id -> TokenBucket, least recently seen first
+        self.queue = deque()
+        self.running = 0
+        self.turn_seconds = 1.0
+        self.admitted = 0
+        self.queued = 0
+        self.waited = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.rejected = {}
+        self.lock = threading.Lock()
+
+    def _reject(self, reason, retry_after, status):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return Overloaded(reason, max(1, math.ceil(retry_after)), status)
+
+    def _refund(self, client_id):
+        """Give back the tokens of a turn that was turned away after taking them"""
+        bucket = self.clients.get(client_id) if self.client_rate > 0 else None
+        if bucket is not None:
+            bucket.give_back()
+        if self.global_bucket is not None:
+            self.global_bucket.give_back()
+
+    def _client_bucket(self, client_id):
+        bucket = self.clients.get(client_id)
+        if bucket is None:
+            bucket = self.clients[client_id] = TokenBucket(self.client_rate, self.client_burst)
+            if len(self.clients) > self.max_clients:
+                self.clients.popitem(last=False)
+        else:
+            self.clients.move_to_end(client_id)
+        return bucket
+
+    def _queue_estimate(self):
+        """Seconds until a turn queued now would likely get a slot"""
+        return self.turn_seconds * (len(self.queue) + 1) / max(self.max_running, 1)
+
+    def _enter(self, client_id, make_waiter):
+        """None if the turn may start now, else the waiter it queues as"""
+        now = time.monotonic()
+        with self.lock:
+            if self.client_rate > 0:
+                bucket = self._client_bucket(client_id)
+                wait = bucket.take(now)
+                if wait:
+                    raise self._reject('client_rate', wait, 429)
+            if self.global_bucket is not None:
+                wait = self.global_bucket.take(now)
+                if wait:
+                    if self.client_rate > 0:
+                        bucket.give_back()
+                    raise self._reject('global_rate', wait, 429)
+            if self.max_running <= 0 or self.running < self.max_running:
+                self.running += 1
+                self.admitted += 1
+                return None
+            if len(self.queue) >= self.max_queue:
+                # Retrying during an overload shouldn't also use up the client's rate budget
+                self._refund(client_id)
+                raise self._reject('queue_full', self._queue_estimate(), 503)
+            waiter = make_waiter()
+            self.queue.append(waiter)
+            self.queued += 1
+            return waiter
+
+    def _waited(self, client_id, waiter, started):
+        """Account for a queued turn that was woken or timed out; raises if it never got a slot"""
+        seconds = time.perf_counter() - started
+        with self.lock:
+            if not waiter.granted:
+                self.queue.remove(waiter)
+                self._refund(client_id)
+                raise self._reject('queue_timeout', self._queue_estimate(), 503)
+            self.admitted += 1
+            self.waited += 1
+            self.queue_seconds += seconds
+            self.max_queue_seconds = max(self.max_queue_seconds, seconds)
+        record('admission_queue', seconds, queued=len(self.queue))
+
+    def _abandon(self, waiter):
+        """A queued turn went away (the client disconnected); pass on its slot if it got one"""
+        with self.lock:
+            if not waiter.granted:
+                self.queue.remove(waiter)
+                return
+        self._release(0.0, record=False)
+
+    def _release(self, seconds, record=True):
+        with self.lock:
+            if record:
+                self.turn_seconds += TURN_SECONDS_WEIGHT * (seconds - self.turn_seconds)
+            if self.queue:
+                # The slot goes straight to the longest waiting turn
+                waiter = self.queue.popleft()
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self.running -= 1
+
+    def acquire(self, client_id):
+        """Slot for a model turn, after queueing for one if need be; raises Overloaded if turned away"""
+        started = time.perf_counter()
+        waiter = self._enter(client_id, _Waiter)
+        if waiter is not None:
+            waiter.event.wait(self.queue_timeout)
+            self._waited(client_id, waiter, started)
+        return Slot(self)
+
+    async def acquire_async(self, client_id):
+        """acquire() that waits on the event loop"""
+        started = time.perf_counter()
+        waiter = self._enter(client_id, _AsyncWaiter)
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                self._abandon(waiter)
+                raise
+            self._waited(client_id, waiter, started)
+        return Slot(self)
+
+    @contextmanager
+    def admit(self, client_id):
+        """Hold a slot for the body; raises Overloaded if the turn is turned away"""
+        slot = self.acquire(client_id)
+        try:
+            yield
+        finally:
+            slot.release()
+
+    @asynccontextmanager
+    async def admit_async(self, client_id):
+        """admit() that waits on the event loop"""
+        slot = await self.acquire_async(client_id)
+        try:
+            yield
+        finally:
+            slot.release()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "running": self.running,
+                "queued_now": len(self.queue),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "mean_queue_ms": round(self.queue_seconds * 1000 / self.waited, 1) if self.waited else 0.0,
+                "max_queue_ms": round(self.max_queue_seconds * 1000, 1),
+                "rejected": dict(self.rejected),
+                "turn_seconds": round(self.turn_seconds, 3),
+                "clients": len(self.clients),
+            }
+
+
+def make_admission_control(config):
+    """AdmissionControl from the CHAT_RATE_* and CHAT_*QUEUE* settings, or None if every limit is 0"""
+    client_rate = config['CHAT_RATE_LIMIT_PER_CLIENT'] / 60
+    global_rate = config['CHAT_RATE_LIMIT_GLOBAL'] / 60
+    if not (client_rate or global_rate or config['CHAT_MAX_RUNNING']):
+        return None
+    return AdmissionControl(
+        client_rate=client_rate,
+        client_burst=config['CHAT_RATE_BURST_PER_CLIENT'],
+        global_rate=global_rate,
+        global_burst=config['CHAT_RATE_BURST_GLOBAL'],
+        max_running=config['CHAT_MAX_RUNNING'],
+        max_queue=config['CHAT_MAX_QUEUE'],
+        queue_timeout=config['CHAT_QUEUE_TIMEOUT']
+    )
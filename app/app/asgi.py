@@ -0,0 +1,227 @@
+# asgi.py
+"""ASGI entry point.
+
+/api/chat is served natively on asyncio with one shared, pooled AsyncOpenAI
+client, so a single worker process can hold hundreds of in-flight runs
+instead of one per WSGI thread. Every other route is delegated to the
+Flask app unchanged.
+
+    uvicorn app.asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+from contextlib import nullcontext
+import json
+import logging
+import os
+import time
+
+import httpx
+from asgiref.wsgi import WsgiToAsgi
+from openai import AsyncOpenAI
+
+from app import create_app, routes
+from app.admission import upstream_failure
+from app.assistant_runs import RunRecord, async_poll_run, async_stream_run
+from app.tracing import span, trace_turn
+
+logger = logging.getLogger(__name__)
+
+flask_app = create_app()
+
+# One connection pool for every chat handled by this process
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=flask_app.config['OPENAI_MAX_CONNECTIONS'],
+        max_keepalive_connections=flask_app.config['OPENAI_MAX_CONNECTIONS']
+    ),
+    timeout=httpx.Timeout(60.0, connect=5.0)
+)
+async_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), http_client=http_client,
+                           max_retries=flask_app.config['OPENAI_MAX_RETRIES'])
+
+
+async def chat_turn(message, thread_id, client_id=None):
+    """Async version of routes.chat(); returns (payload, status)"""
+    await asyncio.to_thread(routes.mesh_manager.maybe_refresh)
+    with trace_turn('chat_async') as trace:
+        return await traced_chat_turn(message, thread_id, trace, client_id)
+
+
+async def start_turn(thread_id, message, sessions=None, pool=None):
+    """routes.start_turn on the async client"""
+    # Session and pool bookkeeping takes locks shared with the WSGI worker threads
+    turn = await asyncio.to_thread(routes.TurnStart, thread_id, message, sessions, pool)
+    if not turn.thread_id:
+        # Only does I/O when the assistant needs syncing to a new catalog version
+        with span('context_upload'):
+            initial_messages = await asyncio.to_thread(
+                routes.context_prompt.thread_messages, flask_app.config['CHAT_CONTEXT_MODE'])
+        messages = turn.thread_messages(initial_messages)
+        with span('thread_create', context_messages=len(initial_messages), rolled=turn.rolled):
+            thread = await async_client.beta.threads.create(messages=messages)
+        await asyncio.to_thread(turn.thread_created, thread.id, messages)
+        return turn.thread_id
+
+    with span('message_create'):
+        await async_client.beta.threads.messages.create(
+            thread_id=turn.thread_id,
+            role="user",
+            content=message
+        )
+    await asyncio.to_thread(turn.message_added)
+    return turn.thread_id
+
+
+async def traced_chat_turn(message, thread_id, trace, client_id=None):
+    started = time.perf_counter()
+    try:
+        sessions = flask_app.extensions['chat_sessions']
+        cache = flask_app.extensions['response_cache']
+        # Cache backends may be remote and the fast path looks up the catalog
+        response_data, path = await asyncio.to_thread(
+            routes.answer_locally, flask_app.config, message, thread_id, sessions, cache)
+        if response_data is not None:
+            trace.attributes['path'] = path
+            return response_data, 200
+        new_conversation = not thread_id
+        catalog_version = routes.mesh_manager.version
+        admission = flask_app.extensions['admission']
+
+        async def model_turn():
+            nonlocal thread_id
+            async with (admission.admit_async(client_id) if admission is not None else nullcontext()):
+                thread_id = await start_turn(thread_id, message, sessions, flask_app.extensions['thread_pool'])
+
+                record = RunRecord()
+                if flask_app.config['CHAT_STREAMING']:
+                    run = await async_stream_run(async_client, thread_id, routes.ASSISTANT_ID,
+                                                 routes.start_tool_call, record, routes.run_options(sessions))
+                else:
+                    run = await async_poll_run(async_client, thread_id, routes.ASSISTANT_ID,
+                                               routes.start_tool_call, record=record,
+                                               run_options=routes.run_options(sessions))
+
+                if run.status != 'completed':
+                    trace.attributes['status'] = run.status
+                    return {
+                        "error": f"Run failed with status: {run.status}",
+                        "thread_id": thread_id
+                    }, 500
+
+                messages = record.messages[::-1]
+                if not messages:
+                    with span('messages_list'):
+                        messages = (await async_client.beta.threads.messages.list(
+                            thread_id=thread_id, run_id=run.id, order='desc', limit=1)).data
+                response_data = routes.model_response(record, messages, run.id, thread_id)
+                await asyncio.to_thread(routes.finish_turn, message, response_data, started, sessions, cache,
+                                        catalog_version if new_conversation else None)
+                return response_data, 200
+
+        coalescer = flask_app.extensions['request_coalescer']
+        if coalescer is not None and new_conversation:
+            # Identical first messages already being answered share that run
+            payload, status, coalesced = await coalescer.run_async(message, catalog_version, model_turn)
+            if coalesced:
+                trace.attributes['path'] = 'coalesced'
+            return payload, status
+        return await model_turn()
+
+    except Exception as e:
+        overload = routes.turned_away(e)
+        if overload is not None:
+            logger.warning("Chat turn turned away: %s", overload)
+            trace.attributes['status'] = overload.reason
+            return {
+                "error": str(overload),
+                "retry_after": overload.retry_after,
+                "thread_id": thread_id
+            }, overload.status
+        failure = upstream_failure(e)
+        if failure is not None:
+            logger.error("Chat turn failed upstream: %s", e)
+            trace.attributes['status'] = 'upstream_error'
+            return {"error": failure, "thread_id": thread_id}, 502
+        logger.exception("Error in async chat endpoint")
+        trace.attributes['status'] = 'error'
+        return {
+            "error": str(e),
+            "thread_id": thread_id
+        }, 500
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        event = await receive()
+        body += event.get('body', b'')
+        if not event.get('more_body'):
+            return body
+
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload).encode()
+    headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode()),
+        # Matches the blanket CORS(app) on the Flask side
+        (b'access-control-allow-origin', b'*'),
+    ]
+    if 'retry_after' in payload:
+        headers.append((b'retry-after', str(payload['retry_after']).encode()))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def client_id(scope):
+    """routes.requester_id() for an ASGI scope"""
+    header = flask_app.config['CHAT_CLIENT_ID_HEADER'].lower().encode('latin-1')
+    for name, value in scope.get('headers', []) if header else []:
+        if name == header and value:
+            return value.decode('latin-1')
+    # With --forwarded-allow-ips, uvicorn has already put the forwarded address here
+    client = scope.get('client')
+    return client[0] if client else None
+
+
+class ChatApplication:
+    """Routes /api/chat to the asyncio handler and everything else to Flask"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi = WsgiToAsgi(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == '/api/chat':
+            return await self.chat(scope, receive, send)
+        return await self.wsgi(scope, receive, send)
+
+    async def chat(self, scope, receive, send):
+        try:
+            body = json.loads(await read_body(receive) or b'{}')
+        except ValueError:
+            return await send_json(send, {"error": "Invalid JSON body", "thread_id": None}, 400)
+        try:
+            message, thread_id = routes.chat_request(body)
+        except ValueError as e:
+            return await send_json(send, {"error": str(e), "thread_id": None}, 400)
+        payload, status = await chat_turn(message, thread_id, client_id(scope))
+        await send_json(send, payload, status)
+
+    async def lifespan(self, receive, send):
+        while True:
+            event = await receive()
+            if event['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif event['type'] == 'lifespan.shutdown':
+                await http_client.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = ChatApplication(flask_app)
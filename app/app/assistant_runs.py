@@ -0,0 +1,253 @@
+# assistant_runs.py
+import asyncio
+import time
+
+from openai import AssistantEventHandler, AsyncAssistantEventHandler
+
+from app.tracing import record as record_phase, span
+
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled', 'expired', 'incomplete')
+
+def record_events(events, opened, first_phase, record=None):
+    """Pass stream events through, timing the wait for each one.
+
+    The wait for the first event is first_phase (the run being created, or
+    tool outputs being accepted); later waits are stream_event phases.
+    Text deltas only go to the histogram, not the trace.
+    """
+    waited, phase = opened, first_phase
+    for event in events:
+        now = time.perf_counter()
+        record_phase(phase, now - waited, waited, traced=not event.event.endswith('.delta'), event=event.event)
+        if record is not None and event.event == 'thread.message.completed':
+            record.messages.append(event.data)
+        yield event
+        waited, phase = time.perf_counter(), 'stream_event'
+
+
+class RunEventHandler(AssistantEventHandler):
+    """Handles one run stream, starting each function call the moment it is fully streamed"""
+
+    def __init__(self, start_tool_call, pending):
+        super().__init__()
+        self.start_tool_call = start_tool_call
+        # tool_call_id -> started call, shared by every stream of the same run
+        self.pending = pending
+
+    def on_tool_call_done(self, tool_call):
+        # The SDK can report the same call as done more than once
+        if tool_call.type == 'function' and tool_call.id not in self.pending:
+            self.pending[tool_call.id] = self.start_tool_call(tool_call)
+
+
+class RunRecord:
+    """What a run did, collected while it was being dispatched.
+
+    ``tool_call_batches`` has one list of function calls per requires_action
+    pause, in order. ``messages`` holds the assistant messages completed
+    during the run; only streamed runs fill it.
+    """
+
+    def __init__(self):
+        self.tool_call_batches = []
+        self.messages = []
+
+
+def collect_tool_outputs(tool_calls, start_tool_call, pending=None):
+    """Tool outputs for a requires_action batch, run concurrently.
+
+    start_tool_call starts one call on the tool pool and returns it with a
+    result() to wait on (ToolRegistry.start). Calls already started from
+    the stream are reused; the rest are started together, so the batch
+    takes as long as its slowest call.
+    """
+    pending = pending if pending is not None else {}
+    with span('tool_batch', calls=len(tool_calls)):
+        calls = [pending.pop(tool_call.id, None) or start_tool_call(tool_call) for tool_call in tool_calls]
+        return [call.result() for call in calls]
+
+
+class RunStream:
+    """Iterates over every event of a streamed run, answering requires_action pauses on the way.
+
+    Each pause is answered with submit_tool_outputs_stream, so there is no
+    polling and no sleep between state transitions. The final Run is
+    available as ``run`` once iteration finishes.
+    """
+
+    def __init__(self, client, thread_id, assistant_id, start_tool_call, record=None, run_options=None):
+        self.client = client
+        self.thread_id = thread_id
+        self.assistant_id = assistant_id
+        self.start_tool_call = start_tool_call
+        self.record = record if record is not None else RunRecord()
+        # Extra arguments for creating the run, e.g. its truncation_strategy
+        self.run_options = run_options or {}
+        self.run = None
+
+    def __iter__(self):
+        pending = {}
+        handler = RunEventHandler(self.start_tool_call, pending)
+        opened = time.perf_counter()
+        with self.client.beta.threads.runs.stream(
+            thread_id=self.thread_id,
+            assistant_id=self.assistant_id,
+            event_handler=handler,
+            **self.run_options
+        ) as stream:
+            yield from record_events(stream, opened, 'run_create', self.record)
+        self.run = handler.current_run
+
+        while self.run is not None and self.run.status == 'requires_action':
+            tool_calls = self.run.required_action.submit_tool_outputs.tool_calls
+            self.record.tool_call_batches.append(tool_calls)
+            tool_outputs = collect_tool_outputs(tool_calls, self.start_tool_call, pending)
+            handler = RunEventHandler(self.start_tool_call, pending)
+            opened = time.perf_counter()
+            with self.client.beta.threads.runs.submit_tool_outputs_stream(
+                thread_id=self.thread_id,
+                run_id=self.run.id,
+                tool_outputs=tool_outputs,
+                event_handler=handler
+            ) as stream:
+                yield from record_events(stream, opened, 'tool_outputs_submit', self.record)
+            self.run = handler.current_run
+
+        if self.run is None:
+            raise RuntimeError("Run stream ended without a run status")
+
+    def until_done(self):
+        for _ in self:
+            pass
+        return self.run
+
+
+def stream_run(client, thread_id, assistant_id, start_tool_call, record=None, run_options=None):
+    """Run the assistant over the streaming API and return the final Run"""
+    return RunStream(client, thread_id, assistant_id, start_tool_call, record, run_options).until_done()
+
+
+def poll_run(client, thread_id, assistant_id, start_tool_call,
+             min_delay=0.05, max_delay=1.0, factor=1.5, record=None, run_options=None):
+    """Fallback for when streaming is unavailable: poll with adaptive backoff.
+
+    The delay starts small and grows while the run sits in the same state,
+    and is reset after every tool output submission.
+    """
+    with span('run_create'):
+        run = client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            **(run_options or {})
+        )
+    delay = min_delay
+    while run.status not in TERMINAL_STATUSES:
+        if run.status == 'requires_action':
+            tool_calls = run.required_action.submit_tool_outputs.tool_calls
+            if record is not None:
+                record.tool_call_batches.append(tool_calls)
+            tool_outputs = collect_tool_outputs(tool_calls, start_tool_call)
+            with span('tool_outputs_submit'):
+                run = client.beta.threads.runs.submit_tool_outputs(
+                    thread_id=thread_id,
+                    run_id=run.id,
+                    tool_outputs=tool_outputs
+                )
+            delay = min_delay
+            continue
+        time.sleep(delay)
+        delay = min(delay * factor, max_delay)
+        with span('run_poll', delay=round(delay, 3)) as attributes:
+            run = client.beta.threads.runs.retrieve(
+                thread_id=thread_id,
+                run_id=run.id
+            )
+            attributes['status'] = run.status
+    return run
+
+
+async def async_collect_tool_outputs(tool_calls, start_tool_call):
+    """Run a requires_action batch concurrently on the tool pool, awaiting it from the event loop"""
+    with span('tool_batch', calls=len(tool_calls)):
+        calls = [start_tool_call(tool_call) for tool_call in tool_calls]
+        return list(await asyncio.gather(*(call.result_async() for call in calls)))
+
+
+async def _async_consume(stream, record, opened, first_phase):
+    """Drain a stream like record_events does"""
+    waited, phase = opened, first_phase
+    async for event in stream:
+        now = time.perf_counter()
+        record_phase(phase, now - waited, waited, traced=not event.event.endswith('.delta'), event=event.event)
+        waited, phase = now, 'stream_event'
+        if record is not None and event.event == 'thread.message.completed':
+            record.messages.append(event.data)
+
+
+async def async_stream_run(client, thread_id, assistant_id, start_tool_call, record=None, run_options=None):
+    """asyncio counterpart of stream_run for an AsyncOpenAI client"""
+    handler = AsyncAssistantEventHandler()
+    opened = time.perf_counter()
+    async with client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        event_handler=handler,
+        **(run_options or {})
+    ) as stream:
+        await _async_consume(stream, record, opened, 'run_create')
+    run = handler.current_run
+
+    while run is not None and run.status == 'requires_action':
+        tool_calls = run.required_action.submit_tool_outputs.tool_calls
+        if record is not None:
+            record.tool_call_batches.append(tool_calls)
+        tool_outputs = await async_collect_tool_outputs(tool_calls, start_tool_call)
+        handler = AsyncAssistantEventHandler()
+        opened = time.perf_counter()
+        async with client.beta.threads.runs.submit_tool_outputs_stream(
+            thread_id=thread_id,
+            run_id=run.id,
+            tool_outputs=tool_outputs,
+            event_handler=handler
+        ) as stream:
+            await _async_consume(stream, record, opened, 'tool_outputs_submit')
+        run = handler.current_run
+
+    if run is None:
+        raise RuntimeError("Run stream ended without a run status")
+    return run
+
+
+async def async_poll_run(client, thread_id, assistant_id, start_tool_call,
+                         min_delay=0.05, max_delay=1.0, factor=1.5, record=None, run_options=None):
+    """asyncio counterpart of poll_run; waiting yields the event loop instead of a thread"""
+    with span('run_create'):
+        run = await client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            **(run_options or {})
+        )
+    delay = min_delay
+    while run.status not in TERMINAL_STATUSES:
+        if run.status == 'requires_action':
+            tool_calls = run.required_action.submit_tool_outputs.tool_calls
+            if record is not None:
+                record.tool_call_batches.append(tool_calls)
+            tool_outputs = await async_collect_tool_outputs(tool_calls, start_tool_call)
+            with span('tool_outputs_submit'):
+                run = await client.beta.threads.runs.submit_tool_outputs(
+                    thread_id=thread_id,
+                    run_id=run.id,
+                    tool_outputs=tool_outputs
+                )
+            delay = min_delay
+            continue
+        await asyncio.sleep(delay)
+        delay = min(delay * factor, max_delay)
+        with span('run_poll', delay=round(delay, 3)) as attributes:
+            run = await client.beta.threads.runs.retrieve(
+                thread_id=thread_id,
+                run_id=run.id
+            )
+            attributes['status'] = run.status
+    return run
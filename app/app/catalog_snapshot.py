@@ -0,0 +1,282 @@
+# catalog_snapshot.py
+from collections.abc import Mapping
+from contextlib import contextmanager
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only
+    fcntl = None
+
+MAGIC = b'MESHCAT1'
+# magic, metadata offset and length, string offsets offset, string count,
+# string data offset, record offset, record count, sort order offset
+HEADER = struct.Struct('<8s8Q')
+# String columns of every record; any other key of an entry (properties,
+# aliases, non-string values) goes into one JSON string in the last column
+FIELDS = ('mesh_id', 'mesh_name', 'display_name', 'description', 'category')
+EXTRA = len(FIELDS)
+COLUMNS = {field: column for column, field in enumerate(FIELDS) if column}
+MISSING = 0xFFFFFFFF
+
+
+def catalog_version(mesh_data):
+    """Content hash of a catalog, for caching things rendered from it"""
+    payload = json.dumps(dict(mesh_data.items()), sort_keys=True).encode()
+    return hashlib.sha1(payload).hexdigest()
+
+
+def _align(f):
+    f.write(b'\0' * (-f.tell() % 8))
+    return f.tell()
+
+
+class StringTable:
+    """Strings of a snapshot being written, each stored once (categories, locations...)"""
+
+    def __init__(self, data=b'', offsets=(0,)):
+        self.data = [data]
+        self.offsets = np.asarray(offsets, dtype=np.uint64)
+        self.sizes = []
+        self.indexes = {}
+
+    def intern(self, text):
+        index = self.indexes.get(text)
+        if index is None:
+            encoded = text.encode()
+            index = self.indexes[text] = len(self.offsets) - 1 + len(self.sizes)
+            self.data.append(encoded)
+            self.sizes.append(len(encoded))
+        return index
+
+    def record(self, mesh_id, data):
+        """Record row for one entry"""
+        row = [self.intern(mesh_id)] + [MISSING] * EXTRA
+        extra = {}
+        for key, value in data.items():
+            column = COLUMNS.get(key)
+            if column and isinstance(value, str):
+                row[column] = self.intern(value)
+            else:
+                extra[key] = value
+        if extra:
+            row[EXTRA] = self.intern(json.dumps(extra))
+        return row
+
+    def arrays(self):
+        """(offsets, joined data) of every string"""
+        added = self.offsets[-1] + np.cumsum(self.sizes, dtype=np.uint64)
+        return np.concatenate([self.offsets, added]), b''.join(self.data)
+
+
+def write_snapshot(path, mesh_data, generation, source_stamp=None):
+    """Write mesh_data to path as a snapshot, replacing the old file atomically"""
+    strings = StringTable()
+    rows = [strings.record(mesh_id, data) for mesh_id, data in mesh_data.items()]
+    records = np.array(rows, dtype=np.uint32).reshape(len(rows), EXTRA + 1)
+    offsets, data = strings.arrays()
+    # Rows by mesh_id, for binary search; UTF-8 bytes sort like the strings do
+    bounds = offsets.tolist()
+    ids = [data[bounds[row[0]]:bounds[row[0] + 1]] for row in rows]
+    order = np.array(sorted(range(len(rows)), key=ids.__getitem__), dtype=np.uint32)
+    meta = {"generation": generation, "version": catalog_version(mesh_data), "source_stamp": source_stamp}
+    _write(path, meta, offsets, data, records, order)
+
+
+def update_snapshot(path, snapshot, entries, generation, source_stamp=None):
+    """Write snapshot with entries added or replaced to path.
+
+    Copies the old string table and records as they are and only encodes
+    the new entries, so a small update of a large catalog costs little
+    more than copying the file. Strings of replaced entries stay in the
+    table until the next full write_snapshot.
+    """
+    strings = StringTable(snapshot._map[snapshot._strings_offset:snapshot._strings_offset + int(snapshot._offsets[-1])],
+                          snapshot._offsets)
+    records = snapshot._records.copy()
+    order = snapshot._order.astype(np.int64)
+    added = []
+    for mesh_id, data in entries.items():
+        row = snapshot._row(mesh_id)
+        if row is None:
+            added.append((mesh_id.encode(), strings.record(mesh_id, data)))
+        else:
+            records[row] = strings.record(mesh_id, data)
+    if added:
+        # New entries go last, like in the JSON file, and into the sort order by mesh_id
+        records = np.concatenate([records, np.array([row for _, row in added], dtype=np.uint32)])
+        by_key = sorted(range(len(added)), key=lambda i: added[i][0])
+        positions = [snapshot._position(added[i][0]) for i in by_key]
+        order = np.insert(order, positions, len(snapshot) + np.array(by_key, dtype=np.int64))
+    offsets, data = strings.arrays()
+    # Chained from the previous hash: still changes with every update and
+    # matches across processes, without rehashing the whole catalog
+    payload = json.dumps([snapshot.version, entries], sort_keys=True).encode()
+    meta = {"generation": generation, "version": hashlib.sha1(payload).hexdigest(), "source_stamp": source_stamp}
+    _write(path, meta, offsets, data, records, order.astype(np.uint32))
+
+
+def _write(path, meta, offsets, data, records, order):
+    meta = json.dumps(meta).encode()
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\0' * HEADER.size)
+        meta_offset = f.tell()
+        f.write(meta)
+        offsets_offset = _align(f)
+        f.write(offsets.tobytes())
+        strings_offset = f.tell()
+        f.write(data)
+        records_offset = _align(f)
+        f.write(records.tobytes())
+        order_offset = f.tell()
+        f.write(order.tobytes())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, meta_offset, len(meta), offsets_offset, len(offsets) - 1,
+                            strings_offset, records_offset, len(records), order_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def snapshot_lock(path):
+    """Exclusive lock shared by every process publishing to path"""
+    if fcntl is None:
+        yield
+        return
+    with open(path.with_name(path.name + '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def latest_generation(path):
+    """Generation of the snapshot at path, 0 if there is none"""
+    try:
+        current = CatalogSnapshot(path)
+    except (FileNotFoundError, ValueError):
+        return 0
+    current.close()
+    return current.generation
+
+
+def publish_snapshot(path, mesh_data, source_stamp=None):
+    """Write the next generation of the snapshot at path and open it"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with snapshot_lock(path):
+        write_snapshot(path, mesh_data, latest_generation(path) + 1, source_stamp)
+        return CatalogSnapshot(path)
+
+
+class CatalogSnapshot(Mapping):
+    """Read-only catalog in a memory-mapped snapshot file.
+
+    Every process that opens the same file shares its pages, so a host
+    holds one copy of the catalog however many workers it runs. Entries
+    are decoded into fresh dicts on access; a newer snapshot replaces the
+    file without disturbing processes still reading the old one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, meta_offset, meta_length, offsets_offset, string_count,
+         self._strings_offset, records_offset, count, order_offset) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a catalog snapshot")
+        meta = json.loads(self._map[meta_offset:meta_offset + meta_length])
+        self.generation = meta['generation']
+        self.version = meta['version']
+        self.source_stamp = meta['source_stamp']
+        self._offsets = np.frombuffer(self._map, dtype=np.uint64, count=string_count + 1, offset=offsets_offset)
+        self._records = np.frombuffer(self._map, dtype=np.uint32, count=count * (EXTRA + 1),
+                                      offset=records_offset).reshape(count, EXTRA + 1)
+        self._order = np.frombuffer(self._map, dtype=np.uint32, count=count, offset=order_offset)
+
+    @property
+    def key(self):
+        """Identifies the file on disk, to notice when it has been replaced"""
+        return self.stat.st_ino, self.stat.st_mtime_ns, self.stat.st_size
+
+    @staticmethod
+    def file_key(path):
+        stat = os.stat(path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _bytes(self, index):
+        start = self._strings_offset + int(self._offsets[index])
+        return self._map[start:self._strings_offset + int(self._offsets[index + 1])]
+
+    def _position(self, key):
+        """First position in the sort order whose mesh_id is not below the encoded key"""
+        low, high = 0, len(self._order)
+        while low < high:
+            middle = (low + high) // 2
+            if self._bytes(self._records[self._order[middle], 0]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _row(self, mesh_id):
+        """Record row of mesh_id, or None"""
+        if not isinstance(mesh_id, str):
+            return None
+        key = mesh_id.encode()
+        position = self._position(key)
+        if position < len(self._order) and self._bytes(self._records[self._order[position], 0]) == key:
+            return int(self._order[position])
+        return None
+
+    def _strings(self):
+        """Function from string index to bytes, faster than _bytes for reading many entries"""
+        offsets, data, base = self._offsets.tolist(), self._map, self._strings_offset
+        return lambda index: data[base + offsets[index]:base + offsets[index + 1]]
+
+    def _entry(self, record, string=None):
+        string = string or self._bytes
+        entry = {field: string(record[column]).decode()
+                 for field, column in COLUMNS.items() if record[column] != MISSING}
+        if record[EXTRA] != MISSING:
+            entry.update(json.loads(string(record[EXTRA])))
+        return entry
+
+    def __getitem__(self, mesh_id):
+        row = self._row(mesh_id)
+        if row is None:
+            raise KeyError(mesh_id)
+        return self._entry(self._records[row].tolist())
+
+    def __contains__(self, mesh_id):
+        return self._row(mesh_id) is not None
+
+    def __iter__(self):
+        string = self._strings()
+        return (string(index).decode() for index in self._records[:, 0].tolist())
+
+    def __len__(self):
+        return len(self._records)
+
+    def items(self):
+        string = self._strings()
+        return [(string(record[0]).decode(), self._entry(record, string)) for record in self._records.tolist()]
+
+    def values(self):
+        string = self._strings()
+        return [self._entry(record, string) for record in self._records.tolist()]
+
+    def close(self):
+        self._offsets = self._records = self._order = None
+        self._map.close()
@@ -0,0 +1,183 @@
+# chat_sessions.py
+from collections import OrderedDict, deque
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('truncate', 'roll')
+# Recent exchanges kept per session for the summary a rolled thread starts with
+SUMMARY_TURNS = 4
+SUMMARY_CLIP = 240
+
+
+def approximate_tokens(text):
+    """Rough token count of English text, about four characters a token"""
+    return len(text or '') // 4 + 1
+
+
+def clip(text, limit=SUMMARY_CLIP):
+    text = ' '.join((text or '').split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + '...'
+
+
+class Session:
+    """Turns and approximate size of one chat thread"""
+
+    def __init__(self, thread_id, tokens=0, rolls=0):
+        self.thread_id = thread_id
+        self.turns = 0
+        self.tokens = tokens
+        self.rolls = rolls
+        self.recent = deque(maxlen=SUMMARY_TURNS)  # (message, response)
+        self.last_used = time.monotonic()
+
+
+class SessionManager:
+    """Keeps the threads behind long conversations from growing without bound.
+
+    Strategies:
+      truncate  every run sees only the last ``last_messages`` messages of
+                its thread (the run's truncation_strategy)
+      roll      once a thread has had ``max_turns`` turns or grown past
+                ``max_tokens``, the next turn starts a new thread seeded with
+                the mesh context and a summary of the latest exchanges
+
+    Truncation would cut off a catalog context sent as the thread's first
+    message, so 'auto' rolls when CHAT_CONTEXT_MODE is 'thread' and
+    truncates otherwise.
+
+    Sessions are kept per process, in LRU order, for at most ``idle_ttl``
+    seconds after their last turn. A thread this process doesn't know (it
+    expired, or was started by another worker) is picked up with fresh
+    counts rather than refused.
+    """
+
+    def __init__(self, strategy='roll', max_turns=20, max_tokens=8000, last_messages=12,
+                 max_sessions=10000, idle_ttl=1800):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown session strategy: {strategy}")
+        self.strategy = strategy
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.last_messages = last_messages
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.sessions = OrderedDict()  # thread_id -> Session, least recently used first
+        self.rolled = 0
+        self.expired = 0
+        self.lock = threading.Lock()
+
+    def _get(self, thread_id, now):
+        session = self.sessions.get(thread_id)
+        if session is not None:
+            self.sessions.move_to_end(thread_id)
+            session.last_used = now
+        return session
+
+    def _add(self, session, now):
+        session.last_used = now
+        self.sessions[session.thread_id] = session
+        self.sessions.move_to_end(session.thread_id)
+        self._expire(now)
+
+    def _expire(self, now):
+        while self.sessions:
+            oldest = next(iter(self.sessions.values()))
+            if len(self.sessions) <= self.max_sessions and now - oldest.last_used < self.idle_ttl:
+                break
+            del self.sessions[oldest.thread_id]
+            self.expired += 1
+
+    def next_thread(self, thread_id):
+        """(thread to add the turn to, extra messages for a new thread).
+
+        The thread is None when a new one has to be created: for a new
+        conversation, or when the session has outgrown its thread and
+        continues in a new one carrying the summary message.
+        """
+        if not thread_id or self.strategy != 'roll':
+            return thread_id, []
+        with self.lock:
+            session = self._get(thread_id, time.monotonic())
+            if session is None or (session.turns < self.max_turns and session.tokens < self.max_tokens):
+                return thread_id, []
+            summary = self.summary(session)
+        logger.info("Rolling thread %s after %d turns (~%d tokens)", thread_id, session.turns, session.tokens)
+        return None, [{"role": "user", "content": summary}] if summary else []
+
+    def summary(self, session):
+        """Compact recap of the session's latest exchanges, or '' if there were none"""
+        if not session.recent:
+            return ''
+        lines = ["Summary of the conversation so far (continued from an earlier thread):"]
+        for message, response in session.recent:
+            lines.append(f"- The user asked: {clip(message)}")
+            lines.append(f"  You answered: {clip(response)}")
+        return '\n'.join(lines)
+
+    def started(self, thread_id, messages, previous_thread_id=None):
+        """Track a new thread created with messages (context, summary and the first question)"""
+        now = time.monotonic()
+        tokens = sum(approximate_tokens(message['content']) for message in messages)
+        with self.lock:
+            previous = self.sessions.pop(previous_thread_id, None) if previous_thread_id else None
+            session = Session(thread_id, tokens)
+            if previous is not None:
+                session.rolls = previous.rolls + 1
+                session.recent.extend(previous.recent)
+                self.rolled += 1
+            self._add(session, now)
+
+    def record_turn(self, thread_id, message, response):
+        """Count a finished turn and the two messages it added to the thread"""
+        if not thread_id:
+            return
+        now = time.monotonic()
+        with self.lock:
+            session = self._get(thread_id, now)
+            if session is None:
+                session = Session(thread_id)
+                self._add(session, now)
+            session.turns += 1
+            session.recent.append((message, response))
+            # Not the run's usage: that counts every model pass, the instructions and the
+            # tool schemas, and says little about how big the thread itself has become
+            session.tokens += approximate_tokens(message) + approximate_tokens(response)
+
+    def run_options(self):
+        """Extra arguments for creating a run"""
+        if self.strategy == 'truncate':
+            return {"truncation_strategy": {"type": "last_messages", "last_messages": self.last_messages}}
+        return {}
+
+    def stats(self):
+        with self.lock:
+            self._expire(time.monotonic())
+            sessions = list(self.sessions.values())
+        return {
+            "strategy": self.strategy,
+            "sessions": len(sessions),
+            "max_turns": max((session.turns for session in sessions), default=0),
+            "max_tokens": max((session.tokens for session in sessions), default=0),
+            "rolled": self.rolled,
+            "expired": self.expired,
+        }
+
+
+def make_session_manager(config):
+    """SessionManager for CHAT_SESSION_STRATEGY ('auto', 'truncate', 'roll'), or None if 'off'"""
+    strategy = config['CHAT_SESSION_STRATEGY']
+    if strategy == 'off':
+        return None
+    if strategy == 'auto':
+        strategy = 'roll' if config['CHAT_CONTEXT_MODE'] == 'thread' else 'truncate'
+    return SessionManager(
+        strategy,
+        max_turns=config['CHAT_SESSION_MAX_TURNS'],
+        max_tokens=config['CHAT_SESSION_MAX_TOKENS'],
+        last_messages=config['CHAT_SESSION_LAST_MESSAGES'],
+        max_sessions=config['CHAT_SESSION_MAX'],
+        idle_ttl=config['CHAT_SESSION_IDLE_TTL']
+    )
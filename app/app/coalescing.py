@@ -0,0 +1,256 @@
+# coalescing.py
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from app.mesh_store import ThreadLocalSQLite
+from app.response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# How long another worker's finished answer is still handed to latecomers
+RESULT_LINGER = 2.0
+POLL_INTERVAL = 0.05
+
+
+def shared_payload(value):
+    """What a coalesced request gets: the answer, without the leader's thread"""
+    return {"response": value["response"], "actions": value["actions"], "thread_id": None}
+
+
+class Flight:
+    """One in-flight model turn and the requests waiting for its answer"""
+
+    def __init__(self, key):
+        self.key = key
+        self.value = None
+        self.done = threading.Event()
+        self.waiters = []  # (loop, future) of asyncio followers
+        self.lock = threading.Lock()
+
+    def wait(self, timeout):
+        self.done.wait(timeout)
+        return self.value
+
+    async def wait_async(self, timeout):
+        with self.lock:
+            if self.done.is_set():
+                return self.value
+            future = asyncio.get_running_loop().create_future()
+            self.waiters.append((future.get_loop(), future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def finish(self, value):
+        with self.lock:
+            self.value = value
+            self.done.set()
+            waiters, self.waiters = self.waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, value)
+
+
+def _resolve(future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+class SQLiteFlights(ThreadLocalSQLite):
+    """In-flight turns claimed in a SQLite file, so workers on a host share them too"""
+
+    busy_timeout = 5
+    # claim() runs its own BEGIN IMMEDIATE
+    isolation_level = None
+
+    def __init__(self, path, timeout=60.0):
+        self.path = str(path)
+        self.timeout = timeout
+        self.local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS inflight ("
+                "key TEXT PRIMARY KEY, started_at REAL, value TEXT, finished_at REAL)"
+            )
+
+    def claim(self, key):
+        """True if this worker should run the turn; False if another one is running or just ran it"""
+        now = time.time()
+        db = self.connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # Abandoned claims (the worker died) and old answers
+            db.execute("DELETE FROM inflight WHERE (finished_at IS NULL AND started_at < ?) OR finished_at < ?",
+                       (now - self.timeout, now - RESULT_LINGER))
+            claimed = db.execute("INSERT OR IGNORE INTO inflight VALUES (?, ?, NULL, NULL)",
+                                 (key, now)).rowcount == 1
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def wait(self, key, timeout):
+        """Answer of another worker's turn, or None if it failed, gave up or took too long"""
+        db = self.connection()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            row = db.execute("SELECT value, finished_at FROM inflight WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None:
+                return json.loads(row[0])
+            time.sleep(POLL_INTERVAL)
+        return None
+
+    def finish(self, key, value):
+        db = self.connection()
+        if value is None:
+            # Waiting workers run the turn themselves
+            db.execute("DELETE FROM inflight WHERE key = ?", (key,))
+        else:
+            db.execute("UPDATE inflight SET value = ?, finished_at = ? WHERE key = ?",
+                       (json.dumps(value), time.time(), key))
+
+
+class RequestCoalescer:
+    """Single-flight model turns for identical first messages.
+
+    Concurrent new-conversation requests with the same normalized message
+    and catalog version share one run: the first becomes the leader and
+    runs the turn, the others wait for its answer and get it without a
+    thread, like a response cache hit. Requests are shared across the
+    threads and event loop of a worker, and with ``shared`` (SQLiteFlights)
+    across the workers of a host. If the leader's turn fails or takes
+    longer than ``timeout``, its followers run their own.
+    """
+
+    def __init__(self, shared=None, timeout=60.0):
+        self.shared = shared
+        self.timeout = timeout
+        self.flights = {}
+        self.leaders = 0
+        self.followers = 0
+        self.remote = 0
+        self.fallbacks = 0
+        self.lock = threading.Lock()
+
+    def join(self, message, version):
+        """(flight, True if the caller leads it)"""
+        key = ResponseCache.key(message, version)
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self.flights[key] = Flight(key)
+            return flight, True
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _finish(self, flight, value):
+        with self.lock:
+            del self.flights[flight.key]
+        flight.finish(value)
+
+    def run(self, message, version, turn):
+        """(payload, status, coalesced) of turn(), or of the identical turn already in flight.
+
+        turn returns (payload, status); only a 200 payload is shared.
+        """
+        flight, leader = self.join(message, version)
+        if not leader:
+            value = flight.wait(self.timeout)
+            if value is not None:
+                self._count('followers')
+                return shared_payload(value), 200, True
+            self._count('fallbacks')
+            payload, status = turn()
+            return payload, status, False
+        value = None
+        claimed = False
+        try:
+            claimed = self.shared is not None and self.shared.claim(flight.key)
+            if self.shared is not None and not claimed:
+                value = self.shared.wait(flight.key, self.timeout)
+                if value is not None:
+                    self._count('remote')
+                    return shared_payload(value), 200, True
+            self._count('leaders')
+            payload, status = turn()
+            if status == 200:
+                value = {"response": payload["response"], "actions": payload["actions"]}
+            return payload, status, False
+        finally:
+            self._release(flight, value, claimed)
+
+    async def run_async(self, message, version, turn):
+        """run() for a coroutine function turn, without blocking the event loop"""
+        flight, leader = self.join(message, version)
+        if not leader:
+            value = await flight.wait_async(self.timeout)
+            if value is not None:
+                self._count('followers')
+                return shared_payload(value), 200, True
+            self._count('fallbacks')
+            payload, status = await turn()
+            return payload, status, False
+        value = None
+        claimed = False
+        try:
+            claimed = self.shared is not None and await asyncio.to_thread(self.shared.claim, flight.key)
+            if self.shared is not None and not claimed:
+                value = await asyncio.to_thread(self.shared.wait, flight.key, self.timeout)
+                if value is not None:
+                    self._count('remote')
+                    return shared_payload(value), 200, True
+            self._count('leaders')
+            payload, status = await turn()
+            if status == 200:
+                value = {"response": payload["response"], "actions": payload["actions"]}
+            return payload, status, False
+        finally:
+            self._release(flight, value, claimed)
+
+    def _release(self, flight, value, claimed):
+        if claimed:
+            try:
+                self.shared.finish(flight.key, value)
+            except sqlite3.Error as e:
+                logger.warning("Could not publish coalesced answer: %s", e)
+        self._finish(flight, value)
+
+    def stats(self):
+        with self.lock:
+            coalesced = self.followers + self.remote
+            runs = self.leaders + self.fallbacks
+            requests = runs + coalesced
+            return {
+                "runs": runs,
+                "coalesced": coalesced,
+                "coalesced_in_worker": self.followers,
+                "coalesced_across_workers": self.remote,
+                "fallbacks": self.fallbacks,
+                "in_flight": len(self.flights),
+                "coalescing_ratio": round(coalesced / requests, 4) if requests else 0.0,
+                "requests_per_run": round(requests / runs, 2) if runs else None,
+            }
+
+
+def make_request_coalescer(config, mesh_manager):
+    """Request coalescer for CHAT_COALESCE ('memory', 'sqlite' or 'off')"""
+    kind = config['CHAT_COALESCE']
+    if kind == 'off':
+        return None
+    timeout = config['CHAT_COALESCE_TIMEOUT']
+    if kind == 'sqlite':
+        return RequestCoalescer(SQLiteFlights(mesh_manager.cache_dir / 'inflight.sqlite3', timeout), timeout)
+    if kind == 'memory':
+        return RequestCoalescer(timeout=timeout)
+    raise ValueError(f"Unknown request coalescing backend: {kind}")
@@ -0,0 +1,115 @@
+# context_prompt.py
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_MODES = ('thread', 'instructions', 'vector_store')
+CONTEXT_HEADER = "3D Model Information:\n\n"
+CATALOG_FILENAME = "mesh_catalog.md"
+
+
+def render_context(mesh_info):
+    """Mesh catalog as the text the assistant gets as context"""
+    parts = [CONTEXT_HEADER, "Available components and their descriptions:\n\n"]
+    for data in mesh_info.values():
+        parts.append(
+            f"Component: {data['display_name']}\n"
+            f"Internal mesh name: {data['mesh_name']}\n"
+            f"Description: {data['description']}\n"
+            f"Alternative names: {', '.join(data.get('aliases', []))}\n"
+            f"Properties: {json.dumps(data['properties'], indent=2)}\n\n"
+        )
+    return ''.join(parts)
+
+
+class ContextPrompt:
+    """Rendered mesh context, memoized against the catalog version.
+
+    Modes:
+      thread        the context is the first message of every new thread
+      instructions  the context is appended to the assistant's instructions
+                    once per catalog version; new threads carry nothing
+      vector_store  the context is uploaded once per catalog version to a
+                    vector store the assistant searches with file_search
+
+    The catalog version the assistant was last synced with is kept in its
+    metadata, so restarts don't re-upload an unchanged catalog.
+    """
+
+    def __init__(self, mesh_manager, client, assistant_id):
+        self.mesh_manager = mesh_manager
+        self.client = client
+        self.assistant_id = assistant_id
+        self._rendered = (None, None)
+        self._synced = (None, None)
+        self._lock = threading.Lock()
+
+    def text(self):
+        version = self.mesh_manager.version
+        rendered_version, text = self._rendered
+        if rendered_version != version:
+            text = render_context(self.mesh_manager.get_all_mesh_info())
+            self._rendered = (version, text)
+            logger.info("Rendered mesh context for catalog %s (%d chars)", version[:12], len(text))
+        return text
+
+    def thread_messages(self, mode='thread'):
+        """Messages a new thread starts with; syncs the assistant first in the other modes"""
+        if mode not in CONTEXT_MODES:
+            raise ValueError(f"Unknown context mode: {mode}")
+        if mode == 'thread':
+            return [{"role": "user", "content": self.text()}]
+        version = self.mesh_manager.version
+        if self._synced != (mode, version):
+            with self._lock:
+                if self._synced != (mode, version):
+                    self.sync_assistant(mode, version)
+                    self._synced = (mode, version)
+        return []
+
+    def sync_assistant(self, mode, version):
+        assistant = self.client.beta.assistants.retrieve(self.assistant_id)
+        metadata = dict(assistant.metadata or {})
+        if metadata.get('mesh_catalog_version') == version and metadata.get('mesh_catalog_mode') == mode:
+            return
+        metadata.update(mesh_catalog_version=version, mesh_catalog_mode=mode)
+        # Whatever an earlier sync appended is replaced, not stacked
+        base_instructions = (assistant.instructions or '').split(f"\n\n{CONTEXT_HEADER}")[0]
+
+        if mode == 'instructions':
+            self.client.beta.assistants.update(
+                self.assistant_id,
+                instructions=f"{base_instructions}\n\n{self.text()}",
+                metadata=metadata
+            )
+            logger.info("Synced mesh context for catalog %s into assistant instructions", version[:12])
+            return
+
+        old_store_id = metadata.pop('mesh_catalog_vector_store', None)
+        vector_store = self.client.beta.vector_stores.create(
+            name=f"mesh-catalog-{version[:12]}",
+            metadata={"mesh_catalog_version": version}
+        )
+        self.client.beta.vector_stores.files.upload_and_poll(
+            vector_store_id=vector_store.id,
+            file=(CATALOG_FILENAME, self.text().encode())
+        )
+        metadata['mesh_catalog_vector_store'] = vector_store.id
+        tools = [tool.model_dump(exclude_none=True) for tool in assistant.tools]
+        if not any(tool['type'] == 'file_search' for tool in tools):
+            tools.append({"type": "file_search"})
+        self.client.beta.assistants.update(
+            self.assistant_id,
+            instructions=base_instructions,
+            tools=tools,
+            tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}},
+            metadata=metadata
+        )
+        logger.info("Uploaded mesh context for catalog %s to vector store %s", version[:12], vector_store.id)
+        if old_store_id and old_store_id != vector_store.id:
+            try:
+                self.client.beta.vector_stores.delete(old_store_id)
+            except Exception as e:
+                logger.warning("Could not delete old vector store %s: %s", old_store_id, e)
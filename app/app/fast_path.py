@@ -0,0 +1,167 @@
+# fast_path.py
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import re
+import threading
+import time
+
+from app.mesh_search import edit_distance, max_edits, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Lookup phrasings answered locally, and the action each one maps to
+LOOKUP_PATTERNS = [
+    (re.compile(r"^(?:where(?:'s| is| are)|where can (?:i|we) find|where do (?:i|we) keep|"
+                r"find|locate|show me|highlight|point me to)\s+(?P<target>.+)$"), 'highlight_object'),
+    (re.compile(r"^(?:zoom(?: in)?(?: on| to| into)?|take me to)\s+(?P<target>.+)$"), 'zoom_to_object'),
+]
+POLITE_PREFIX = re.compile(r"^(?:(?:hey|hi|ok|okay|please|can you|could you|would you)[\s,]+)+")
+POLITE_SUFFIX = re.compile(r"(?:[\s,]+(?:please|thanks|thank you))+$")
+# Anything that isn't a single plain object name goes to the model
+COMPLEX_TARGET = re.compile(r"\b(?:and|or|with|without|how|why|what|which|not|that|if|near|next)\b|[,;]")
+
+HIGHLIGHT_COLOR = "#FF0000"
+
+
+def normalize_message(message):
+    text = ' '.join(message.lower().split()).strip(" ?!.")
+    text = POLITE_PREFIX.sub('', text)
+    return POLITE_SUFFIX.sub('', text).strip(" ?!.")
+
+
+def parse_lookup(message):
+    """(action name, target phrase) for a plain lookup question, else None"""
+    text = normalize_message(message)
+    for pattern, action in LOOKUP_PATTERNS:
+        match = pattern.match(text)
+        if match and not COMPLEX_TARGET.search(match.group('target')):
+            return action, match.group('target')
+    return None
+
+
+def name_tokens(data):
+    return set(tokenize(' '.join([data['display_name'], *data.get('aliases', [])])))
+
+
+def covers(names, tokens):
+    """True if every query token matches a name token (prefix, plural or small typo)"""
+    return all(
+        any(name.startswith(token) or (token.startswith(name) and len(name) >= 4)
+            or edit_distance(token, name) <= max_edits(token) for name in names)
+        for token in tokens
+    )
+
+
+class FastPathStats:
+    """Hit rate of the fast path and the latency it saved against model turns"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.fast_seconds = 0.0
+        self.model_turns = 0
+        self.model_seconds = 0.0
+
+    def record(self, hit, seconds):
+        with self.lock:
+            self.requests += 1
+            if hit:
+                self.hits += 1
+                self.fast_seconds += seconds
+
+    def record_model_turn(self, seconds):
+        with self.lock:
+            self.model_turns += 1
+            self.model_seconds += seconds
+
+    def snapshot(self):
+        with self.lock:
+            avg_fast = self.fast_seconds / self.hits if self.hits else 0.0
+            avg_model = self.model_seconds / self.model_turns if self.model_turns else None
+            return {
+                "requests": self.requests,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.requests, 4) if self.requests else 0.0,
+                "avg_fast_ms": round(avg_fast * 1000, 2),
+                "avg_model_ms": round(avg_model * 1000, 2) if avg_model is not None else None,
+                # Each hit would otherwise have cost an average model turn
+                "latency_saved_s": round(self.hits * (avg_model - avg_fast), 3) if avg_model else None,
+            }
+
+
+class FastPath:
+    """Answers high-confidence "where is X" lookups from the catalog without an Assistants run.
+
+    A lookup is only answered locally when the best ranked entry's names
+    cover every word of the target and no runner-up's names do as well;
+    anything else returns None and goes to the model as usual.
+    """
+
+    def __init__(self, mesh_manager, client, scene_index=None):
+        self.mesh_manager = mesh_manager
+        self.client = client
+        self.scene_index = scene_index
+        self.stats = FastPathStats()
+        # Appends answered exchanges to existing threads off the request path
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='fast-path')
+
+    def resolve(self, target):
+        """Catalog entry for the target phrase, or None if not confident"""
+        tokens = tokenize(target)
+        if not tokens:
+            return None
+        ranked = self.mesh_manager.rank_meshes(target, limit=3)
+        if not ranked or not covers(name_tokens(ranked[0]), tokens):
+            return None
+        if any(covers(name_tokens(other), tokens) for other in ranked[1:]):
+            return None
+        # An entry pointing at a node the model doesn't have is left to the assistant
+        if self.scene_index is not None and self.scene_index.check_mesh_name(ranked[0]['mesh_name']):
+            return None
+        return ranked[0]
+
+    def answer(self, message, thread_id=None):
+        """{response, actions, thread_id} for a lookup answered locally, or None"""
+        started = time.perf_counter()
+        lookup = parse_lookup(message or '')
+        entry = self.resolve(lookup[1]) if lookup else None
+        if entry is None:
+            self.stats.record(False, time.perf_counter() - started)
+            return None
+
+        action_name = lookup[0]
+        parameters = {"mesh_name": entry['mesh_name']}
+        if action_name == 'highlight_object':
+            parameters["color"] = HIGHLIGHT_COLOR
+            response = f"I've highlighted the **{entry['display_name']}** in red."
+        else:
+            response = f"Zooming to the **{entry['display_name']}**."
+        if self.scene_index is not None:
+            parameters.update(self.scene_index.camera_target(entry['mesh_name']))
+        if entry.get('description'):
+            response += f" {entry['description'].strip()}"
+
+        response_data = {
+            "response": response,
+            "actions": [{"name": action_name, "parameters": parameters}],
+            "thread_id": thread_id
+        }
+        if thread_id:
+            self.executor.submit(self.remember, thread_id, message, response)
+        elapsed = time.perf_counter() - started
+        self.stats.record(True, elapsed)
+        logger.info("Fast path answered %r with %s in %.1fms", message, entry['mesh_id'], elapsed * 1000)
+        return response_data
+
+    def remember(self, thread_id, message, response):
+        """Keep the thread's history complete so follow-up questions still make sense"""
+        try:
+            for role, content in (("user", message), ("assistant", response)):
+                self.client.beta.threads.messages.create(
+                    thread_id=thread_id,
+                    role=role,
+                    content=content
+                )
+        except Exception as e:
+            logger.warning("Could not add fast path exchange to thread %s: %s", thread_id, e)
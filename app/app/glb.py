@@ -0,0 +1,95 @@
+# glb.py
+import json
+import mmap
+import struct
+
+import numpy as np
+
+GLB_MAGIC = b'glTF'
+JSON_CHUNK = 0x4E4F534A
+BIN_CHUNK = 0x004E4942
+
+COMPONENT_TYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+
+
+def read_gltf_json(path):
+    """glTF JSON document of a .glb or .gltf file, without reading any binary data"""
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if header[:4] != GLB_MAGIC:
+            f.seek(0)
+            return json.load(f)
+        _, version, _ = struct.unpack('<4sII', header)
+        if version != 2:
+            raise ValueError(f"{path}: unsupported GLB version {version}")
+        chunk_length, chunk_type = struct.unpack('<II', f.read(8))
+        if chunk_type != JSON_CHUNK:
+            raise ValueError(f"{path}: first GLB chunk is not JSON")
+        return json.loads(f.read(chunk_length))
+
+
+class GLBFile:
+    """A memory-mapped .glb: the JSON chunk parsed, the binary chunk left in the map.
+
+    Accessor data is only paged in when accessor() is asked for it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, length = struct.unpack_from('<4sII', self._map, 0)
+        if magic != GLB_MAGIC or version != 2:
+            self.close()
+            raise ValueError(f"{path}: not a glTF 2.0 binary file")
+
+        self.document = None
+        self.binary = None
+        offset = 12
+        while offset + 8 <= min(length, len(self._map)):
+            chunk_length, chunk_type = struct.unpack_from('<II', self._map, offset)
+            start = offset + 8
+            if chunk_type == JSON_CHUNK:
+                self.document = json.loads(self._map[start:start + chunk_length])
+            elif chunk_type == BIN_CHUNK and self.binary is None:
+                self.binary = memoryview(self._map)[start:start + chunk_length]
+            offset = start + chunk_length
+        if self.document is None:
+            self.close()
+            raise ValueError(f"{path}: no JSON chunk")
+
+    def accessor(self, index):
+        """Accessor contents as a (count, components) array viewing the mapped file"""
+        accessor = self.document['accessors'][index]
+        dtype = np.dtype(COMPONENT_TYPES[accessor['componentType']]).newbyteorder('<')
+        components = TYPE_SIZES[accessor['type']]
+        count = accessor['count']
+        if 'bufferView' not in accessor:
+            return np.zeros((count, components), dtype=dtype)
+        view = self.document['bufferViews'][accessor['bufferView']]
+        if view['buffer'] != 0 or self.binary is None:
+            raise ValueError(f"{self.path}: accessor {index} is not in the GLB binary chunk")
+        offset = view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+        stride = view.get('byteStride') or dtype.itemsize * components
+        return np.ndarray((count, components), dtype=dtype, buffer=self.binary,
+                          offset=offset, strides=(stride, dtype.itemsize))
+
+    def close(self):
+        self.binary = None
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
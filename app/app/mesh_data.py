@@ -1,34 +1,221 @@
 # mesh_data.py
-from dataclasses import dataclass, asdict
+import argparse
+import csv
+from dataclasses import dataclass, field
+import itertools
 import json
+import logging
+import math
 import os
+import sys
+import threading
+import time
 from pathlib import Path
 
-@dataclass
+import numpy as np
+
+from app.catalog_snapshot import (CatalogSnapshot, catalog_version, latest_generation, publish_snapshot,
+                                   snapshot_lock, update_snapshot, write_snapshot)
+from app.glb import read_gltf_json
+from app.mesh_search import MeshSearchIndex
+from app.mesh_store import JSONMeshStore, SQLiteMeshStore
+from app.semantic_index import SemanticMeshIndex
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for a catalog snapshot published by another process
+RELOAD_INTERVAL = float(os.getenv('MESH_RELOAD_INTERVAL', '1.0'))
+
+@dataclass(frozen=True, slots=True)
 class MeshMetadata:
+    """One catalog entry; mesh names and categories are interned, as many entries share them"""
     mesh_name: str  # The actual mesh name in the 3D scene
     display_name: str  # User-friendly name
     description: str
     category: str
-    aliases: list[str]  # Alternative names or descriptions
+    aliases: tuple[str, ...] = ()  # Alternative names or descriptions
     properties: dict = None
 
+    def __post_init__(self):
+        object.__setattr__(self, 'mesh_name', sys.intern(self.mesh_name))
+        object.__setattr__(self, 'category', sys.intern(self.category))
+        object.__setattr__(self, 'aliases', tuple(self.aliases))
+
+    def to_dict(self):
+        """The entry in the mesh_metadata.json format"""
+        return {
+            "mesh_name": self.mesh_name,
+            "display_name": self.display_name,
+            "description": self.description,
+            "category": self.category,
+            "aliases": list(self.aliases),
+            "properties": dict(self.properties or {}),
+        }
+
+
+IMPORT_FIELDS = ('mesh_id', 'mesh_name', 'display_name', 'description', 'category', 'aliases', 'properties')
+
+
+def read_csv_rows(path):
+    """One dict per CSV row; aliases are separated by ';' and properties may be JSON"""
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+
+def read_jsonl_rows(path):
+    """One JSON object (still as text) per non-empty line"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def read_gltf_extras(path):
+    """One row per named node carrying extras (node extras override its mesh's extras)"""
+    document = read_gltf_json(path)
+    meshes = document.get('meshes', [])
+    for node in document.get('nodes', []):
+        extras = {}
+        if 'mesh' in node and isinstance(meshes[node['mesh']].get('extras'), dict):
+            extras.update(meshes[node['mesh']]['extras'])
+        if isinstance(node.get('extras'), dict):
+            extras.update(node['extras'])
+        if extras and node.get('name'):
+            yield {"mesh_name": node['name'], **extras}
+
+
+IMPORT_READERS = {
+    '.csv': read_csv_rows,
+    '.jsonl': read_jsonl_rows,
+    '.ndjson': read_jsonl_rows,
+    '.glb': read_gltf_extras,
+    '.gltf': read_gltf_extras,
+}
+
+
+def read_import_rows(path):
+    reader = IMPORT_READERS.get(Path(path).suffix.lower())
+    if reader is None:
+        raise ValueError(f"Don't know how to import {path} (expected one of {', '.join(IMPORT_READERS)})")
+    return reader(path)
+
+
+def validate_row(row):
+    """(mesh_id, MeshMetadata) for one imported row, or ValueError.
+
+    Columns other than IMPORT_FIELDS are kept as properties.
+    """
+    if isinstance(row, str):
+        row = json.loads(row)
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+    row = {key: value for key, value in row.items() if key is not None and value not in (None, '')}
+
+    mesh_name = row.get('mesh_name')
+    if not isinstance(mesh_name, str) or not mesh_name.strip():
+        raise ValueError("mesh_name is required")
+    for key in ('mesh_id', 'display_name', 'description', 'category'):
+        if not isinstance(row.get(key, ''), str):
+            raise ValueError(f"{key} must be a string")
+
+    aliases = row.get('aliases', [])
+    if isinstance(aliases, str):
+        aliases = aliases.split(';')
+    if not isinstance(aliases, list) or not all(isinstance(alias, str) for alias in aliases):
+        raise ValueError("aliases must be a list of strings")
+
+    properties = row.get('properties', {})
+    if isinstance(properties, str):
+        properties = json.loads(properties)
+    if not isinstance(properties, dict):
+        raise ValueError("properties must be an object")
+    properties = {**properties, **{key: value for key, value in row.items() if key not in IMPORT_FIELDS}}
+
+    mesh_name = mesh_name.strip()
+    return row.get('mesh_id', mesh_name).strip(), MeshMetadata(
+        mesh_name=mesh_name,
+        display_name=row.get('display_name', mesh_name).strip(),
+        description=row.get('description', '').strip(),
+        category=row.get('category', '').strip(),
+        aliases=tuple(alias.strip() for alias in aliases if alias.strip()),
+        properties=properties
+    )
+
+
+def region_error(box_min, box_max):
+    """Error dict if box_min and box_max aren't two [x, y, z] corners with min <= max, else None"""
+    for name, corner in (("min", box_min), ("max", box_max)):
+        if (not isinstance(corner, (list, tuple)) or len(corner) != 3
+                or not all(isinstance(value, (int, float)) and math.isfinite(value) for value in corner)):
+            return {"status": "error", "message": f"{name} must be three numbers [x, y, z]"}
+    if any(low > high for low, high in zip(box_min, box_max)):
+        return {"status": "error", "message": "Every coordinate of min must be at most the same one of max"}
+    return None
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    seconds: float = 0.0
+    errors: list[str] = field(default_factory=list)
+
+    MAX_ERRORS = 20
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"{self.rows} rows: {self.imported} imported, {self.duplicates} duplicates, "
+                f"{self.invalid} invalid in {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/sec)")
+
 class MeshDataManager:
-    def __init__(self):
+    def __init__(self, store=None):
         self.mesh_data = {}
+        self.index = MeshSearchIndex()
         self.app_root = Path(__file__).parent
         self.metadata_path = self.app_root / 'static' / 'mesh_metadata.json'
-        print(f"Looking for mesh metadata at: {self.metadata_path}")
+        self.cache_dir = Path(os.getenv('MESH_CACHE_DIR', self.app_root / 'cache'))
+        # Read-only view of the catalog shared by every worker on the host
+        self.snapshot_path = self.cache_dir / 'catalog.snapshot'
+        self._checked = 0.0
+        self._reloading = False
+        self._reload_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # Built lazily on the first semantic search, refreshed when the catalog changes
+        self.semantic_index = None
+        self._semantic_stale = True
+        self._semantic_lock = threading.Lock()
+        self._version = None
+        self._ids_by_mesh = None
+        # SceneIndex of the model the catalog describes, for spatial queries
+        self.scene_index = None
+        # Called with the manager whenever the catalog changes
+        self.listeners = []
+        self.store = store or self.default_store()
+        logger.info("Looking for mesh metadata at: %s", self.store.path)
         self.load_data()
 
+    def default_store(self):
+        """SQLite database at MESH_DB_PATH when MESH_STORE=sqlite, else the JSON file"""
+        if os.getenv('MESH_STORE', 'json') == 'sqlite':
+            return SQLiteMeshStore(Path(os.getenv('MESH_DB_PATH', self.app_root / 'data' / 'mesh_metadata.sqlite3')))
+        return JSONMeshStore(self.metadata_path)
+
     def load_data(self):
-        try:
-            with open(self.metadata_path, 'r') as f:
-                self.mesh_data = json.load(f)
-                print(f"Successfully loaded mesh data: {self.mesh_data}")
-        except FileNotFoundError:
-            print(f"File not found at {self.metadata_path}, creating default data")
-            self.mesh_data = {
+        if self.store.is_empty() and self.metadata_path.exists():
+            # First start on a new store: seed it from the JSON catalog
+            logger.info("Importing %s into %s", self.metadata_path, self.store.path)
+            self.store.upsert({}, JSONMeshStore(self.metadata_path).load())
+        if not self.store.is_empty():
+            self.mesh_data = self.current_snapshot()
+            logger.info("Successfully loaded %d meshes from %s", len(self.mesh_data), self.store.path)
+        else:
+            logger.warning("No mesh data at %s, creating default data", self.store.path)
+            default_data = {
                 "Item": {
                     "mesh_name": "Item",  # Actual mesh name in the scene
                     "display_name": "Front Panel Assembly",
@@ -43,59 +230,297 @@ class MeshDataManager:
                 }
                 # Add more items as needed
             }
-            self.save_data()
+            self.store.upsert({}, default_data)
+            self.mesh_data = self.current_snapshot()
+        self.index.rebuild(self.mesh_data)
+        self.catalog_changed()
+
+    def _matching_snapshot(self):
+        """The snapshot on disk if it was written from the store as it is now, else None"""
+        stamp = self.store.stamp()
+        try:
+            snapshot = CatalogSnapshot(self.snapshot_path)
+        except (FileNotFoundError, ValueError):
+            return None
+        # A store without a stamp can't tell, so it is always republished
+        if stamp is not None and snapshot.source_stamp == stamp:
+            return snapshot
+        return None
+
+    def current_snapshot(self):
+        """Snapshot of the store, reusing the one on disk if the store hasn't changed since it was written"""
+        snapshot = self._matching_snapshot()
+        if snapshot is not None:
+            return snapshot
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        with snapshot_lock(self.snapshot_path):
+            # Another process may have been publishing this very change
+            snapshot = self._matching_snapshot()
+            if snapshot is None:
+                write_snapshot(self.snapshot_path, self.store.load(), latest_generation(self.snapshot_path) + 1,
+                               self.store.stamp())
+                snapshot = CatalogSnapshot(self.snapshot_path)
+                logger.info("Published catalog snapshot generation %d (%d meshes)",
+                            snapshot.generation, len(snapshot))
+        return snapshot
+
+    def maybe_refresh(self):
+        """Start reloading the catalog in the background if another process changed it.
+
+        Checks at most every RELOAD_INTERVAL seconds; requests keep using
+        the current catalog and index until the new ones are swapped in.
+        """
+        now = time.monotonic()
+        if now - self._checked < RELOAD_INTERVAL or self._reloading:
+            return
+        self._checked = now
+        try:
+            key = CatalogSnapshot.file_key(self.snapshot_path)
+        except FileNotFoundError:
+            key = None
+        if key == self.mesh_data.key and self.store.stamp() == self.mesh_data.source_stamp:
+            return
+        with self._reload_lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self.reload, name='catalog-reload', daemon=True).start()
+
+    def reload(self):
+        """Swap in the current snapshot and an index built from it"""
+        try:
+            with self._write_lock:
+                snapshot = self.current_snapshot()
+                if snapshot.key == self.mesh_data.key:
+                    return
+                index = MeshSearchIndex()
+                index.rebuild(snapshot)
+                # Entries before the index, so ids it returns are always found
+                self.mesh_data = snapshot
+                self.index = index
+            logger.info("Reloaded catalog generation %d (%d meshes)", snapshot.generation, len(snapshot))
+            self.catalog_changed()
+        except Exception:
+            logger.exception("Catalog reload failed")
+        finally:
+            self._reloading = False
+
+    def catalog_changed(self):
+        """Invalidate everything derived from the catalog"""
+        self._version = None
+        self._ids_by_mesh = None
+        self._semantic_stale = True
+        for listener in self.listeners:
+            listener(self)
+
+    @property
+    def version(self):
+        """Content hash of the catalog, for caching things rendered from it"""
+        if self._version is None:
+            # Snapshots carry the hash they were written with
+            self._version = getattr(self.mesh_data, 'version', None) or catalog_version(self.mesh_data)
+        return self._version
 
     def save_data(self):
-        self.metadata_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.metadata_path, 'w') as f:
-            json.dump(self.mesh_data, f, indent=2)
-            print(f"Successfully saved mesh data to {self.metadata_path}")
+        with self._write_lock:
+            self.store.save(self.mesh_data)
+            self.mesh_data = publish_snapshot(self.snapshot_path, self.store.load(), self.store.stamp())
+        logger.info("Successfully saved mesh data to %s", self.store.path)
+        self.catalog_changed()
+
+    def upsert_meshes(self, entries):
+        """Add or replace several entries with a single write to the store, then publish a new snapshot"""
+        with self._write_lock, snapshot_lock(self.snapshot_path):
+            previous = self.mesh_data
+            stamp = self.store.stamp()
+            try:
+                up_to_date = (stamp is not None and stamp == previous.source_stamp
+                              and CatalogSnapshot.file_key(self.snapshot_path) == previous.key)
+            except FileNotFoundError:
+                up_to_date = False
+            # Merge into the store's current contents, which may have newer writes from other processes
+            catalog = self.store.upsert(self.store.load(), entries)
+            if up_to_date:
+                update_snapshot(self.snapshot_path, previous, entries, previous.generation + 1, self.store.stamp())
+            else:
+                write_snapshot(self.snapshot_path, catalog, latest_generation(self.snapshot_path) + 1,
+                               self.store.stamp())
+            # Entries before the index, so ids it returns are always found
+            self.mesh_data = CatalogSnapshot(self.snapshot_path)
+            if up_to_date:
+                for mesh_id, data in entries.items():
+                    self.index.add(mesh_id, data)
+            else:
+                # Another process changed the catalog too; index everything it changed
+                index = MeshSearchIndex()
+                index.rebuild(self.mesh_data)
+                self.index = index
+        self.catalog_changed()
+
+    def bulk_import(self, rows, dry_run=False):
+        """Validate and dedupe rows, then write them in one batch and index them once.
+
+        Later rows with the same mesh_id replace earlier ones. Returns an
+        ImportReport; nothing is written when dry_run is set.
+        """
+        report = ImportReport()
+        started = time.perf_counter()
+        entries = {}
+        for number, row in enumerate(rows, 1):
+            report.rows += 1
+            try:
+                mesh_id, metadata = validate_row(row)
+            except ValueError as e:
+                report.invalid += 1
+                if len(report.errors) < report.MAX_ERRORS:
+                    report.errors.append(f"row {number}: {e}")
+                continue
+            if mesh_id in entries:
+                report.duplicates += 1
+            entries[mesh_id] = metadata.to_dict()
+        if entries and not dry_run:
+            self.upsert_meshes(entries)
+        report.imported = len(entries)
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def import_json(self, path):
+        """Upsert every entry of a catalog in the mesh_metadata.json format"""
+        self.upsert_meshes(JSONMeshStore(Path(path)).load())
+
+    def export_json(self, path):
+        """Write the catalog out in the mesh_metadata.json format"""
+        JSONMeshStore(Path(path)).save(self.mesh_data)
 
     def get_mesh_by_description(self, query):
         """Find mesh name based on description, display name, or aliases"""
-        query = query.lower()
-        for mesh_id, data in self.mesh_data.items():
-            # Check display name
-            if query in data['display_name'].lower():
-                print("Found the mesh by display name!")
-                return data['mesh_name']
-            # Check description
-            if query in data['description'].lower():
-                print("Found the mesh by description!")
-                return data['mesh_name']
-            # Check aliases
-            if any(query in alias.lower() for alias in data.get('aliases', [])):
-                print("Found the mesh by alias!")
-                return data['mesh_name']
-        return None
+        mesh_id = self.index.first_match(query)
+        if mesh_id is None:
+            # No substring hit, fall back to the best typo-tolerant match, but only
+            # if it accounts for every word of the query rather than just scoring best
+            ranked = self.index.rank(query, limit=1)
+            if not ranked or not self.index.covers(ranked[0][0], query):
+                return None
+            mesh_id = ranked[0][0]
+        logger.debug("Found the mesh for %r: %s", query, mesh_id)
+        return self.mesh_data[mesh_id]['mesh_name']
 
 
     def get_mesh_info(self, mesh_name):
         return self.mesh_data.get(mesh_name)
 
     def add_mesh_info(self, mesh_name, display_name, description, category, properties=None):
-        self.mesh_data[mesh_name] = {
+        self.upsert_meshes({mesh_name: {
             "mesh_name": mesh_name,
             "display_name": display_name,
             "description": description,
             "category": category,
             "properties": properties or {}
-        }
-        self.save_data()
+        }})
 
     def get_all_mesh_info(self):
+        """Read-only view of the whole catalog; entries are decoded as they are read"""
         return self.mesh_data
 
-    def search_mesh_by_description(self, query):
-        """Search for meshes based on description or display name"""
-        results = []
-        for mesh_id, data in self.mesh_data.items():
-            print(f"Searching for {query} in {data['display_name']}")
-            if (query.lower() in data['description'].lower() or 
-                query.lower() in data['display_name'].lower()):
-                results.append(data)
-        return results
+    def search_mesh_by_description(self, query, limit=None):
+        """Search for meshes based on description or display name.
+
+        With a limit, returns the top scored matches instead (see rank_meshes).
+        """
+        if limit is not None:
+            return self.rank_meshes(query, limit)
+        return [self.mesh_data[mesh_id] for mesh_id in self.index.search(query)]
+
+    def rank_meshes(self, query, limit=5):
+        """Top-k typo tolerant matches across all fields, best first, with scores"""
+        return [
+            {"mesh_id": mesh_id, "score": round(score, 4), **self.mesh_data[mesh_id]}
+            for mesh_id, score in self.index.rank(query, limit)
+        ]
     
+    def semantic_search(self, query, limit=5):
+        """Meaning-based matches for free-form questions, best first, with scores"""
+        with self._semantic_lock:
+            if self._semantic_stale:
+                if self.semantic_index is None:
+                    self.semantic_index = SemanticMeshIndex(self.cache_dir)
+                self.semantic_index.build(self.mesh_data)
+                self._semantic_stale = False
+            ranked = self.semantic_index.query(query, limit)
+        return [
+            {"mesh_id": mesh_id, "score": round(score, 4), **self.mesh_data[mesh_id]}
+            for mesh_id, score in ranked
+        ]
+
+    def catalog_entries(self, mesh_name):
+        """Catalog entries describing one scene object (several items can share a mesh)"""
+        if self._ids_by_mesh is None:
+            ids_by_mesh = {}
+            for mesh_id, data in self.mesh_data.items():
+                ids_by_mesh.setdefault(data.get('mesh_name'), []).append(mesh_id)
+            self._ids_by_mesh = ids_by_mesh
+        return [
+            {"mesh_id": mesh_id, **{key: self.mesh_data[mesh_id].get(key)
+                                    for key in ('display_name', 'description', 'category')}}
+            for mesh_id in self._ids_by_mesh.get(mesh_name, [])
+        ]
+
+    def _spatial(self, mesh_name=None):
+        """(spatial index, error dict) for a query, optionally about one object"""
+        spatial = self.scene_index.spatial() if self.scene_index is not None else None
+        if spatial is None:
+            return None, {"status": "error", "message": "No scene model to search"}
+        if mesh_name is not None and mesh_name not in spatial.positions:
+            error = self.scene_index.check_mesh_name(mesh_name)
+            return None, error or {"status": "error", "message": f"{mesh_name} has no geometry in the scene"}
+        return spatial, None
+
+    def _scene_object(self, spatial, mesh_name, **extra):
+        box_min, box_max = spatial.box(mesh_name)
+        return {
+            "mesh_name": mesh_name,
+            **extra,
+            "center": ((box_min + box_max) / 2).round(4).tolist(),
+            "entries": self.catalog_entries(mesh_name)
+        }
+
+    def nearby_meshes(self, mesh_name, limit=5):
+        """Objects closest to mesh_name in the scene, nearest first, with their catalog entries"""
+        spatial, error = self._spatial(mesh_name)
+        if error:
+            return error
+        hits = spatial.nearest(*spatial.box(mesh_name), k=limit, exclude={mesh_name})
+        return [self._scene_object(spatial, name, distance=round(gap, 4), center_distance=round(distance, 4))
+                for name, gap, distance in hits]
+
+    def meshes_in_region(self, box_min, box_max, contained=False, exclude=(), limit=20):
+        """Objects overlapping (or with contained, entirely inside) a box, closest to its center first"""
+        error = region_error(box_min, box_max)
+        if error:
+            return error
+        spatial, error = self._spatial()
+        if error:
+            return error
+        names = (spatial.contained if contained else spatial.intersecting)(box_min, box_max)
+        center = (np.asarray(box_min, dtype=np.float64) + np.asarray(box_max, dtype=np.float64)) / 2
+        found = []
+        for name in names:
+            if name in exclude:
+                continue
+            low, high = spatial.box(name)
+            found.append((float(np.linalg.norm((low + high) / 2 - center)), name))
+        found.sort()
+        return [self._scene_object(spatial, name, center_distance=round(distance, 4))
+                for distance, name in found[:limit]]
+
+    def region_around(self, mesh_name, margin=0.0):
+        """(min, max) of mesh_name's bounds grown by margin, or an error dict"""
+        spatial, error = self._spatial(mesh_name)
+        if error:
+            return error
+        box_min, box_max = spatial.box(mesh_name)
+        return (box_min - margin).tolist(), (box_max + margin).tolist()
+
     def search_meshes(self, query):
         return self.search_mesh_by_description(query)
 
@@ -112,4 +537,36 @@ class MeshDataManager:
         if self.app_root.joinpath('static').exists():
             print(f"Contents of static directory:")
             for item in self.app_root.joinpath('static').iterdir():
-                print(f"  {item}")
\ No newline at end of file
+                print(f"  {item}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the mesh catalog")
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help="bulk import CSV, JSONL or glTF node extras")
+    import_parser.add_argument('paths', nargs='+')
+    import_parser.add_argument('--dry-run', action='store_true', help="validate without writing")
+    export_parser = commands.add_parser('export', help="write the catalog as mesh_metadata.json")
+    export_parser.add_argument('path')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.command == 'export':
+        manager = MeshDataManager()
+        manager.export_json(args.path)
+        print(f"Exported {len(manager.mesh_data)} meshes to {args.path}")
+        return
+
+    try:
+        sources = [read_import_rows(path) for path in args.paths]
+    except ValueError as e:
+        parser.error(str(e))
+    manager = MeshDataManager()
+    report = manager.bulk_import(itertools.chain.from_iterable(sources), dry_run=args.dry_run)
+    for error in report.errors:
+        print(f"  {error}")
+    print(report.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,486 @@
+# mesh_search.py
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from itertools import accumulate, combinations
+import math
+import re
+import sys
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "can", "do", "find", "for", "i", "in", "is", "it",
+    "me", "of", "on", "or", "show", "the", "to", "where", "which", "with",
+})
+
+# Field weights used as term frequencies for BM25
+FIELD_WEIGHTS = {
+    "display_name": 3.0,
+    "aliases": 2.0,
+    "description": 1.0,
+    "category": 1.0,
+    "properties": 1.0,
+}
+
+
+def _ngrams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def max_edits(token):
+    """Edit distance tolerated for a query token of this length"""
+    if len(token) < 4:
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def _vocab_edits(token):
+    """Deletion depth stored for a vocabulary token.
+
+    Symmetric-delete lookups need the vocabulary side to go as deep as any
+    query that could reach it, i.e. queries up to two characters longer.
+    """
+    return max(max_edits(token + "??"), 1)
+
+
+def _deletes(token, distance):
+    variants = {token}
+    for d in range(1, min(distance, len(token) - 1) + 1):
+        for positions in combinations(range(len(token)), d):
+            variants.add(''.join(c for i, c in enumerate(token) if i not in positions))
+    return variants
+
+
+def edit_distance(a, b):
+    """Optimal string alignment (Damerau-Levenshtein) distance"""
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2] and
+                    a[i - 2] == b[j - 1]):
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def trigram_similarity(a, b):
+    """Dice coefficient over padded character trigrams"""
+    grams_a = _ngrams(f" {a} ", 3)
+    grams_b = _ngrams(f" {b} ", 3)
+    if not grams_a or not grams_b:
+        return 0.0
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def _sorted_add(rows, row):
+    """Add row to a sorted array unless it is there; returns its position"""
+    if not rows or rows[-1] < row:
+        # Rows of new entries only ever go last
+        rows.append(row)
+        return len(rows) - 1
+    position = bisect_left(rows, row)
+    if rows[position] != row:
+        rows.insert(position, row)
+    return position
+
+
+def _sorted_discard(rows, row):
+    """Drop row from a sorted array; returns its position, or None if it wasn't there"""
+    position = bisect_left(rows, row)
+    if position < len(rows) and rows[position] == row:
+        del rows[position]
+        return position
+    return None
+
+
+class MeshSearchIndex:
+    """Inverted n-gram index over mesh metadata.
+
+    Lookups keep the substring semantics of the original linear scans: the
+    n-gram postings only narrow the candidate set, every candidate is then
+    verified with ``in`` against its pre-lowered fields. Results come back
+    in catalog (insertion) order, which is what the scans returned.
+
+    ``rank`` is the scored mode: BM25 over weighted field tokens, with query
+    tokens expanded to prefix and typo candidates (drawn from a deletion
+    neighbourhood of the vocabulary) weighted by trigram similarity.
+
+    Entries are stored by row, their catalog position, in parallel column
+    lists, and postings are sorted arrays of rows, so an entry costs a few
+    machine words per n-gram and token instead of a set or dict slot each.
+    """
+
+    NGRAM = 3
+    PREFIX_EXPANSIONS = 20
+    PHRASE_BONUS = 1.0
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    # Candidates few enough to check against their text instead of more postings
+    VERIFY_CANDIDATES = 32
+    # Join the fields and rows scanned by _scan; queries containing them are checked row by row
+    FIELD_SEPARATOR = '\x00'
+    ROW_SEPARATOR = '\x01'
+
+    def __init__(self):
+        self._rows = {}        # mesh_id -> row, its catalog position
+        self._ids = []         # row -> mesh_id, None once removed
+        self._display = []     # row -> lowered display name
+        self._description = []
+        self._aliases = []     # row -> tuple of lowered aliases
+        self._category_ids = array('I')  # row -> index into _category_names, for tie breaking
+        self._category_names = []
+        self._category_index = {}
+        self._tokens = []      # row -> tokens it is posted under, to unindex it
+        self._lengths = array('d')  # row -> weighted token count
+        self._live = 0
+        self._text_grams = defaultdict(lambda: array('I'))   # display name + description
+        self._alias_grams = defaultdict(lambda: array('I'))
+        self._postings = {}    # token -> (rows, weighted tfs), both sorted by row
+        self._total_length = 0.0
+        self._vocab = []       # sorted, for prefix expansion
+        self._delete_map = defaultdict(set)  # deletion variant -> tokens
+        self._expansions = {}  # query token -> [(token, weight)], cleared on change
+        self._columns = None   # numpy _lengths and per-row category sort rank, cleared on change
+        self._blobs = None     # joined fields for _scan, cleared on change
+
+    def __len__(self):
+        return self._live
+
+    def rebuild(self, mesh_data):
+        """Index a whole catalog from scratch"""
+        self.__init__()
+        for mesh_id, data in mesh_data.items():
+            self.add(mesh_id, data)
+
+    def add(self, mesh_id, data):
+        """Index (or re-index) a single catalog entry"""
+        row = self._rows.get(mesh_id)
+        if row is None:
+            row = self._rows[mesh_id] = len(self._ids)
+            self._ids.append(mesh_id)
+            self._display.append(None)
+            self._description.append(None)
+            self._aliases.append(())
+            self._category_ids.append(0)
+            self._tokens.append(())
+            self._lengths.append(0.0)
+        # Re-indexing only touches the postings that differ from the old version
+        old_text, old_alias_grams = self._row_grams(row)
+        if self._display[row] is not None:
+            self._live -= 1
+            self._total_length -= self._lengths[row]
+
+        display_name = data.get('display_name', '').lower()
+        description = data.get('description', '').lower()
+        aliases = tuple(alias.lower() for alias in data.get('aliases', []))
+        self._display[row] = display_name
+        self._description[row] = description
+        self._aliases[row] = aliases
+        self._live += 1
+
+        text_grams, alias_grams = self._row_grams(row)
+        self._discard(self._text_grams, old_text - text_grams, row)
+        for gram in text_grams - old_text:
+            _sorted_add(self._text_grams[gram], row)
+        self._discard(self._alias_grams, old_alias_grams - alias_grams, row)
+        for gram in alias_grams - old_alias_grams:
+            _sorted_add(self._alias_grams[gram], row)
+
+        category = data.get('category', '')
+        category_id = self._category_index.get(category)
+        if category_id is None:
+            category_id = self._category_index[category] = len(self._category_names)
+            self._category_names.append(sys.intern(category))
+        self._category_ids[row] = category_id
+
+        doc_tokens = self._weighted_tokens(data)
+        for token in self._tokens[row]:
+            if token not in doc_tokens:
+                self._unpost(token, row)
+        self._tokens[row] = tuple(sys.intern(token) for token in doc_tokens)
+        length = sum(doc_tokens.values())
+        self._lengths[row] = length
+        self._total_length += length
+        for token, tf in doc_tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = (array('I'), array('d'))
+                self._add_vocab(token)
+            rows, tfs = postings
+            position = _sorted_add(rows, row)
+            if len(tfs) < len(rows):
+                tfs.insert(position, tf)
+            else:
+                tfs[position] = tf
+        self._changed()
+
+    def remove(self, mesh_id, keep_position=False):
+        row = self._rows.get(mesh_id)
+        if row is None or self._display[row] is None:
+            return
+        text_grams, alias_grams = self._row_grams(row)
+        self._discard(self._text_grams, text_grams, row)
+        self._discard(self._alias_grams, alias_grams, row)
+        self._display[row] = self._description[row] = None
+        self._aliases[row] = ()
+        self._live -= 1
+        self._total_length -= self._lengths[row]
+        self._lengths[row] = 0.0
+        for token in self._tokens[row]:
+            self._unpost(token, row)
+        self._tokens[row] = ()
+        self._changed()
+        if not keep_position:
+            # The row stays empty; a later add of mesh_id goes last, as a new entry
+            self._ids[row] = None
+            del self._rows[mesh_id]
+
+    def _row_grams(self, row):
+        """(display name + description grams, alias grams) of a row, empty if it holds no entry"""
+        if self._display[row] is None:
+            return set(), set()
+        return self._field_grams((self._display[row], self._description[row])), self._field_grams(self._aliases[row])
+
+    def _unpost(self, token, row):
+        rows, tfs = self._postings[token]
+        del tfs[_sorted_discard(rows, row)]
+        if not rows:
+            del self._postings[token]
+            self._remove_vocab(token)
+
+    def _changed(self):
+        self._expansions.clear()
+        self._columns = None
+        self._blobs = None
+
+    def first_match(self, query):
+        """First entry whose display name, description or an alias contains query"""
+        matches = self._matches(query.lower(), include_aliases=True, first=True)
+        return self._ids[min(matches)] if matches else None
+
+    def search(self, query):
+        """All entries whose display name or description contains query, in catalog order"""
+        matches = self._matches(query.lower(), include_aliases=False)
+        return [self._ids[row] for row in sorted(matches)]
+
+    def rank(self, query, limit=5):
+        """Top ``limit`` (mesh_id, score) pairs for query, best first.
+
+        Ties are broken by category, then catalog order.
+        """
+        if limit < 1:
+            raise ValueError(f"limit must be at least 1, got {limit}")
+        n_docs = self._live
+        if not n_docs:
+            return []
+        avg_length = self._total_length / n_docs or 1.0
+        k1, b = self.BM25_K1, self.BM25_B
+        lengths, category_ranks = self._column_arrays()
+        scores = np.zeros(len(self._ids))
+        scored = np.zeros(len(self._ids), dtype=bool)
+
+        for query_token in set(tokenize(query)):
+            for token, weight in self._expand(query_token):
+                rows, tfs = self._postings[token]
+                idf = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+                # Copies, so a concurrent add can still resize the arrays
+                rows, tfs = np.array(rows, dtype=np.intp), np.array(tfs)
+                norm = k1 * (1 - b + b * lengths[rows] / avg_length)
+                scores[rows] += weight * idf * tfs * (k1 + 1) / (tfs + norm)
+                scored[rows] = True
+
+        phrase = query.lower().strip()
+        if len(phrase) >= self.NGRAM:
+            rows = np.fromiter(self._matches(phrase, include_aliases=True), dtype=np.intp)
+            scores[rows] += self.PHRASE_BONUS
+            scored[rows] = True
+
+        rows = np.flatnonzero(scored)
+        order = np.lexsort((rows, category_ranks[rows], -np.round(scores[rows], 6)))[:limit]
+        return [(self._ids[row], float(scores[row])) for row in rows[order].tolist()]
+
+    def covers(self, mesh_id, query):
+        """True if every query token matches the entry, exactly, as a prefix or within typo distance"""
+        row = self._rows.get(mesh_id)
+        tokens = set(tokenize(query))
+        if row is None or not tokens:
+            return False
+        row_tokens = set(self._tokens[row])
+        return all(any(token in row_tokens for token, _ in self._expand(query_token))
+                   for query_token in tokens)
+
+    def _column_arrays(self):
+        columns = self._columns
+        if columns is None:
+            category_order = np.argsort(np.argsort(self._category_names, kind='stable'))
+            category_ids = np.array(self._category_ids, dtype=np.intp)
+            columns = self._columns = (np.array(self._lengths), category_order[category_ids])
+        return columns
+
+    def _expand(self, query_token):
+        """Vocabulary tokens matching a query token, with similarity weights"""
+        expansions = self._expansions.get(query_token)
+        if expansions is not None:
+            return expansions
+
+        candidates = {}
+        if query_token in self._postings:
+            candidates[query_token] = 1.0
+        if len(query_token) >= self.NGRAM:
+            start = bisect_left(self._vocab, query_token)
+            for token in self._vocab[start:start + self.PREFIX_EXPANSIONS]:
+                if not token.startswith(query_token):
+                    break
+                candidates.setdefault(token, trigram_similarity(query_token, token))
+        distance = max_edits(query_token)
+        if distance and query_token not in self._postings:
+            seen = set()
+            for variant in _deletes(query_token, distance):
+                for token in self._delete_map.get(variant, ()):
+                    if token in seen or token in candidates:
+                        continue
+                    seen.add(token)
+                    if edit_distance(query_token, token) <= distance:
+                        candidates[token] = trigram_similarity(query_token, token)
+
+        expansions = list(candidates.items())
+        self._expansions[query_token] = expansions
+        return expansions
+
+    @staticmethod
+    def _weighted_tokens(data):
+        properties = data.get('properties') or {}
+        fields = {
+            "display_name": data.get('display_name', ''),
+            "aliases": ' '.join(data.get('aliases', [])),
+            "description": data.get('description', ''),
+            "category": data.get('category', ''),
+            "properties": ' '.join(str(value) for value in properties.values()),
+        }
+        weighted = defaultdict(float)
+        for field, text in fields.items():
+            for token in tokenize(text):
+                weighted[token] += FIELD_WEIGHTS[field]
+        return dict(weighted)
+
+    def _add_vocab(self, token):
+        insort(self._vocab, token)
+        for variant in _deletes(token, _vocab_edits(token)):
+            self._delete_map[variant].add(token)
+
+    def _remove_vocab(self, token):
+        position = bisect_left(self._vocab, token)
+        if position < len(self._vocab) and self._vocab[position] == token:
+            del self._vocab[position]
+        for variant in _deletes(token, _vocab_edits(token)):
+            tokens = self._delete_map.get(variant)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._delete_map[variant]
+
+    def _matches(self, query, include_aliases, first=False):
+        """Rows whose fields contain query; with first, only the earliest is sure to be included"""
+        if len(query) < self.NGRAM:
+            # Too short to have n-grams; fall back to a scan of the pre-lowered fields
+            return self._scan(query, include_aliases, first)
+        grams = _ngrams(query, self.NGRAM)
+        candidates = self._intersect(self._text_grams, grams)
+        if include_aliases:
+            candidates = candidates | self._intersect(self._alias_grams, grams)
+
+        matches = []
+        for row in candidates:
+            if (query in self._display[row] or query in self._description[row] or
+                    (include_aliases and any(query in alias for alias in self._aliases[row]))):
+                matches.append(row)
+        return matches
+
+    def _scan(self, query, include_aliases, first=False):
+        """Rows containing query, found with str.find over every row's fields joined into one string"""
+        if not query or self.FIELD_SEPARATOR in query or self.ROW_SEPARATOR in query:
+            return [row for row, display_name in enumerate(self._display) if display_name is not None and (
+                query in display_name or query in self._description[row] or
+                (include_aliases and any(query in alias for alias in self._aliases[row])))]
+        text, text_starts, aliases, alias_starts = self._joined_fields()
+        matches = self._find_rows(query, text, text_starts, first)
+        if include_aliases:
+            matches += self._find_rows(query, aliases, alias_starts, first)
+        return matches
+
+    def _joined_fields(self):
+        blobs = self._blobs
+        if blobs is None:
+            fields = self.FIELD_SEPARATOR
+            text = [f"{display_name}{fields}{description}" if display_name is not None else ''
+                    for display_name, description in zip(self._display, self._description)]
+            aliases = [fields.join(row_aliases) for row_aliases in self._aliases]
+            blobs = self._blobs = (*self._join_rows(text), *self._join_rows(aliases))
+        return blobs
+
+    def _join_rows(self, values):
+        """(one string of every row's value, start offset of each row)"""
+        starts = list(accumulate((len(value) + 1 for value in values), initial=0))
+        return self.ROW_SEPARATOR.join(values), starts
+
+    @staticmethod
+    def _find_rows(query, text, starts, first):
+        rows = []
+        position = text.find(query)
+        while position != -1:
+            row = bisect_right(starts, position) - 1
+            rows.append(row)
+            if first:
+                break
+            # At most one hit per row
+            position = text.find(query, starts[row + 1])
+        return rows
+
+    def _field_grams(self, values):
+        grams = set()
+        for value in values:
+            grams |= _ngrams(value, self.NGRAM)
+        return grams
+
+    @classmethod
+    def _intersect(cls, postings, grams):
+        """Rows in every posting of grams.
+
+        Starts from the rarest gram and stops once few candidates are left,
+        since _matches checks each candidate against its text anyway.
+        """
+        arrays = []
+        for gram in grams:
+            posting = postings.get(gram)
+            if not posting:
+                return set()
+            arrays.append(posting)
+        arrays.sort(key=len)
+        result = np.array(arrays[0], dtype=np.int64)
+        for posting in arrays[1:]:
+            if len(result) <= cls.VERIFY_CANDIDATES:
+                break
+            # A copy, so a concurrent add can still resize the array
+            posting = np.array(posting, dtype=np.int64)
+            positions = np.searchsorted(posting, result).clip(max=len(posting) - 1)
+            result = result[posting[positions] == result]
+        return set(result.tolist())
+
+    @staticmethod
+    def _discard(postings, grams, row):
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is not None:
+                _sorted_discard(posting, row)
+                if not posting:
+                    del postings[gram]
@@ -0,0 +1,143 @@
+# mesh_store.py
+from collections.abc import Mapping
+import json
+import os
+import sqlite3
+import threading
+
+
+class JSONMeshStore:
+    """The whole catalog in one JSON file, rewritten on every save.
+
+    Writes go to a temporary file that replaces the old one, so readers
+    never see a half written catalog, but concurrent writers still race:
+    the last one to save wins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def is_empty(self):
+        return not self.path.exists()
+
+    def stamp(self):
+        """Changes whenever the file does, including edits made outside the app"""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def upsert(self, mesh_data, entries):
+        """Apply entries to the in-memory catalog and write it out once"""
+        mesh_data.update(entries)
+        self.save(mesh_data)
+        return mesh_data
+
+    def save(self, mesh_data):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(mesh_data), f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class SQLiteMeshMapping(Mapping):
+    """Read-only dict view of the mesh table; entries are read on access"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, mesh_id):
+        row = self.store.connection().execute(
+            "SELECT data FROM meshes WHERE mesh_id = ?", (mesh_id,)).fetchone()
+        if row is None:
+            raise KeyError(mesh_id)
+        return json.loads(row[0])
+
+    def __iter__(self):
+        rows = self.store.connection().execute("SELECT mesh_id FROM meshes ORDER BY rowid")
+        return (mesh_id for mesh_id, in rows)
+
+    def __len__(self):
+        return self.store.connection().execute("SELECT COUNT(*) FROM meshes").fetchone()[0]
+
+    def items(self):
+        rows = self.store.connection().execute("SELECT mesh_id, data FROM meshes ORDER BY rowid")
+        return [(mesh_id, json.loads(data)) for mesh_id, data in rows]
+
+    def values(self):
+        return [data for _, data in self.items()]
+
+
+class ThreadLocalSQLite:
+    """One connection per thread to the SQLite file at self.path, in WAL mode.
+
+    Subclasses set self.local to a threading.local() and can override
+    busy_timeout, and isolation_level (None for autocommit, where the
+    caller issues its own BEGIN).
+    """
+
+    busy_timeout = 30
+    isolation_level = ''
+
+    def connection(self):
+        # sqlite3 connections can't be shared between threads
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(str(self.path), timeout=self.busy_timeout, isolation_level=self.isolation_level)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+
+class SQLiteMeshStore(ThreadLocalSQLite):
+    """Catalog in a SQLite database in WAL mode.
+
+    Upserts are batched into one transaction, so an import is all or
+    nothing and costs O(batch) rather than a rewrite of the catalog. Any
+    number of worker processes can read while one writes, and each reads
+    entries on demand through SQLiteMeshMapping instead of holding its own
+    copy of the catalog.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connection() as db:
+            # rowid keeps catalog order; an upsert of an existing id keeps its row
+            db.execute("CREATE TABLE IF NOT EXISTS meshes (mesh_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+
+    def load(self):
+        return SQLiteMeshMapping(self)
+
+    def is_empty(self):
+        return self.connection().execute("SELECT 1 FROM meshes LIMIT 1").fetchone() is None
+
+    def stamp(self):
+        """Write counter, bumped by every upsert from any process"""
+        return self.connection().execute("PRAGMA user_version").fetchone()[0]
+
+    def upsert(self, mesh_data, entries):
+        """Insert or replace entries in a single transaction"""
+        with self.connection() as db:
+            db.executemany(
+                "INSERT INTO meshes (mesh_id, data) VALUES (?, ?) "
+                "ON CONFLICT (mesh_id) DO UPDATE SET data = excluded.data",
+                [(mesh_id, json.dumps(data)) for mesh_id, data in entries.items()]
+            )
+            # The transaction holds the write lock, so the read and bump can't interleave
+            version = db.execute("PRAGMA user_version").fetchone()[0]
+            db.execute(f"PRAGMA user_version = {version + 1}")
+        return mesh_data
+
+    def save(self, mesh_data):
+        # Every upsert is already committed
+        pass
+
@@ -0,0 +1,296 @@
+# model_pipeline.py
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from app.catalog_snapshot import snapshot_lock
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Simplification ratios of the LOD variants, finest first
+LOD_RATIOS = (0.5, 0.2)
+# Keep named nodes and their extras, so meshes can still be found by name
+GLTFPACK_FLAGS = ['-cc', '-kn', '-ke']
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Precompressed siblings, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+MODEL_SUFFIXES = ('.glb',)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_atomic(path, data):
+    """Write data to path via a temp file, so readers never see a partial file"""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def writer_alive(tmp_path):
+    """False if the process named in a write_atomic temp file has exited"""
+    try:
+        pid = int(tmp_path.name.rsplit('.', 2)[-2])
+    except (IndexError, ValueError):
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists, but belongs to someone else
+        return True
+    return True
+
+
+def with_hash(manifest):
+    manifest["hash"] = content_hash(json.dumps(manifest, sort_keys=True).encode())[:16]
+    return manifest
+
+
+def precompress(path, data):
+    """Write .br/.gz siblings of path that are smaller than data; returns {encoding: bytes}"""
+    sizes = {}
+    for encoding, suffix in ENCODINGS:
+        if encoding == 'br':
+            if brotli is None:
+                continue
+            packed = brotli.compress(data, quality=11)
+        else:
+            packed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(packed) < len(data):
+            write_atomic(Path(str(path) + suffix), packed)
+            sizes[encoding] = len(packed)
+    return sizes
+
+
+class ModelPipeline:
+    """Optimized, content-hashed copies of the models in source_dir.
+
+    With gltfpack on PATH each model is quantized and meshopt compressed,
+    and simplified LOD variants are made from it; without it the original
+    is published as is. Every output is named after its hash, so it can be
+    cached forever, and gets precompressed gzip (and brotli, if the package
+    is installed) siblings. A model is only rebuilt when its hash changes.
+
+    Builds are meant to run at deploy time (python -m app.model_pipeline).
+    A server that finds a model changed or never built serves the raw file
+    for it and builds it in the background, writing into output_dir
+    (app/build/models for the app's pipeline) like the CLI does; workers
+    sharing output_dir take turns through a file lock. A model whose file
+    was only touched, e.g. by a fresh checkout, isn't rebuilt: its
+    content hash is compared before it is treated as changed.
+    """
+
+    def __init__(self, source_dir, output_dir, gltfpack=None, lod_ratios=LOD_RATIOS):
+        self.source_dir = Path(source_dir)
+        self.output_dir = Path(output_dir)
+        self.manifest_path = self.output_dir / 'manifest.json'
+        self.gltfpack = gltfpack or shutil.which('gltfpack')
+        self.lod_ratios = lod_ratios
+        self._manifest = None
+        self._stats = None
+        self._failed_stats = None
+        # (name, size, mtime_ns) -> content hash, for sources whose stat differs from the manifest's
+        self._source_hashes = {}
+        self._building = False
+        self._lock = threading.Lock()
+
+    def sources(self):
+        if not self.source_dir.is_dir():
+            return []
+        return sorted(path for path in self.source_dir.iterdir()
+                      if path.suffix.lower() in MODEL_SUFFIXES and path.is_file())
+
+    def _source_stats(self):
+        return tuple((path.name, path.stat().st_size, path.stat().st_mtime_ns) for path in self.sources())
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"models": {}}
+
+    def manifest(self):
+        """Manifest of the models built from the sources as they are now.
+
+        Models that still need building are left out, so the page loads
+        their raw files, and a background build is started for them.
+        """
+        stats = self._source_stats()
+        if stats == self._stats:
+            return self._manifest
+        manifest, complete = self._published(stats)
+        if complete:
+            with self._lock:
+                self._manifest, self._stats = manifest, stats
+        elif stats != self._failed_stats:
+            self._build_in_background()
+        return manifest
+
+    def _published(self, stats):
+        """(manifest on disk limited to models built from these source stats, whether it has them all)"""
+        models = self._read_manifest()['models']
+        current = {}
+        for name, size, mtime_ns in stats:
+            entry = models.get(name)
+            if entry and self._built_from(entry, name, size, mtime_ns) and self._complete(entry):
+                current[name] = entry
+        return with_hash({"models": current}), len(current) == len(stats)
+
+    def _built_from(self, entry, name, size, mtime_ns):
+        """True if entry was built from the source as it is now"""
+        built = entry.get('source_stat')
+        if built == [size, mtime_ns]:
+            return True
+        if built is not None and built[0] != size:
+            return False
+        # Same bytes with a new mtime (checkout, touch), or a manifest written without source_stat
+        key = (name, size, mtime_ns)
+        if key not in self._source_hashes:
+            try:
+                self._source_hashes[key] = content_hash((self.source_dir / name).read_bytes())
+            except FileNotFoundError:
+                return False
+        return self._source_hashes[key] == entry['source_hash']
+
+    def _build_in_background(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._background_build, name='model-build', daemon=True).start()
+
+    def _background_build(self):
+        stats = self._source_stats()
+        try:
+            manifest = self.build()
+            with self._lock:
+                self._manifest, self._stats = manifest, stats
+        except Exception:
+            # Not retried until a source changes again
+            logger.exception("Model build failed, serving the raw models")
+            self._failed_stats = stats
+        finally:
+            with self._lock:
+                self._building = False
+
+    def build(self, force=False):
+        """Build whatever changed and publish the manifest"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with snapshot_lock(self.manifest_path):
+            # Another worker may have just built the same sources
+            previous = self._read_manifest()['models']
+            models = {}
+            for source in self.sources():
+                stat = source.stat()
+                data = source.read_bytes()
+                source_hash = content_hash(data)
+                entry = previous.get(source.name)
+                if force or not entry or entry['source_hash'] != source_hash or not self._complete(entry):
+                    entry = self._build_model(source, data, source_hash)
+                models[source.name] = {**entry, "source_stat": [stat.st_size, stat.st_mtime_ns]}
+
+            manifest = with_hash({"models": models})
+            write_atomic(self.manifest_path, json.dumps(manifest, indent=2).encode())
+            self._remove_stale(manifest)
+        return manifest
+
+    def _complete(self, entry):
+        return all((self.output_dir / variant['file']).exists() for variant in [entry, *entry['lods']])
+
+    def _build_model(self, source, data, source_hash):
+        stem = source.stem
+        if self.gltfpack:
+            full = self._publish(stem, self._gltfpack(source, []))
+            lods = [{"ratio": ratio, **self._publish(f"{stem}.lod{level}",
+                                                     self._gltfpack(source, ['-si', str(ratio)]))}
+                    for level, ratio in enumerate(self.lod_ratios, 1)]
+            compression = 'meshopt'
+        else:
+            full = self._publish(stem, data)
+            lods = []
+            compression = None
+        logger.info("Built %s: %d -> %d bytes (%s), %d LOD(s)", source.name, len(data), full['bytes'],
+                    ', '.join(f'{k} {v}' for k, v in full['encoded'].items()) or 'no precompression', len(lods))
+        return {"source_hash": source_hash, "compression": compression, **full, "lods": lods}
+
+    def _gltfpack(self, source, flags):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / source.name
+            subprocess.run([self.gltfpack, '-i', str(source), '-o', str(output), *GLTFPACK_FLAGS, *flags],
+                           check=True, capture_output=True)
+            return output.read_bytes()
+
+    def _publish(self, stem, data):
+        name = f"{stem}.{content_hash(data)[:12]}.glb"
+        path = self.output_dir / name
+        if not path.exists():
+            write_atomic(path, data)
+        encoded = precompress(path, data)
+        return {"file": name, "url": f"/models/{name}", "bytes": len(data), "encoded": encoded}
+
+    def _remove_stale(self, manifest):
+        """Delete outputs the manifest no longer names, and temp files left by processes that died mid-write"""
+        keep = {self.manifest_path.name, self.manifest_path.name + '.lock'}
+        for entry in manifest['models'].values():
+            for variant in [entry, *entry['lods']]:
+                keep.add(variant['file'])
+                keep.update(variant['file'] + suffix for _, suffix in ENCODINGS)
+        for path in self.output_dir.iterdir():
+            if path.name in keep or (path.suffix == '.tmp' and writer_alive(path)):
+                continue
+            path.unlink(missing_ok=True)
+
+    def resolve(self, filename, accepted):
+        """(path, content encoding or None) to send for a published file, or None.
+
+        accepted is the set of encodings the client takes; only names in
+        the manifest are served.
+        """
+        for entry in self.manifest()['models'].values():
+            for variant in [entry, *entry['lods']]:
+                if variant['file'] != filename:
+                    continue
+                for encoding, suffix in ENCODINGS:
+                    if encoding in accepted and encoding in variant['encoded']:
+                        return self.output_dir / (filename + suffix), encoding
+                return self.output_dir / filename, None
+        return None
+
+
+def main():
+    app_root = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="Build the optimized models served from /models")
+    parser.add_argument('--force', action='store_true', help="rebuild even if nothing changed")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    pipeline = ModelPipeline(app_root / 'static' / 'models', app_root / 'build' / 'models')
+    if not pipeline.gltfpack:
+        print("gltfpack not found on PATH, publishing models uncompressed")
+    manifest = pipeline.build(force=args.force)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# response_cache.py
+from collections import OrderedDict
+import json
+import threading
+import time
+
+from app.fast_path import normalize_message
+from app.mesh_store import ThreadLocalSQLite
+
+
+class MemoryCacheBackend:
+    """In-process LRU dict; each worker process has its own"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (version, expires_at, value)
+        self.lock = threading.Lock()
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, version, value, expires_at):
+        with self.lock:
+            self.entries[key] = (version, expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def evict_except(self, version):
+        with self.lock:
+            for key in [key for key, entry in self.entries.items() if entry[0] != version]:
+                del self.entries[key]
+
+
+class SQLiteCacheBackend(ThreadLocalSQLite):
+    """LRU table in a SQLite file, shared by every worker process on the host"""
+
+    busy_timeout = 5
+
+    def __init__(self, path, max_entries=1000):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, version TEXT, value TEXT, expires_at REAL, used_at REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS response_cache_used ON response_cache (used_at)")
+
+    def get(self, key, now):
+        with self.connection() as db:
+            row = db.execute(
+                "SELECT value FROM response_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE response_cache SET used_at = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+
+    def set(self, key, version, value, expires_at):
+        now = time.time()
+        with self.connection() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?)",
+                (key, version, json.dumps(value), expires_at, now)
+            )
+            db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            db.execute(
+                "DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache "
+                "ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+            )
+
+    def evict_except(self, version):
+        with self.connection() as db:
+            db.execute("DELETE FROM response_cache WHERE version != ?", (version,))
+
+
+class ResponseCache:
+    """LRU+TTL cache of chat answers keyed by normalized question and catalog version.
+
+    Only first messages of a conversation are cached: later turns can depend
+    on the thread's history. A hit returns the stored response and actions
+    with no thread, so the next message starts a new conversation.
+    """
+
+    def __init__(self, backend, mesh_manager, ttl=3600):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        mesh_manager.listeners.append(self.catalog_changed)
+
+    @staticmethod
+    def key(message, version):
+        return f"{version}:{normalize_message(message or '')}"
+
+    def get(self, message, version):
+        value = self.backend.get(self.key(message, version), time.time())
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, message, version, response_data):
+        value = {"response": response_data["response"], "actions": response_data["actions"]}
+        self.backend.set(self.key(message, version), version, value, time.time() + self.ttl)
+
+    def catalog_changed(self, mesh_manager):
+        self.backend.evict_except(mesh_manager.version)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def make_response_cache(config, mesh_manager):
+    """Response cache for CHAT_RESPONSE_CACHE ('memory', 'sqlite' or 'off')"""
+    kind = config['CHAT_RESPONSE_CACHE']
+    if kind == 'off':
+        return None
+    if kind == 'sqlite':
+        backend = SQLiteCacheBackend(
+            mesh_manager.cache_dir / 'responses.sqlite3', config['CHAT_RESPONSE_CACHE_SIZE'])
+    elif kind == 'memory':
+        backend = MemoryCacheBackend(config['CHAT_RESPONSE_CACHE_SIZE'])
+    else:
+        raise ValueError(f"Unknown response cache backend: {kind}")
+    return ResponseCache(backend, mesh_manager, config['CHAT_RESPONSE_CACHE_TTL'])
@@ -1,20 +1,285 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, Response, abort, current_app, render_template, jsonify, request, send_file, stream_with_context
+from contextlib import nullcontext
 from openai import OpenAI
 import json
+import logging
 import time
 import os
+from app.admission import Overloaded, upstream_failure, upstream_overload
+from app.assistant_runs import RunRecord, RunStream, poll_run, stream_run
+from app.context_prompt import ContextPrompt
+from app.fast_path import FastPath
+from app.tools import mesh_tool_registry
 from app.mesh_data import MeshDataManager
+from app.model_pipeline import IMMUTABLE, ModelPipeline
+from app.scene_index import SceneIndex
+from app.tracing import metrics, span, trace_turn
+from config import Config
 
+logger = logging.getLogger(__name__)
 
 main = Blueprint('main', __name__)
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Retries 429s and 5xx with jittered exponential backoff, honouring Retry-After
+client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=Config.OPENAI_MAX_RETRIES)
 ASSISTANT_ID = "asst_P2lDWKENgOXJ6tLkTh242brA"
 # Initialize the mesh data manager
 mesh_manager = MeshDataManager()
+# Bounds of every object in the model the browser loads
+scene_index = SceneIndex(mesh_manager.app_root / 'static' / 'models' / 'your-model.glb', mesh_manager.cache_dir)
+mesh_manager.scene_index = scene_index
+# Compressed, content-hashed copies of static/models served from /models
+model_pipeline = ModelPipeline(mesh_manager.app_root / 'static' / 'models', mesh_manager.app_root / 'build' / 'models')
+# Handlers for the functions in openai-functions-mesh.json
+tool_registry = mesh_tool_registry(mesh_manager, scene_index)
+# Mesh context rendered once per catalog version
+context_prompt = ContextPrompt(mesh_manager, client, ASSISTANT_ID)
+# Answers plain "where is X" lookups without a run
+fast_path = FastPath(mesh_manager, client, scene_index)
+
+@main.before_app_request
+def refresh_catalog():
+    """Pick up catalog changes published by other workers"""
+    mesh_manager.maybe_refresh()
+
 
 def get_mesh_info():
     """Endpoint to get all mesh information"""
-    return jsonify(mesh_manager.get_all_mesh_info())
+    return jsonify(dict(mesh_manager.get_all_mesh_info().items()))
+
+
+def start_tool_call(action):
+    """Start one function tool call on the tool pool; its result() is the tool output"""
+    return tool_registry.start(action)
+
+
+class TurnStart:
+    """Which thread a turn runs in, worked out before any request to OpenAI.
+
+    With sessions, a conversation that has outgrown its thread continues in
+    a new one that also carries a summary of it. With a pool, a brand new
+    conversation starts in one of its warm threads when there is one. If
+    thread_id is still None the caller creates the thread from
+    thread_messages() and reports it with thread_created(); otherwise it
+    adds the message and calls message_added().
+    """
+
+    def __init__(self, thread_id, message, sessions=None, pool=None):
+        self.message = message
+        self.sessions = sessions
+        self.previous_thread_id = thread_id
+        self.carried_messages = []
+        if sessions is not None:
+            thread_id, self.carried_messages = sessions.next_thread(thread_id)
+        self.seed_messages = []
+        if not thread_id and pool is not None and not self.carried_messages:
+            with span('thread_pool') as attributes:
+                warm = pool.take()
+                attributes['hit'] = warm is not None
+            if warm is not None:
+                thread_id, self.seed_messages = warm
+                logger.info("Using warm thread %s", thread_id)
+        self.thread_id = thread_id
+
+    @property
+    def rolled(self):
+        return bool(self.previous_thread_id)
+
+    def thread_messages(self, initial_messages):
+        """Messages a new thread is created with: context, carried summary, then the user's message"""
+        return initial_messages + self.carried_messages + [{"role": "user", "content": self.message}]
+
+    def thread_created(self, thread_id, messages):
+        self.thread_id = thread_id
+        if self.sessions is not None:
+            self.sessions.started(thread_id, messages, self.previous_thread_id)
+
+    def message_added(self):
+        if self.seed_messages and self.sessions is not None:
+            self.sessions.started(self.thread_id, self.seed_messages + [{"role": "user", "content": self.message}])
+
+
+def start_turn(thread_id, message, sessions=None, pool=None):
+    """Create the thread (with mesh context) if needed and add the user's message; see TurnStart"""
+    turn = TurnStart(thread_id, message, sessions, pool)
+    if not turn.thread_id:
+        # Context and first message go in with the thread itself, in one request
+        with span('context_upload'):
+            initial_messages = context_prompt.thread_messages(current_app.config['CHAT_CONTEXT_MODE'])
+        messages = turn.thread_messages(initial_messages)
+        with span('thread_create', context_messages=len(initial_messages), rolled=turn.rolled):
+            thread = client.beta.threads.create(messages=messages)
+        logger.info("Created new thread %s with %d context message(s)", thread.id, len(initial_messages))
+        turn.thread_created(thread.id, messages)
+        return turn.thread_id
+
+    # Add the user's message
+    with span('message_create'):
+        message_obj = client.beta.threads.messages.create(
+            thread_id=turn.thread_id,
+            role="user",
+            content=message
+        )
+    logger.debug("Message object created: %s", message_obj)
+    turn.message_added()
+    return turn.thread_id
+
+
+def run_options(sessions):
+    """Extra arguments for creating a run"""
+    return sessions.run_options() if sessions is not None else {}
+
+
+def cached_response(cache, message, thread_id):
+    """Stored answer for the first message of a conversation, or None"""
+    if cache is None or thread_id:
+        return None
+    with span('response_cache') as attributes:
+        cached = cache.get(message, mesh_manager.version)
+        attributes['hit'] = cached is not None
+    if cached is None:
+        return None
+    logger.info("Response cache hit for: %s", message)
+    return {**cached, "thread_id": None}
+
+
+def parse_action(tool_call):
+    """Action dict sent to the browser for a function tool call, or None"""
+    try:
+        action = {
+            'name': tool_call.function.name,
+            'parameters': json.loads(tool_call.function.arguments)
+        }
+    except json.JSONDecodeError as e:
+        logger.warning("Error parsing function arguments: %s", e)
+        return None
+    # Camera target precomputed from the model, so the browser doesn't measure the mesh
+    mesh_name = action['parameters'].get('mesh_name') if isinstance(action['parameters'], dict) else None
+    if action['name'] in ('highlight_object', 'zoom_to_object') and isinstance(mesh_name, str):
+        action['parameters'].update(scene_index.camera_target(mesh_name))
+    return action
+
+
+def response_text(messages, run_id):
+    """Text of the latest assistant message produced by run_id"""
+    assistant_messages = [msg for msg in messages
+                          if msg.role == "assistant" and msg.run_id == run_id]
+    if assistant_messages and assistant_messages[0].content:
+        for content_item in assistant_messages[0].content:
+            if hasattr(content_item, 'text'):
+                return content_item.text.value
+    return "No response from assistant"
+
+
+def actions_from_record(record):
+    """Function calls made during a run as browser actions.
+
+    Ordered like runs.steps.list returns them: latest requires_action
+    round first, calls in their original order within a round.
+    """
+    actions = []
+    for tool_calls in reversed(record.tool_call_batches):
+        for tool_call in tool_calls:
+            action = parse_action(tool_call)
+            if action:
+                actions.append(action)
+    return actions
+
+
+def run_messages(record, thread_id, run_id):
+    """Assistant messages of a run, latest first: from the stream if it was streamed"""
+    if record.messages:
+        return record.messages[::-1]
+    with span('messages_list'):
+        return client.beta.threads.messages.list(
+            thread_id=thread_id,
+            run_id=run_id,
+            order='desc',
+            limit=1
+        ).data
+
+
+def model_response(record, messages, run_id, thread_id):
+    """{response, actions, thread_id} of a completed run"""
+    return {
+        "response": response_text(messages, run_id),
+        "actions": actions_from_record(record),
+        "thread_id": thread_id
+    }
+
+
+def finish_turn(message, response_data, started, sessions=None, cache=None, catalog_version=None):
+    """Bookkeeping after a model turn answered; catalog_version is only given for first messages"""
+    if sessions is not None:
+        sessions.record_turn(response_data['thread_id'], message, response_data['response'])
+    if cache is not None and catalog_version is not None:
+        cache.put(message, catalog_version, response_data)
+    fast_path.stats.record_model_turn(time.perf_counter() - started)
+
+
+def fast_path_answer(message, thread_id, sessions=None):
+    with span('fast_path') as attributes:
+        response_data = fast_path.answer(message, thread_id)
+        attributes['hit'] = response_data is not None
+    if response_data is not None and sessions is not None:
+        # The exchange is added to the thread too
+        sessions.record_turn(thread_id, message, response_data['response'])
+    return response_data
+
+
+def answer_locally(config, message, thread_id, sessions=None, cache=None):
+    """(response_data, path) for a turn the fast path or the response cache answers, else (None, None)"""
+    if config['CHAT_FAST_PATH']:
+        response_data = fast_path_answer(message, thread_id, sessions)
+        if response_data is not None:
+            return response_data, 'fast_path'
+    response_data = cached_response(cache, message, thread_id)
+    if response_data is not None:
+        return response_data, 'cache'
+    return None, None
+
+
+def chat_request(body):
+    """(message, thread_id) of a chat request body; ValueError if it isn't one"""
+    if not isinstance(body, dict):
+        raise ValueError("Invalid JSON body")
+    message, thread_id = body.get('message'), body.get('thread_id')
+    if not isinstance(message, str) or not message.strip():
+        raise ValueError("message must be a non-empty string")
+    if thread_id is not None and not isinstance(thread_id, str):
+        raise ValueError("thread_id must be a string or null")
+    return message, thread_id
+
+
+def requester_id():
+    """Who a chat request counts against for rate limiting.
+
+    The client's address (the forwarded one with TRUSTED_PROXIES), or the
+    CHAT_CLIENT_ID_HEADER set by a trusted proxy or gateway; anything a
+    browser can set itself would let it pick its own bucket.
+    """
+    header = current_app.config['CHAT_CLIENT_ID_HEADER']
+    return (header and request.headers.get(header)) or request.remote_addr
+
+
+def admitted(admission, client_id):
+    """Holds an admission slot for a model turn, if admission control is on"""
+    return admission.admit(client_id) if admission is not None else nullcontext()
+
+
+def turned_away(error):
+    """Overloaded for an error that should tell the client to retry later, else None"""
+    return error if isinstance(error, Overloaded) else upstream_overload(error)
+
+
+def retry_later(error, thread_id):
+    response = jsonify({"error": str(error), "retry_after": error.retry_after, "thread_id": thread_id})
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 @main.route('/')
@@ -25,191 +290,292 @@ def index():
 def chat():
     ASSISTANT_ID = "asst_P2lDWKENgOXJ6tLkTh242brA"
     
-    message = request.json.get('message')
-    thread_id = request.json.get('thread_id')
-    
     try:
-        print("\n=== Starting new chat request ===")
-        print(f"Message: {message}")
-        print(f"Thread ID: {thread_id}")
-        
-        if not thread_id:
-            thread = client.beta.threads.create()
-            thread_id = thread.id
-            print(f"Created new thread: {thread_id}")
+        message, thread_id = chat_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e), "thread_id": None}), 400
+    started = time.perf_counter()
+    
+    with trace_turn('chat') as trace:
+        try:
+            logger.debug("Chat request: message=%r thread_id=%s", message, thread_id)
+            sessions = current_app.extensions['chat_sessions']
+            cache = current_app.extensions['response_cache']
+            response_data, path = answer_locally(current_app.config, message, thread_id, sessions, cache)
+            if response_data is not None:
+                trace.attributes['path'] = path
+                return jsonify(response_data)
+            new_conversation = not thread_id
+            catalog_version = mesh_manager.version
+            admission = current_app.extensions['admission']
+            client_id = requester_id()
             
-            # Send mesh information as context
-            mesh_info = mesh_manager.get_all_mesh_info()
-            context_message = (
-                "3D Model Information:\n\n"
-                "Available components and their descriptions:\n\n"
-            )
+            def model_turn():
+                nonlocal thread_id
+                with admitted(admission, client_id):
+                    thread_id = start_turn(thread_id, message, sessions, current_app.extensions['thread_pool'])
             
-            for mesh_name, data in mesh_info.items():
-                context_message += (
-                    f"Component: {data['display_name']}\n"
-                    f"Internal mesh name: {data['mesh_name']}\n"
-                    f"Description: {data['description']}\n"
-                    f"Alternative names: {', '.join(data.get('aliases', []))}\n"
-                    f"Properties: {json.dumps(data['properties'], indent=2)}\n\n"
-                )
+                    # Run the assistant
+                    record = RunRecord()
+                    if current_app.config['CHAT_STREAMING']:
+                        run = stream_run(client, thread_id, ASSISTANT_ID, start_tool_call, record,
+                                         run_options(sessions))
+                    else:
+                        run = poll_run(client, thread_id, ASSISTANT_ID, start_tool_call, record=record,
+                                       run_options=run_options(sessions))
+                    logger.info("Run %s finished with status: %s", run.id, run.status)
+
+                    if run.status != 'completed':
+                        error_msg = f"Run failed with status: {run.status}"
+                        logger.error(error_msg)
+                        trace.attributes['status'] = run.status
+                        return {
+                            "error": error_msg,
+                            "thread_id": thread_id
+                        }, 500
             
-            print("Sending initial context:", context_message)
-            client.beta.threads.messages.create(
-                thread_id=thread_id,
-                role="user",
-                content=context_message
-            )
-        
-        # Add the user's message
-        print("Adding user message to thread:", message)
-        message_obj = client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=message
-        )
-        print("Message object created:", message_obj)
-        
-        # Run the assistant
-        run = client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=ASSISTANT_ID
-        )
-        print(f"Started run: {run.id}")
-        
-        while True:
-            run_status = client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run.id
-            )
-            print(f"Run status: {run_status.status}")
+                    # Text and actions come from what was recorded while dispatching the run
+                    messages = run_messages(record, thread_id, run.id)
+                    response_data = model_response(record, messages, run.id, thread_id)
             
-            if run_status.status == 'completed':
-                break
-            elif run_status.status == 'requires_action':
-                print("\n=== Action Required ===")
-                required_actions = run_status.required_action.submit_tool_outputs.tool_calls
-                print(f"Required actions: {required_actions}")
-                
-                tool_outputs = []
-                for action in required_actions:
-                    try:
-                        args = json.loads(action.function.arguments)
-                        # Ensure function name matches exactly
-                        if action.function.name == "get_mesh_info":
-                            result = mesh_manager.get_mesh_info(args["mesh_name"])
-                        elif action.function.name == "search_mesh_by_description":
-                            result = mesh_manager.search_mesh_by_description(args["query"])
-                        elif action.function.name == "get_mesh_by_description":
-                            result = mesh_manager.get_mesh_by_description(args["query"])
-                        elif action.function.name in ["highlight_object", "zoom_to_object"]:
-                            mesh_name = args["mesh_name"]
-                            result = {
-                                "status": "success",
-                                "mesh_name": mesh_name,
-                                "color": args.get("color", "#FF0000")
-                            }
-                        # Add the result to tool outputs
-                        tool_outputs.append({
-                            "tool_call_id": action.id,
-                            "output": json.dumps(result) if result is not None else json.dumps({"status": "error", "message": "Function failed or not found"})
-                        })
-                        
-                    except json.JSONDecodeError as e:
-                        # Log JSON parsing errors
-                        print(f"Error parsing function arguments: {e}")
-                        tool_outputs.append({
-                            "tool_call_id": action.id,
-                            "output": json.dumps({"status": "error", "message": "Invalid arguments format"})
-                        })
-                    except Exception as e:
-                        # Log any other errors
-                        print(f"Error processing function: {e}")
-                        tool_outputs.append({
-                            "tool_call_id": action.id,
-                            "output": json.dumps({"status": "error", "message": str(e)})
-                        })
-                
-                print(f"Submitting tool outputs: {tool_outputs}")
-                run = client.beta.threads.runs.submit_tool_outputs(
-                    thread_id=thread_id,
-                    run_id=run.id,
-                    tool_outputs=tool_outputs
-                )
-            elif run_status.status in ['failed', 'cancelled', 'expired']:
-                error_msg = f"Run failed with status: {run_status.status}"
-                print(f"Error: {error_msg}")
-                return jsonify({
-                    "error": error_msg,
-                    "thread_id": thread_id
-                }), 500
-            time.sleep(0.5)
-        
-        # Get the latest messages
-        messages = client.beta.threads.messages.list(thread_id=thread_id)
-        print("\n=== Latest Messages ===")
-        for msg in messages.data:
-            print(f"\nMessage ID: {msg.id}")
-            print(f"Role: {msg.role}")
-            print(f"Content type: {type(msg.content)}")
-            print(f"Raw content: {msg.content}")
-        
-        # Get the assistant's response
-        assistant_messages = [msg for msg in messages.data 
-                            if msg.role == "assistant" and msg.run_id == run.id]
-        
-        print("\n=== Assistant Response ===")
-        response = None
-        if assistant_messages:
-            latest_message = assistant_messages[0]
-            print(f"Latest message: {latest_message}")
-            print(f"Content: {latest_message.content}")
-            
-            if latest_message.content:
-                for content_item in latest_message.content:
-                    if hasattr(content_item, 'text'):
-                        response = content_item.text.value
-                        break
-        
-        if not response:
-            response = "No response from assistant"
+                    logger.debug("Final response data: %s", response_data)
+                    finish_turn(message, response_data, started, sessions, cache,
+                                catalog_version if new_conversation else None)
+                    return response_data, 200
+
+            coalescer = current_app.extensions['request_coalescer']
+            if coalescer is not None and new_conversation:
+                # Identical first messages already being answered share that run
+                response_data, status, coalesced = coalescer.run(message, catalog_version, model_turn)
+                if coalesced:
+                    trace.attributes['path'] = 'coalesced'
+            else:
+                response_data, status = model_turn()
+            return jsonify(response_data), status
             
-        print(f"Final response: {response}")
-        
-        # Parse actions from the run steps
-        actions = []
-        run_steps = client.beta.threads.runs.steps.list(
-            thread_id=thread_id,
-            run_id=run.id
-        )
-        
-        for step in run_steps.data:
-            if step.type == 'tool_calls':
-                for tool_call in step.step_details.tool_calls:
-                    if tool_call.type == 'function':
-                        try:
-                            actions.append({
-                                'name': tool_call.function.name,
-                                'parameters': json.loads(tool_call.function.arguments)
-                            })
-                        except json.JSONDecodeError as e:
-                            print(f"Error parsing function arguments: {e}")
-        
-        response_data = {
-            "response": response,
-            "actions": actions,
-            "thread_id": thread_id
-        }
-        
-        print(f"\nFinal response data: {response_data}")
-        return jsonify(response_data)
-        
-    except Exception as e:
-        # Log any errors in the chat endpoint
-        print(f"\nError in chat endpoint: {str(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
-        return jsonify({
-            "error": str(e),
-            "thread_id": thread_id
-        }), 500
+        except Exception as e:
+            overload = turned_away(e)
+            if overload is not None:
+                logger.warning("Chat turn turned away: %s", overload)
+                trace.attributes['status'] = overload.reason
+                return retry_later(overload, thread_id)
+            failure = upstream_failure(e)
+            if failure is not None:
+                logger.error("Chat turn failed upstream: %s", e)
+                trace.attributes['status'] = 'upstream_error'
+                return jsonify({"error": failure, "thread_id": thread_id}), 502
+            # Log any errors in the chat endpoint
+            logger.exception("Error in chat endpoint")
+            trace.attributes['status'] = 'error'
+            return jsonify({
+                "error": str(e),
+                "thread_id": thread_id
+            }), 500
+
+
+@main.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Same turn as /api/chat, relayed as Server-Sent Events while the run is going.
+
+    Events: ``thread`` (thread_id), ``delta`` (assistant text as it is
+    generated), ``action`` (each tool call as the model makes it), then
+    ``done`` with the usual {response, actions, thread_id} payload, or
+    ``error``.
+
+    A turn that needs the model takes its admission slot before the
+    stream starts, so an overloaded server answers with a plain 429 or
+    503 and Retry-After instead of a 200 stream carrying an error.
+    """
+    started = time.perf_counter()
+    try:
+        message, thread_id = chat_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e), "thread_id": None}), 400
+    cache = current_app.extensions['response_cache']
+    sessions = current_app.extensions['chat_sessions']
+    pool = current_app.extensions['thread_pool']
+    admission = current_app.extensions['admission']
+
+    local_answer, path = answer_locally(current_app.config, message, thread_id, sessions, cache)
+    slot = None
+    if local_answer is None and admission is not None:
+        try:
+            slot = admission.acquire(requester_id())
+        except Overloaded as e:
+            logger.warning("Chat turn turned away: %s", e)
+            with trace_turn('chat_stream', status=e.reason):
+                return retry_later(e, thread_id)
+
+    def generate(thread_id):
+        try:
+            with trace_turn('chat_stream') as trace:
+                yield from relay(thread_id, trace)
+        finally:
+            if slot is not None:
+                slot.release()
+
+    def relay(thread_id, trace):
+        try:
+            if local_answer is not None:
+                trace.attributes['path'] = path
+                for action in local_answer['actions']:
+                    yield sse('action', action)
+                yield sse('done', local_answer)
+                return
+
+            new_conversation = not thread_id
+            catalog_version = mesh_manager.version
+            thread_id = start_turn(thread_id, message, sessions, pool)
+            yield sse('thread', {"thread_id": thread_id})
+
+            run_stream = RunStream(client, thread_id, ASSISTANT_ID, start_tool_call,
+                                   run_options=run_options(sessions))
+            response = None
+            for event in run_stream:
+                if event.event == 'thread.message.delta':
+                    for content in event.data.delta.content or []:
+                        if content.type == 'text' and content.text and content.text.value:
+                            yield sse('delta', {"text": content.text.value})
+                elif event.event == 'thread.message.completed':
+                    for content_item in event.data.content:
+                        if hasattr(content_item, 'text'):
+                            response = content_item.text.value
+                            break
+                elif event.event == 'thread.run.requires_action':
+                    for tool_call in event.data.required_action.submit_tool_outputs.tool_calls:
+                        action = parse_action(tool_call)
+                        if action:
+                            yield sse('action', action)
+
+            run = run_stream.run
+            if run.status != 'completed':
+                logger.error("Run failed with status: %s", run.status)
+                trace.attributes['status'] = run.status
+                yield sse('error', {
+                    "error": f"Run failed with status: {run.status}",
+                    "thread_id": thread_id
+                })
+                return
+
+            # Actions ordered like /api/chat's, since both endpoints fill the same response cache
+            response_data = {
+                "response": response or "No response from assistant",
+                "actions": actions_from_record(run_stream.record),
+                "thread_id": thread_id
+            }
+            # The browser hangs up on done, which would stop the generator before anything after it
+            finish_turn(message, response_data, started, sessions, cache,
+                        catalog_version if new_conversation else None)
+            yield sse('done', response_data)
+        except Exception as e:
+            overload = turned_away(e)
+            if overload is not None:
+                logger.warning("Chat turn turned away: %s", overload)
+                trace.attributes['status'] = overload.reason
+                yield sse('error', {"error": str(overload), "retry_after": overload.retry_after,
+                                    "thread_id": thread_id})
+                return
+            failure = upstream_failure(e)
+            if failure is not None:
+                logger.error("Chat turn failed upstream: %s", e)
+                trace.attributes['status'] = 'upstream_error'
+                yield sse('error', {"error": failure, "thread_id": thread_id})
+                return
+            logger.exception("Error in chat stream endpoint")
+            trace.attributes['status'] = 'error'
+            yield sse('error', {"error": str(e), "thread_id": thread_id})
+
+    response = Response(stream_with_context(generate(thread_id)), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    if slot is not None:
+        # The generator's finally never runs if the client is gone before the stream starts
+        response.call_on_close(slot.release)
+    return response
+
+
+@main.route('/metrics')
+def prometheus_metrics():
+    """Chat turn and phase latency histograms in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@main.route('/api/fast_path/stats')
+def fast_path_stats():
+    """Fast path hit rate and the latency it saved"""
+    return jsonify(fast_path.stats.snapshot())
+
+
+@main.route('/api/response_cache/stats')
+def response_cache_stats():
+    """Response cache hit and miss counters"""
+    cache = current_app.extensions['response_cache']
+    return jsonify(cache.stats() if cache is not None else {"enabled": False})
+
+
+@main.route('/api/sessions/stats')
+def session_stats():
+    """Tracked conversations, their largest size and how many threads were rolled"""
+    sessions = current_app.extensions['chat_sessions']
+    return jsonify(sessions.stats() if sessions is not None else {"enabled": False})
+
+
+@main.route('/api/coalescing/stats')
+def coalescing_stats():
+    """How many first messages shared a run already in flight"""
+    coalescer = current_app.extensions['request_coalescer']
+    return jsonify(coalescer.stats() if coalescer is not None else {"enabled": False})
+
+
+@main.route('/api/thread_pool/stats')
+def thread_pool_stats():
+    """How often new conversations found a warm thread waiting"""
+    pool = current_app.extensions['thread_pool']
+    return jsonify(pool.stats() if pool is not None else {"enabled": False})
+
+
+@main.route('/api/admission/stats')
+def admission_stats():
+    """Chat turns running and queued, time spent queued, and turns turned away by reason"""
+    admission = current_app.extensions['admission']
+    return jsonify(admission.stats() if admission is not None else {"enabled": False})
+
+
+@main.route('/api/scene/index')
+def get_scene_index():
+    """World-space bounds, centers and hierarchy of every object in the model"""
+    index = scene_index.load()
+    if index is None:
+        return jsonify({"error": "Model not found"}), 404
+    response = jsonify(index)
+    response.set_etag(index['hash'])
+    return response.make_conditional(request)
+
+
+@main.route('/api/models/manifest')
+def models_manifest():
+    """Published URL, size and LOD variants of every model; revalidated on each load"""
+    manifest = model_pipeline.manifest()
+    response = jsonify(manifest)
+    response.set_etag(manifest['hash'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@main.route('/models/<filename>')
+def model_file(filename):
+    """A published model, precompressed if the client accepts it, cacheable forever"""
+    accepted = {encoding for encoding in ('br', 'gzip') if request.accept_encodings[encoding]}
+    found = model_pipeline.resolve(filename, accepted)
+    if found is None:
+        abort(404)
+    path, encoding = found
+    # The name is the content hash, so it doubles as the ETag
+    response = send_file(path, mimetype='model/gltf-binary', download_name=filename,
+                         etag=f"{filename}-{encoding or 'identity'}", conditional=True)
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,227 @@
+# scene_index.py
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+from app.glb import GLBFile
+from app.spatial_index import SpatialIndex
+
+logger = logging.getLogger(__name__)
+
+# Must match gltf.scene.scale in static/js/scene.js
+SCENE_SCALE = 3.0
+# Characters three.js strips from node names (PropertyBinding.sanitizeNodeName)
+THREE_RESERVED = re.compile(r"[\[\]\.:/]")
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def local_matrix(node):
+    if 'matrix' in node:
+        return np.array(node['matrix'], dtype=np.float64).reshape(4, 4).T  # glTF is column-major
+    x, y, z, w = node.get('rotation', [0.0, 0.0, 0.0, 1.0])
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.array(node.get('scale', [1.0, 1.0, 1.0]))
+    matrix[:3, 3] = node.get('translation', [0.0, 0.0, 0.0])
+    return matrix
+
+
+def transform_box(matrix, box_min, box_max):
+    """Axis-aligned box around a local box's eight corners after a transform"""
+    corners = np.array([[x, y, z, 1.0] for x in (box_min[0], box_max[0])
+                        for y in (box_min[1], box_max[1]) for z in (box_min[2], box_max[2])])
+    world = corners @ matrix.T
+    return world[:, :3].min(axis=0), world[:, :3].max(axis=0)
+
+
+def position_bounds(glb, mesh):
+    """Local bounds of a mesh from its POSITION accessors' min/max (the data only if they're missing)"""
+    box_min, box_max = np.full(3, np.inf), np.full(3, -np.inf)
+    for primitive in mesh['primitives']:
+        index = primitive['attributes'].get('POSITION')
+        if index is None:
+            continue
+        accessor = glb.document['accessors'][index]
+        if 'min' in accessor and 'max' in accessor:
+            low, high = accessor['min'][:3], accessor['max'][:3]
+        else:
+            positions = glb.accessor(index)
+            low, high = positions.min(axis=0)[:3].tolist(), positions.max(axis=0)[:3].tolist()
+            del positions
+        box_min = np.minimum(box_min, low)
+        box_max = np.maximum(box_max, high)
+    if not np.isfinite(box_min).all():
+        return None
+    return box_min, box_max
+
+
+def build_scene_index(path, scale=SCENE_SCALE):
+    """World-space bounds of every node, keyed by the name three.js gives the object.
+
+    Names follow GLTFLoader: sanitized, and made unique with _1, _2...
+    suffixes in load order. A node's bounds include its descendants, like
+    Box3.setFromObject.
+    """
+    with GLBFile(path) as glb:
+        document = glb.document
+        nodes = document.get('nodes', [])
+        scene = document.get('scenes', [{}])[document.get('scene', 0)]
+        used_names = {}
+
+        def unique_name(name):
+            name = THREE_RESERVED.sub('', re.sub(r"\s", '_', name))
+            if name in used_names:
+                used_names[name] += 1
+                return f"{name}_{used_names[name]}"
+            used_names[name] = 0
+            return name
+
+        entries = {}
+
+        def visit(index, parent_matrix, parent_name):
+            node = nodes[index]
+            name = unique_name(node['name']) if node.get('name') else f"node_{index}"
+            world = parent_matrix @ local_matrix(node)
+            box = None
+            if 'mesh' in node:
+                local = position_bounds(glb, document['meshes'][node['mesh']])
+                if local is not None:
+                    box = transform_box(world, *local)
+            entry = {"node": index, "parent": parent_name, "mesh": 'mesh' in node, "children": []}
+            entries[name] = entry
+            for child in node.get('children', []):
+                child_box = visit(child, world, name)
+                if child_box is not None:
+                    box = child_box if box is None else (np.minimum(box[0], child_box[0]),
+                                                         np.maximum(box[1], child_box[1]))
+            if box is not None:
+                center = (box[0] + box[1]) / 2
+                entry.update({
+                    "min": box[0].round(6).tolist(),
+                    "max": box[1].round(6).tolist(),
+                    "center": center.round(6).tolist(),
+                    "size": (box[1] - box[0]).round(6).tolist(),
+                    "radius": round(float(np.linalg.norm(box[1] - box[0]) / 2), 6),
+                })
+            if parent_name is not None:
+                entries[parent_name]["children"].append(name)
+            return box
+
+        root = np.diag([scale, scale, scale, 1.0])
+        scene_box = None
+        for index in scene.get('nodes', []):
+            box = visit(index, root, None)
+            if box is not None:
+                scene_box = box if scene_box is None else (np.minimum(scene_box[0], box[0]),
+                                                           np.maximum(scene_box[1], box[1]))
+
+    bounds = None
+    if scene_box is not None:
+        bounds = {
+            "min": scene_box[0].round(6).tolist(),
+            "max": scene_box[1].round(6).tolist(),
+            "center": ((scene_box[0] + scene_box[1]) / 2).round(6).tolist(),
+        }
+    return {"scale": scale, "bounds": bounds, "nodes": entries}
+
+
+class SceneIndex:
+    """Cached build_scene_index for one model file.
+
+    Results are stored in cache_dir keyed by the file's SHA-256, and the
+    file is only re-hashed when its size or mtime changes.
+    """
+
+    def __init__(self, model_path, cache_dir, scale=SCENE_SCALE):
+        self.model_path = model_path
+        self.cache_dir = cache_dir
+        self.scale = scale
+        self._stat = None
+        self._index = None
+        self.hash = None
+        self._spatial = (None, None)
+        self._lock = threading.Lock()
+
+    def load(self):
+        """The index dict, or None if the model file is missing"""
+        try:
+            stat = os.stat(self.model_path)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_size, stat.st_mtime_ns)
+        if key == self._stat:
+            return self._index
+        with self._lock:
+            if key != self._stat:
+                self.hash = file_hash(self.model_path)
+                self._index = self._cached_build()
+                self._stat = key
+        return self._index
+
+    def _cached_build(self):
+        cache_path = self.cache_dir / f"scene-{self.hash[:16]}-x{self.scale:g}.json"
+        if cache_path.exists():
+            with open(cache_path) as f:
+                return json.load(f)
+        index = build_scene_index(self.model_path, self.scale)
+        index["hash"] = self.hash
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, cache_path)
+        logger.info("Indexed %d scene nodes of %s", len(index['nodes']), self.model_path)
+        return index
+
+    def spatial(self):
+        """SpatialIndex over the bounds of every mesh in the model, or None if there is no model"""
+        index = self.load()
+        if index is None:
+            return None
+        built_from, spatial = self._spatial
+        if built_from is not index:
+            meshes = [(name, entry) for name, entry in index['nodes'].items() if entry['mesh'] and 'min' in entry]
+            spatial = SpatialIndex([name for name, _ in meshes],
+                                   [entry['min'] for _, entry in meshes],
+                                   [entry['max'] for _, entry in meshes])
+            self._spatial = (index, spatial)
+        return spatial
+
+    def node(self, name):
+        index = self.load()
+        return index['nodes'].get(name) if index else None
+
+    def check_mesh_name(self, mesh_name):
+        """None if the scene has mesh_name (or there is no model to check against), else an error dict"""
+        index = self.load()
+        if index is None or mesh_name in index['nodes']:
+            return None
+        return {
+            "status": "error",
+            "message": f"No object named {mesh_name} in the scene",
+            "did_you_mean": difflib.get_close_matches(mesh_name, index['nodes'], n=3)
+        }
+
+    def camera_target(self, mesh_name):
+        """{target, radius} for pointing the camera at an object, if its bounds are known"""
+        entry = self.node(mesh_name)
+        if not entry or 'center' not in entry:
+            return {}
+        return {"target": entry['center'], "radius": entry['radius']}
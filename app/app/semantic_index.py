@@ -0,0 +1,186 @@
+# semantic_index.py
+import hashlib
+import json
+import logging
+import os
+import zlib
+
+import numpy as np
+
+from app.catalog_snapshot import snapshot_lock
+from app.mesh_search import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def entry_text(data):
+    """Text that gets embedded for one catalog entry"""
+    properties = data.get('properties') or {}
+    parts = [
+        data.get('display_name', ''),
+        data.get('description', ''),
+        ' '.join(data.get('aliases', [])),
+        data.get('category', ''),
+        ' '.join(str(value) for value in properties.values()),
+    ]
+    return '. '.join(part for part in parts if part)
+
+
+class HashedTfidfEmbedder:
+    """Offline fallback embedder: hashed word and character trigram features.
+
+    Rows are L2-normalised sublinear term frequencies. IDF is applied on the
+    query side by SemanticMeshIndex so stored rows never depend on the rest
+    of the catalog and stay valid across rebuilds.
+    """
+
+    uses_idf = True
+    CHAR_WEIGHT = 0.5
+
+    def __init__(self, dim=4096):
+        self.dim = dim
+        self.name = f"hashed-tfidf-{dim}"
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                # crc32 rather than hash(): it must be stable across processes
+                matrix[row, zlib.crc32(token.encode()) % self.dim] += 1.0
+                padded = f" {token} "
+                for i in range(len(padded) - 2):
+                    gram = "#" + padded[i:i + 3]
+                    matrix[row, zlib.crc32(gram.encode()) % self.dim] += self.CHAR_WEIGHT
+        np.log1p(matrix, out=matrix)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class SentenceTransformerEmbedder:
+    """Local CPU embedding model (requires the sentence-transformers package)"""
+
+    uses_idf = False
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name.replace('/', '_')}"
+
+    def embed(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=64, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def load_embedder():
+    """Use the local model named by MESH_EMBEDDING_MODEL if available, else hashed TF-IDF"""
+    model_name = os.getenv('MESH_EMBEDDING_MODEL')
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            logger.warning("Could not load embedding model %s, using hashed TF-IDF: %s", model_name, e)
+    return HashedTfidfEmbedder()
+
+
+class SemanticMeshIndex:
+    """Embedding matrix over the catalog, memory-mapped from cache_dir.
+
+    Rows are keyed by a hash of the embedded text (and embedder name), so a
+    rebuild only embeds entries that are new or changed; the rest are copied
+    from the previous matrix. Queries are a single matrix-vector product.
+
+    Every worker on a host shares the files. Each matrix is written under a
+    name derived from its row keys, and the keys file, replaced last, names
+    the matrix it describes, so a reader never pairs vectors with the wrong
+    keys. Builds hold the same lock file as the catalog snapshot does.
+    """
+
+    def __init__(self, cache_dir, embedder=None):
+        self.cache_dir = cache_dir
+        self.embedder = embedder or load_embedder()
+        self.keys_path = cache_dir / f"{self.embedder.name}.json"
+        self.mesh_ids = []
+        self.matrix = None
+        self.idf = None
+
+    def content_hash(self, data):
+        text = f"{self.embedder.name}\n{entry_text(data)}"
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def published(self):
+        """(row keys, path of their matrix) last published to cache_dir, or None"""
+        try:
+            with open(self.keys_path) as f:
+                published = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        # Files from before matrices were versioned hold just the keys
+        if not isinstance(published, dict):
+            return None
+        vectors_path = self.cache_dir / published['vectors']
+        return (published['keys'], vectors_path) if vectors_path.exists() else None
+
+    def build(self, mesh_data):
+        mesh_ids = list(mesh_data)
+        hashes = [self.content_hash(mesh_data[mesh_id]) for mesh_id in mesh_ids]
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with snapshot_lock(self.keys_path):
+            published = self.published()
+            if published is None or published[0] != hashes:
+                published = self.publish(mesh_data, mesh_ids, hashes, published)
+            self.matrix = np.load(published[1], mmap_mode='r')
+
+        self.mesh_ids = mesh_ids
+        if self.embedder.uses_idf and len(mesh_ids):
+            df = np.count_nonzero(self.matrix, axis=0)
+            self.idf = np.log((1 + len(mesh_ids)) / (1 + df)).astype(np.float32) + 1.0
+
+    def publish(self, mesh_data, mesh_ids, hashes, previous):
+        """Write the matrix for hashes, then the keys file naming it; called with the lock held"""
+        previous_rows = {}
+        previous_matrix = None
+        if previous is not None:
+            previous_rows = {key: row for row, key in enumerate(previous[0])}
+            previous_matrix = np.load(previous[1], mmap_mode='r')
+        digest = hashlib.sha1(json.dumps(hashes).encode()).hexdigest()[:16]
+        vectors_path = self.cache_dir / f"{self.embedder.name}-{digest}.npy"
+        tmp_path = self.cache_dir / f"{self.embedder.name}-{digest}.{os.getpid()}.tmp.npy"
+        matrix = np.lib.format.open_memmap(
+            tmp_path, mode='w+', dtype=np.float32, shape=(len(hashes), self.embedder.dim))
+        for i, key in enumerate(hashes):
+            if key in previous_rows:
+                matrix[i] = previous_matrix[previous_rows[key]]
+        missing = [i for i, key in enumerate(hashes) if key not in previous_rows]
+        if missing:
+            texts = [entry_text(mesh_data[mesh_ids[i]]) for i in missing]
+            matrix[missing] = self.embedder.embed(texts)
+        matrix.flush()
+        del matrix, previous_matrix
+        os.replace(tmp_path, vectors_path)
+
+        tmp_keys = self.keys_path.with_name(f"{self.keys_path.name}.{os.getpid()}.tmp")
+        with open(tmp_keys, 'w') as f:
+            json.dump({"vectors": vectors_path.name, "keys": hashes}, f)
+        os.replace(tmp_keys, self.keys_path)
+        # Workers still mapping an older matrix keep reading it after the unlink
+        legacy = [self.cache_dir / f"{self.embedder.name}.npy", self.cache_dir / f"{self.embedder.name}.tmp.npy"]
+        for stale in [*self.cache_dir.glob(f"{self.embedder.name}-*.npy"), *legacy]:
+            if stale != vectors_path:
+                stale.unlink(missing_ok=True)
+        logger.info("Embedded %d of %d mesh entries", len(missing), len(hashes))
+        return hashes, vectors_path
+
+    def query(self, text, limit=5):
+        """Top ``limit`` (mesh_id, score) pairs by cosine-style similarity"""
+        if self.matrix is None or not self.mesh_ids or limit <= 0:
+            return []
+        vector = self.embedder.embed([text])[0]
+        if self.idf is not None:
+            vector = vector * self.idf * self.idf
+        scores = self.matrix @ vector
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.mesh_ids[i], float(scores[i])) for i in top if scores[i] > 0]
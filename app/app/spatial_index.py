@@ -0,0 +1,135 @@
+# spatial_index.py
+import numpy as np
+
+FANOUT = 16
+
+
+def str_order(centers, fanout=FANOUT):
+    """Sort-Tile-Recursive order of points: x slabs, y strips within them, z within strips"""
+    count = len(centers)
+    if count == 0:
+        return np.arange(0)
+    slices = max(1, int(np.ceil((count / fanout) ** (1 / 3))))
+    order = np.argsort(centers[:, 0], kind='stable')
+    slab_size = int(np.ceil(count / slices))
+    position = np.arange(count)
+    slab = position // slab_size
+    order = order[np.lexsort((centers[order, 1], slab))]
+    strip = slab * slices + (position % slab_size) // int(np.ceil(slab_size / slices))
+    return order[np.lexsort((centers[order, 2], strip))]
+
+
+def box_gaps(box_min, box_max, mins, maxs):
+    """Distance from one box to each of several boxes, 0 where they touch or overlap"""
+    gaps = np.maximum(np.maximum(box_min - maxs, mins - box_max), 0.0)
+    return np.sqrt((gaps * gaps).sum(axis=1))
+
+
+class SpatialIndex:
+    """Static R-tree over named axis-aligned boxes, bulk loaded in STR order.
+
+    levels[0] holds the boxes themselves; each level above holds the bounds
+    of runs of FANOUT consecutive entries of the one below, so the children
+    of node j are entries j*FANOUT to (j+1)*FANOUT-1 of the next level down
+    and the tree is just a list of arrays.
+    """
+
+    def __init__(self, names, mins, maxs, fanout=FANOUT):
+        mins = np.asarray(mins, dtype=np.float64).reshape(-1, 3)
+        maxs = np.asarray(maxs, dtype=np.float64).reshape(-1, 3)
+        order = str_order((mins + maxs) / 2, fanout)
+        self.fanout = fanout
+        self.names = [names[i] for i in order]
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        self.levels = [(mins[order], maxs[order])]
+        self.centers = (self.levels[0][0] + self.levels[0][1]) / 2
+        while len(self.levels[-1][0]) > 1:
+            lows, highs = self.levels[-1]
+            starts = np.arange(0, len(lows), fanout)
+            self.levels.append((np.minimum.reduceat(lows, starts), np.maximum.reduceat(highs, starts)))
+        # Side of the cube each entry would get if they were spread evenly over the scene
+        extent = self.levels[-1][1][0] - self.levels[-1][0][0] if self.names else np.zeros(3)
+        volume = np.prod(np.maximum(extent, extent.max() * 1e-3))
+        self.spacing = float((volume / max(len(self.names), 1)) ** (1 / 3))
+
+    def __len__(self):
+        return len(self.names)
+
+    def box(self, name):
+        i = self.positions[name]
+        return self.levels[0][0][i], self.levels[0][1][i]
+
+    def _children(self, level, nodes):
+        children = (nodes[:, None] * self.fanout + np.arange(self.fanout)).ravel()
+        return children[children < len(self.levels[level - 1][0])]
+
+    def _search(self, node_test, leaf_test):
+        """Positions of entries passing leaf_test, pruning subtrees that fail node_test"""
+        if not self.names:
+            return np.arange(0)
+        level = len(self.levels) - 1
+        frontier = np.arange(len(self.levels[level][0]))
+        while True:
+            lows, highs = self.levels[level]
+            test = leaf_test if level == 0 else node_test
+            frontier = frontier[test(lows[frontier], highs[frontier])]
+            if level == 0 or not len(frontier):
+                return frontier
+            frontier = self._children(level, frontier)
+            level -= 1
+
+    def intersecting(self, box_min, box_max):
+        """Names of boxes overlapping the query box"""
+        box_min, box_max = np.asarray(box_min, dtype=np.float64), np.asarray(box_max, dtype=np.float64)
+
+        def overlaps(lows, highs):
+            return (lows <= box_max).all(axis=1) & (highs >= box_min).all(axis=1)
+        return [self.names[i] for i in self._search(overlaps, overlaps)]
+
+    def contained(self, box_min, box_max):
+        """Names of boxes lying entirely inside the query box"""
+        box_min, box_max = np.asarray(box_min, dtype=np.float64), np.asarray(box_max, dtype=np.float64)
+
+        def overlaps(lows, highs):
+            return (lows <= box_max).all(axis=1) & (highs >= box_min).all(axis=1)
+
+        def inside(lows, highs):
+            return (lows >= box_min).all(axis=1) & (highs <= box_max).all(axis=1)
+        return [self.names[i] for i in self._search(overlaps, inside)]
+
+    def nearest(self, box_min, box_max, k=5, exclude=()):
+        """Up to k (name, gap, center distance) nearest to the query box, closest first.
+
+        Distance is the gap between boxes, so anything touching or
+        overlapping the query comes first; ties go to the closer center.
+        Runs box searches around the query, doubling the radius until k
+        entries lie within it; starting from the average spacing between
+        entries that is usually one or two searches.
+        """
+        box_min, box_max = np.asarray(box_min, dtype=np.float64), np.asarray(box_max, dtype=np.float64)
+        excluded = np.array([self.positions[name] for name in exclude if name in self.positions], dtype=np.int64)
+        available = len(self.names) - len(excluded)
+        if available <= 0 or k <= 0:
+            return []
+        lows, highs = self.levels[0]
+        radius = self.spacing * k ** (1 / 3) or 1.0
+        while True:
+            low, high = box_min - radius, box_max + radius
+
+            def overlaps(node_lows, node_highs):
+                return (node_lows <= high).all(axis=1) & (node_highs >= low).all(axis=1)
+            found = self._search(overlaps, overlaps)
+            if len(excluded):
+                found = found[~np.isin(found, excluded)]
+            gaps = box_gaps(box_min, box_max, lows[found], highs[found])
+            if len(found) == available:
+                break
+            within = gaps <= radius
+            if within.sum() >= k:
+                found, gaps = found[within], gaps[within]
+                break
+            radius *= 2
+        offsets = self.centers[found] - (box_min + box_max) / 2
+        distances = np.sqrt((offsets * offsets).sum(axis=1))
+        order = np.lexsort((distances, gaps))[:k]
+        return [(self.names[i], float(gaps[j]), float(distances[j])) for j, i in zip(order, found[order])]
@@ -1,5 +1,5 @@
 // static/js/chat.js
-import { highlightObject, resetHighlight, zoomToObject } from './scene.js';
+import { applyActions } from './scene.js';
 let currentThreadId = null;
 
 function addMessage(role, content) {
@@ -8,6 +8,7 @@ function addMessage(role, content) {
     messageDiv.innerHTML = marked.parse(content); // Convert Markdown to HTML
     document.getElementById('chat-messages').appendChild(messageDiv);
     messageDiv.scrollIntoView({ behavior: 'smooth' });
+    return messageDiv;
 }
 
 function extractMessage(data) {
@@ -45,7 +46,7 @@ function extractMessage(data) {
     return message;
 }
 
-function handleAssistantResponse(data) {
+function handleAssistantResponse(data, { actionsApplied = false, messageDiv = null } = {}) {
     if (data.error) {
         addMessage('error', `Error: ${data.error}`);
         return;
@@ -53,30 +54,23 @@ function handleAssistantResponse(data) {
 
     const message = extractMessage(data);
     currentThreadId = data.thread_id;
-    addMessage('assistant', message);
+    if (messageDiv) {
+        // Replace the streamed text with the final (possibly JSON-unwrapped) message
+        messageDiv.innerHTML = marked.parse(message);
+    } else {
+        addMessage('assistant', message);
+    }
+
+    // Actions from the stream have already been applied as they arrived
+    if (actionsApplied) {
+        return;
+    }
 
     // Recursively search for actions in the JSON object
     const actions = findActions(data);
 
-    // Handle any actions found
-    if (actions.length > 0) {
-        actions.forEach(action => {
-            switch (action.name) {
-                case 'highlight_object':
-                    highlightObject(action.parameters.mesh_name, action.parameters.color, action.parameters.label_text);
-                    break;
-                case 'zoom_to_object':
-                    zoomToObject(action.parameters.mesh_name);
-                    break;
-                case 'reset_highlight':
-                    resetHighlight(action.parameters.mesh_name);
-                    break;
-                default:
-                    console.log(`Unknown action: ${action.name}`);
-                    break;
-            }
-        });
-    }
+    // Applied together, in the next frame
+    applyActions(actions);
 }
 
 // Utility function to recursively find actions in a JSON object
@@ -100,6 +94,103 @@ function findActions(obj) {
     return actions;
 }
 
+// Parse a text/event-stream response body into {event, data} objects
+async function* readServerSentEvents(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const chunk = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of chunk.split('\n')) {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            }
+            yield { event, data: data ? JSON.parse(data) : null };
+        }
+    }
+}
+
+// Stream a chat turn: render text as it is generated and apply actions as the model calls them
+async function streamChat(message) {
+    const response = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            message: message,
+            thread_id: currentThreadId
+        })
+    });
+    if (response.status === 429 || response.status === 503) {
+        // Turned away before the stream started; falling back to /api/chat would only add load
+        handleAssistantResponse(await response.json());
+        return true;
+    }
+    if (!response.ok || !response.body) {
+        return false;
+    }
+
+    let messageDiv = null;
+    let streamedText = '';
+
+    for await (const { event, data } of readServerSentEvents(response)) {
+        switch (event) {
+            case 'thread':
+                currentThreadId = data.thread_id;
+                break;
+            case 'delta':
+                streamedText += data.text;
+                if (!messageDiv) {
+                    messageDiv = addMessage('assistant', streamedText);
+                } else {
+                    messageDiv.innerHTML = marked.parse(streamedText);
+                }
+                break;
+            case 'action':
+                applyActions([data]);
+                break;
+            case 'done':
+                handleAssistantResponse(data, { actionsApplied: true, messageDiv });
+                break;
+            case 'error':
+                handleAssistantResponse(data);
+                break;
+        }
+    }
+    return true;
+}
+
+async function postChat(message) {
+    const response = await fetch('/api/chat', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            message: message,
+            thread_id: currentThreadId
+        })
+    });
+
+    const data = await response.json();
+    handleAssistantResponse(data);
+}
+
 // Chat input handler
 const chatInput = document.getElementById('chat-input');
 chatInput.addEventListener('keypress', async function(e) {
@@ -111,19 +202,11 @@ chatInput.addEventListener('keypress', async function(e) {
         chatInput.placeholder = 'Thinking...'; // Set placeholder to "Thinking..."
 
         try {
-            const response = await fetch('/api/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    message: message,
-                    thread_id: currentThreadId
-                })
-            });
-
-            const data = await response.json();
-            handleAssistantResponse(data);
+            // Fall back to the blocking endpoint if streaming is unavailable
+            const streamed = await streamChat(message);
+            if (!streamed) {
+                await postChat(message);
+            }
         } catch (error) {
             addMessage('error', `Error: ${error.message}`);
         } finally {
@@ -132,4 +215,4 @@ chatInput.addEventListener('keypress', async function(e) {
             chatInput.focus();
         }
     }
-});
+});
\ No newline at end of file
@@ -1,6 +1,7 @@
 import * as THREE from 'three';
 import { OrbitControls } from 'three/addons/controls/OrbitControls.js';
 import { GLTFLoader } from 'three/addons/loaders/GLTFLoader.js';
+import { MeshoptDecoder } from 'three/addons/libs/meshopt_decoder.module.js';
 import { EffectComposer } from 'three/addons/postprocessing/EffectComposer.js';
 import { RenderPass } from 'three/addons/postprocessing/RenderPass.js';
 import { SAOPass } from 'three/addons/postprocessing/SAOPass.js';
@@ -24,35 +25,116 @@ const labels = new Map(); // Store labels by mesh name
 
 /// TO LOOK AT: Decals, LOD, toon material, FXAA, GTAO, SSAA, Outline pass, SAO, bloom pass
 
-// Previous export functions remain unchanged
-export function highlightObject(meshName, color = '#00FFFF', labelText = meshName) {
-    console.log('Attempting to highlight:', meshName);
+// Actions waiting for the next frame, applied together before it is drawn
+const pendingActions = [];
+let frameRequested = false;
+
+// Apply a response's actions (highlight_object, zoom_to_object,
+// reset_highlight) in one frame; the camera moves once, to the last object
+// the batch highlights or zooms to.
+export function applyActions(actions) {
+    pendingActions.push(...actions);
+    requestRender();
+}
+
+export function highlightObject(meshName, color = '#00FFFF', labelText = meshName, target = null) {
+    applyActions([{ name: 'highlight_object', parameters: { mesh_name: meshName, color, label_text: labelText, target } }]);
+}
+
+export function resetHighlight(meshName) {
+    applyActions([{ name: 'reset_highlight', parameters: { mesh_name: meshName } }]);
+}
+
+// target: world-space center precomputed by /api/scene/index, if the server sent one
+export function zoomToObject(meshName, target = null) {
+    applyActions([{ name: 'zoom_to_object', parameters: { mesh_name: meshName, target } }]);
+}
+
+// Draw a frame soon; nothing is rendered while the scene is unchanged
+export function requestRender() {
+    if (!frameRequested) {
+        frameRequested = true;
+        requestAnimationFrame(renderFrame);
+    }
+}
+
+function flushActions() {
+    let focus = null;
+    for (const action of pendingActions.splice(0)) {
+        const params = action.parameters || {};
+        switch (action.name) {
+            case 'highlight_object':
+                if (setHighlight(params.mesh_name, params.color ?? '#00FFFF', params.label_text ?? params.mesh_name)) {
+                    focus = params;
+                }
+                break;
+            case 'zoom_to_object':
+                if (meshes[params.mesh_name]) {
+                    focus = params;
+                } else {
+                    console.log('Mesh not found for zooming:', params.mesh_name);
+                }
+                break;
+            case 'reset_highlight':
+                clearHighlight(params.mesh_name);
+                break;
+            default:
+                console.log(`Unknown action: ${action.name}`);
+                break;
+        }
+    }
+    if (focus) {
+        focusCamera(focus.mesh_name, focus.target);
+    }
+}
+
+// World-space bounds of a mesh; the model doesn't move once loaded, so computed once
+function meshBox(mesh) {
+    if (!mesh.userData.box) {
+        mesh.userData.box = new THREE.Box3().setFromObject(mesh);
+    }
+    return mesh.userData.box;
+}
+
+// One highlight material per mesh and color, made the first time it is needed
+function highlightMaterial(mesh, color) {
+    if (!mesh.userData.highlightMaterials) {
+        mesh.userData.highlightMaterials = new Map();
+    }
+    let material = mesh.userData.highlightMaterials.get(color);
+    if (!material) {
+        material = mesh.userData.originalMaterial.clone();
+        material.emissive.setHex(parseInt(color.replace('#', '0x')));
+        material.emissiveIntensity = 1.5;
+        material.color.setHex(0x000000);
+        mesh.userData.highlightMaterials.set(color, material);
+    }
+    return material;
+}
+
+function setHighlight(meshName, color, labelText) {
     const mesh = meshes[meshName];
     if (!mesh) {
         console.error(`Mesh "${meshName}" not found in meshes.`);
-        return;
+        return false;
     }
     try {
         if (!mesh.userData.originalMaterial) {
-            mesh.userData.originalMaterial = mesh.material.clone();
+            mesh.userData.originalMaterial = mesh.material;
         }
-        const highlightMaterial = mesh.userData.originalMaterial.clone();
-        highlightMaterial.emissive.setHex(parseInt(color.replace('#', '0x')));
-        highlightMaterial.emissiveIntensity = 1.5;
-        highlightMaterial.color.setHex(0x000000);
-        mesh.material = highlightMaterial;
-        zoomToObject(meshName);
-        
-        // Add label if text is provided
+        mesh.material = highlightMaterial(mesh, color);
+        removeLabelFromObject(meshName);
         if (labelText) {
             createLabelForObject(meshName, labelText);
         }
+        return true;
     } catch (error) {
         console.error('Error highlighting mesh:', error);
+        return false;
     }
 }
 
-export function resetHighlight(meshName) {
+function clearHighlight(meshName) {
     const mesh = meshes[meshName];
     if (mesh && mesh.userData.originalMaterial) {
         mesh.material = mesh.userData.originalMaterial;
@@ -60,27 +142,38 @@ export function resetHighlight(meshName) {
     }
 }
 
-export function zoomToObject(meshName) {
-    // Ensure the function is correctly defined and exported
-    console.log('Attempting to zoom to:', meshName);
-    const mesh = meshes[meshName];
-    // console.log(meshes);
-    if (mesh) {
-        console.log('Found mesh to zoom to:', meshName);
-        const box = new THREE.Box3().setFromObject(mesh);
-        const center = new THREE.Vector3();
-        box.getCenter(center);
-        // camera.position.set(center.x, center.y, center.z + 5);
-        camera.lookAt(center);
-        controls.target.copy(center);
-        controls.update();
+function focusCamera(meshName, target = null) {
+    const center = new THREE.Vector3();
+    if (target) {
+        center.fromArray(target);
     } else {
-        console.log('Mesh not found for zooming:', meshName);
-        console.log('Available meshes:', Object.keys(meshes));
+        meshBox(meshes[meshName]).getCenter(center);
     }
+    camera.lookAt(center);
+    controls.target.copy(center);
+    controls.update();
 }
+
 // Previous export functions remain unchanged...
 
+// Optimized, content-hashed copy of a model from the build manifest, or the
+// raw file if there is none. ?lod=1, ?lod=2... picks a simplified variant.
+async function modelUrl(name) {
+    try {
+        const response = await fetch('/api/models/manifest');
+        if (response.ok) {
+            const model = (await response.json()).models[name];
+            if (model) {
+                const lod = parseInt(new URLSearchParams(window.location.search).get('lod'), 10);
+                return (lod > 0 && model.lods[lod - 1]?.url) || model.url;
+            }
+        }
+    } catch (error) {
+        console.warn('Model manifest unavailable, loading the raw model:', error);
+    }
+    return `/static/models/${name}`;
+}
+
 
 function init() {
     console.log('Initializing scene...');
@@ -168,6 +261,7 @@ function init() {
     controls.enableDamping = true;
     controls.dampingFactor = 0.05;
     controls.screenSpacePanning = true;
+    controls.addEventListener('change', requestRender);
     controls.update();
 
     // Enhanced lighting
@@ -188,9 +282,10 @@ function init() {
 
     // Load GLB model
     const loader = new GLTFLoader();
+    loader.setMeshoptDecoder(MeshoptDecoder);
     console.log('Starting model load...');
     
-    loader.load('/static/models/your-model.glb', 
+    modelUrl('your-model.glb').then(url => loader.load(url, 
         function(gltf) {
             console.log('Model loaded successfully');
             
@@ -245,7 +340,7 @@ function init() {
             camera.lookAt(center);
             controls.target.copy(center);
             controls.update();
-
+            requestRender();
         },
         function(xhr) {
             console.log('Loading progress:', (xhr.loaded / xhr.total * 100).toFixed(2) + '%');
@@ -253,7 +348,7 @@ function init() {
         function(error) {
             console.error('Error loading model:', error);
         }
-    );
+    ));
 
     labelRenderer.setSize(window.innerWidth - 300, window.innerHeight);
     labelRenderer.domElement.style.position = 'absolute';
@@ -268,7 +363,7 @@ function init() {
     setupClippingPlaneGUI();
 
     // toggleClippingPlane();
-    animate();
+    requestRender();
     
 }
 
@@ -278,7 +373,10 @@ function setupClippingPlaneGUI() {
 
     // Position controls
     clippingPlaneFolder.add(clippingPlane, 'constant', -10, 10).name('Offset')
-        .onChange(() => console.log(`Clipping Plane Offset: ${clippingPlane.constant}`));
+        .onChange(() => {
+            console.log(`Clipping Plane Offset: ${clippingPlane.constant}`);
+            requestRender();
+        });
 
     // Rotation controls
     const planeRotation = {
@@ -292,6 +390,7 @@ function setupClippingPlaneGUI() {
         .onChange((value) => {
             clippingPlane.normal.x = value;
             console.log(`Clipping Plane Rotation X: ${value}`);
+            requestRender();
         });
 
     clippingPlaneFolder.add(planeRotation, 'rotationY', -1, 1).step(0.01)
@@ -299,6 +398,7 @@ function setupClippingPlaneGUI() {
         .onChange((value) => {
             clippingPlane.normal.y = value;
             console.log(`Clipping Plane Rotation Y: ${value}`);
+            requestRender();
         });
 
     clippingPlaneFolder.add(planeRotation, 'rotationZ', -1, 1).step(0.01)
@@ -306,18 +406,25 @@ function setupClippingPlaneGUI() {
         .onChange((value) => {
             clippingPlane.normal.z = value;
             console.log(`Clipping Plane Rotation Z: ${value}`);
+            requestRender();
         });
 
     clippingPlaneFolder.open();
 }
 
 
-function animate() {
-    requestAnimationFrame(animate);
-    controls.update();
+// Renders only when something changed: the controls moved (and, with
+// damping, until they settle), actions were applied, the model loaded or
+// the view was resized. An idle kiosk draws nothing.
+function renderFrame() {
+    frameRequested = false;
+    flushActions();
+    const moving = controls.update();
     composer.render();
     labelRenderer.render(scene, camera);
-    // highlightObject('laserCutter','#00ffff');
+    if (moving) {
+        requestRender();
+    }
 }
 
 window.addEventListener('resize', () => {
@@ -343,6 +450,8 @@ window.addEventListener('resize', () => {
     const pixelRatio = renderer.getPixelRatio();
     fxaaPass.material.uniforms['resolution'].value.x = 1 / (width * pixelRatio);
     fxaaPass.material.uniforms['resolution'].value.y = 1 / (height * pixelRatio);
+    labelRenderer.setSize(width, height);
+    requestRender();
 });
 
 // // Keyboard controls
@@ -384,7 +493,7 @@ function createLabelForObject(meshName, labelText) {
     const label = new CSS2DObject(labelDiv);
     
     // Get mesh bounds and position label higher above it
-    const boundingBox = new THREE.Box3().setFromObject(mesh);
+    const boundingBox = meshBox(mesh);
     const center = new THREE.Vector3();
     boundingBox.getCenter(center);
     const height = boundingBox.max.y - boundingBox.min.y;
@@ -0,0 +1,124 @@
+# thread_pool.py
+from collections import deque
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class WarmThreadPool:
+    """Threads created ahead of time, already seeded with the mesh context.
+
+    A new conversation takes one and only has to add its first message,
+    instead of creating the thread and uploading the context first. The
+    pool starts filling on the first take and is refilled in the background
+    after every take. Threads seeded for an older catalog version are never
+    handed out; they are deleted as soon as the catalog changes.
+    """
+
+    def __init__(self, client, context_prompt, mesh_manager, size=4, mode='thread'):
+        self.client = client
+        self.context_prompt = context_prompt
+        self.mesh_manager = mesh_manager
+        self.size = size
+        self.mode = mode
+        self.ready = deque()  # (catalog version, thread_id, seed messages)
+        self.stale = []
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.discarded = 0
+        self._filling = False
+        self._lock = threading.Lock()
+        mesh_manager.listeners.append(self.catalog_changed)
+
+    def take(self):
+        """(thread_id, seed messages) of a warm thread for the current catalog, or None"""
+        version = self.mesh_manager.version
+        with self._lock:
+            self._discard_stale(version)
+            entry = self.ready.popleft() if self.ready else None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self.refill()
+        return entry[1:] if entry is not None else None
+
+    def catalog_changed(self, mesh_manager):
+        """Delete the threads seeded for the old catalog now, not on the next take"""
+        with self._lock:
+            self._discard_stale(mesh_manager.version)
+            if not self.stale:
+                return
+        self.refill()
+
+    def _discard_stale(self, version):
+        stale = [entry[1] for entry in self.ready if entry[0] != version]
+        if stale:
+            self.ready = deque(entry for entry in self.ready if entry[0] == version)
+            self.stale.extend(stale)
+            self.discarded += len(stale)
+            logger.info("Discarded %d warm thread(s) seeded for an older catalog", len(stale))
+
+    def refill(self):
+        """Top the pool up in the background, unless it is full or already being filled"""
+        with self._lock:
+            if self._filling or (len(self.ready) >= self.size and not self.stale):
+                return
+            self._filling = True
+        threading.Thread(target=self._fill, name='thread-pool-fill', daemon=True).start()
+
+    def _fill(self):
+        try:
+            while True:
+                with self._lock:
+                    stale, self.stale = self.stale, []
+                for thread_id in stale:
+                    try:
+                        self.client.beta.threads.delete(thread_id)
+                    except Exception as e:
+                        logger.warning("Could not delete stale warm thread %s: %s", thread_id, e)
+                version = self.mesh_manager.version
+                with self._lock:
+                    self._discard_stale(version)
+                    if len(self.ready) >= self.size and not self.stale:
+                        return
+                    if len(self.ready) >= self.size:
+                        continue
+                messages = self.context_prompt.thread_messages(self.mode)
+                thread = self.client.beta.threads.create(messages=messages)
+                with self._lock:
+                    self.ready.append((version, thread.id, messages))
+                    self.created += 1
+        except Exception as e:
+            # The next take tries again
+            logger.warning("Could not fill the warm thread pool: %s", e)
+        finally:
+            with self._lock:
+                self._filling = False
+
+    def stats(self):
+        with self._lock:
+            taken = self.hits + self.misses
+            return {
+                "size": self.size,
+                "ready": len(self.ready),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / taken, 4) if taken else None,
+                "created": self.created,
+                "discarded": self.discarded,
+            }
+
+
+def make_thread_pool(config, client, context_prompt, mesh_manager):
+    """WarmThreadPool of CHAT_THREAD_POOL_SIZE threads, or None if the size is 0.
+
+    Nothing is created until the first chat turn, so importing the app or
+    running a worker that never chats doesn't leave threads on the account.
+    """
+    if config['CHAT_THREAD_POOL_SIZE'] <= 0:
+        return None
+    return WarmThreadPool(client, context_prompt, mesh_manager, config['CHAT_THREAD_POOL_SIZE'],
+                          config['CHAT_CONTEXT_MODE'])
@@ -0,0 +1,313 @@
+# tools.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import contextvars
+import json
+import logging
+from pathlib import Path
+import re
+
+from app.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Function definitions the assistant is configured with
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / 'openai-functions-mesh.json'
+DEFAULT_TIMEOUT = 10.0
+
+JSON_TYPES = {
+    'string': lambda value: isinstance(value, str),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+    'array': lambda value: isinstance(value, list),
+    'object': lambda value: isinstance(value, dict),
+    'null': lambda value: value is None,
+}
+
+
+def compile_schema(schema, path='arguments'):
+    """Turn a JSON schema (the subset function definitions use) into a validator.
+
+    The validator returns a list of error strings, empty when the value is
+    valid. Patterns and nested schemas are compiled once, up front.
+    """
+    checks = []
+
+    types = schema.get('type')
+    if types:
+        types = [types] if isinstance(types, str) else types
+        type_checks = [JSON_TYPES[name] for name in types]
+        checks.append(lambda value: [] if any(check(value) for check in type_checks)
+                      else [f"{path} must be {' or '.join(types)}"])
+
+    if 'enum' in schema:
+        allowed = schema['enum']
+        checks.append(lambda value: [] if value in allowed else [f"{path} must be one of {allowed}"])
+
+    if 'minimum' in schema:
+        minimum = schema['minimum']
+        checks.append(lambda value: [] if not JSON_TYPES['number'](value) or value >= minimum
+                      else [f"{path} must be at least {minimum}"])
+
+    if 'pattern' in schema:
+        pattern = re.compile(schema['pattern'])
+        checks.append(lambda value: [] if not isinstance(value, str) or pattern.search(value)
+                      else [f"{path} must match {pattern.pattern}"])
+
+    if 'properties' in schema or 'required' in schema:
+        properties = {name: compile_schema(sub, f"{path}.{name}")
+                      for name, sub in schema.get('properties', {}).items()}
+        required = schema.get('required', [])
+        closed = schema.get('additionalProperties') is False
+
+        def check_object(value):
+            if not isinstance(value, dict):
+                return []
+            errors = [f"{path}.{name} is required" for name in required if name not in value]
+            for name, item in value.items():
+                if name in properties:
+                    errors.extend(properties[name](item))
+                elif closed:
+                    errors.append(f"{path}.{name} is not allowed")
+            return errors
+        checks.append(check_object)
+
+    if 'minItems' in schema or 'maxItems' in schema:
+        min_items = schema.get('minItems', 0)
+        max_items = schema.get('maxItems')
+        if min_items == max_items:
+            count = f"exactly {min_items}"
+        elif max_items is None:
+            count = f"at least {min_items}"
+        else:
+            count = f"{min_items} to {max_items}"
+        checks.append(lambda value: [] if not isinstance(value, list) or
+                      (min_items <= len(value) and (max_items is None or len(value) <= max_items))
+                      else [f"{path} must have {count} items"])
+
+    if 'items' in schema:
+        item_check = compile_schema(schema['items'], f"{path}[]")
+        checks.append(lambda value: [error for item in value for error in item_check(item)]
+                      if isinstance(value, list) else [])
+
+    def validate(value):
+        errors = []
+        for check in checks:
+            errors.extend(check(value))
+        return errors
+    return validate
+
+
+def load_function_schemas(path=SCHEMA_PATH):
+    try:
+        with open(path) as f:
+            return {function['name']: function['parameters'] for function in json.load(f)['functions']}
+    except FileNotFoundError:
+        logger.warning("No function definitions at %s, tool arguments will not be validated", path)
+        return {}
+
+
+class Tool:
+    def __init__(self, name, handler, timeout, validate):
+        self.name = name
+        self.handler = handler
+        self.timeout = timeout
+        self.validate = validate
+
+
+class ToolCall:
+    """One call of a registered tool, running on the registry's pool.
+
+    value() is what the handler returned (None if there is no such tool,
+    an error dict if the arguments were invalid or it timed out), result()
+    the tool output submitted to the run. Both wait at most the tool's
+    timeout; a slow handler is abandoned, not interrupted.
+    """
+
+    def __init__(self, name, args, tool=None, early=None, tool_call_id=None):
+        self.name = name
+        self.args = args
+        self.tool = tool
+        # The value of a call that never reached a handler
+        self.early = early
+        self.tool_call_id = tool_call_id
+        self.future = None
+        self.timed_out = False
+
+    def call_handler(self):
+        with span(f"tool.{self.name}") as attributes:
+            try:
+                return self.tool.handler(self.args)
+            finally:
+                if self.timed_out:
+                    attributes['timed_out'] = True
+
+    def value(self):
+        if self.future is None:
+            return self.early
+        try:
+            return self.future.result(timeout=self.tool.timeout)
+        except TimeoutError:
+            return self._timeout_error()
+
+    async def value_async(self):
+        if self.future is None:
+            return self.early
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.future), self.tool.timeout)
+        except (TimeoutError, asyncio.TimeoutError):
+            return self._timeout_error()
+
+    def _timeout_error(self):
+        self.timed_out = True
+        logger.warning("Tool %s timed out after %ss", self.name, self.tool.timeout)
+        return {"status": "error", "message": f"{self.name} timed out after {self.tool.timeout}s"}
+
+    def result(self):
+        try:
+            return self._output(self.value())
+        except Exception as e:
+            return self._failed(e)
+
+    async def result_async(self):
+        try:
+            return self._output(await self.value_async())
+        except Exception as e:
+            return self._failed(e)
+
+    def _output(self, result):
+        logger.debug("Tool call %s(%s) -> %s", self.name, self.args, result)
+        if result is None:
+            result = {"status": "error", "message": "Function failed or not found"}
+        return {"tool_call_id": self.tool_call_id, "output": json.dumps(result)}
+
+    def _failed(self, error):
+        logger.error("Error processing function %s", self.name, exc_info=error)
+        return {"tool_call_id": self.tool_call_id, "output": json.dumps({"status": "error", "message": str(error)})}
+
+
+class ToolRegistry:
+    """Maps function names to handlers with validated arguments and per-tool timeouts.
+
+    Handlers take the parsed arguments dict and return something JSON
+    serialisable, or None for failure. Each call runs on the registry's
+    pool, the only one tool calls run on, so the calls of a batch run side
+    by side and a slow handler can be abandoned once its timeout passes.
+    """
+
+    def __init__(self, schemas=None, max_workers=16):
+        self.schemas = load_function_schemas() if schemas is None else schemas
+        self.tools = {}
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tool')
+
+    def register(self, name, handler, timeout=DEFAULT_TIMEOUT):
+        schema = self.schemas.get(name)
+        if schema is None and self.schemas:
+            logger.warning("Tool %s has no function definition, arguments will not be validated", name)
+        validate = compile_schema(schema) if schema else (lambda value: [])
+        self.tools[name] = Tool(name, handler, timeout, validate)
+
+    def tool(self, name, timeout=DEFAULT_TIMEOUT):
+        """Decorator form of register"""
+        def decorator(handler):
+            self.register(name, handler, timeout)
+            return handler
+        return decorator
+
+    def call(self, name, args, tool_call_id=None):
+        """ToolCall of name(args), already submitted to the pool if its arguments are valid"""
+        tool = self.tools.get(name)
+        if tool is None:
+            return ToolCall(name, args, tool_call_id=tool_call_id)
+        errors = tool.validate(args)
+        if errors:
+            return ToolCall(name, args, early={"status": "error", "message": f"Invalid arguments: {'; '.join(errors)}"},
+                            tool_call_id=tool_call_id)
+        call = ToolCall(name, args, tool, tool_call_id=tool_call_id)
+        # Carry the request's trace over to the worker thread
+        call.future = self.pool.submit(contextvars.copy_context().run, call.call_handler)
+        return call
+
+    def run(self, name, args):
+        """Result of one call, or an error dict"""
+        return self.call(name, args).value()
+
+    def start(self, action):
+        """Start one function tool call from a run; its result() is the tool output"""
+        name = action.function.name
+        try:
+            args = json.loads(action.function.arguments)
+        except json.JSONDecodeError as e:
+            # Log JSON parsing errors
+            logger.warning("Error parsing function arguments: %s", e)
+            return ToolCall(name, None, early={"status": "error", "message": "Invalid arguments format"},
+                            tool_call_id=action.id)
+        try:
+            return self.call(name, args, action.id)
+        except Exception as e:
+            logger.exception("Error processing function %s", name)
+            return ToolCall(name, args, early={"status": "error", "message": str(e)}, tool_call_id=action.id)
+
+    def execute(self, action):
+        """Run one function tool call and return its tool output"""
+        return self.start(action).result()
+
+
+def mesh_tool_registry(mesh_manager, scene_index=None):
+    """Registry with every function the assistant can call"""
+    registry = ToolRegistry()
+
+    @registry.tool("get_mesh_info", timeout=5)
+    def get_mesh_info(args):
+        return mesh_manager.get_mesh_info(args["mesh_name"])
+
+    @registry.tool("search_mesh_by_description", timeout=5)
+    def search_mesh_by_description(args):
+        return mesh_manager.search_mesh_by_description(args["query"], args.get("limit"))
+
+    @registry.tool("get_mesh_by_description", timeout=5)
+    def get_mesh_by_description(args):
+        return mesh_manager.get_mesh_by_description(args["query"])
+
+    # The first call may have to build the embedding matrix
+    @registry.tool("semantic_search_meshes", timeout=30)
+    def semantic_search_meshes(args):
+        return mesh_manager.semantic_search(args["query"], args.get("limit") or 5)
+
+    @registry.tool("find_nearby_meshes", timeout=5)
+    def find_nearby_meshes(args):
+        return mesh_manager.nearby_meshes(args["mesh_name"], args.get("limit") or 5)
+
+    @registry.tool("find_meshes_in_region", timeout=5)
+    def find_meshes_in_region(args):
+        # Strict function calls send every parameter, null when unused
+        margin = args.get("margin") or 0.0
+        if args.get("mesh_name") is not None:
+            region = mesh_manager.region_around(args["mesh_name"], margin)
+            if isinstance(region, dict):
+                return region
+            exclude = {args["mesh_name"]}
+        elif args.get("min") is not None and args.get("max") is not None:
+            region = [value - margin for value in args["min"]], [value + margin for value in args["max"]]
+            exclude = set()
+        else:
+            return {"status": "error", "message": "Give either mesh_name or both min and max"}
+        return mesh_manager.meshes_in_region(*region, contained=bool(args.get("contained")),
+                                             exclude=exclude, limit=args.get("limit") or 20)
+
+    def scene_action(args):
+        if scene_index is not None:
+            error = scene_index.check_mesh_name(args["mesh_name"])
+            if error:
+                return error
+        return {
+            "status": "success",
+            "mesh_name": args["mesh_name"],
+            "color": args.get("color") or "#FF0000",
+            **(scene_index.camera_target(args["mesh_name"]) if scene_index is not None else {})
+        }
+    registry.register("highlight_object", scene_action, timeout=1)
+    registry.register("zoom_to_object", scene_action, timeout=1)
+
+    return registry
@@ -0,0 +1,164 @@
+# tracing.py
+from bisect import bisect_left
+from contextlib import contextmanager
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Histogram upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    'chat_turn_seconds': "Time to answer one chat request, by how it was answered",
+    'chat_phase_seconds': "Time spent in each phase of a chat turn",
+}
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Latency histograms keyed by name and labels, rendered in the Prometheus text format"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            names = sorted({name for name, _ in self.histograms})
+            for name in names:
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for (key_name, labels), histogram in sorted(self.histograms.items()):
+                    if key_name != name:
+                        continue
+                    label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+                    prefix = f"{label_text}," if label_text else ''
+                    cumulative = 0
+                    for bound, count in zip((*self.buckets, '+Inf'), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{label_text}}} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{{{label_text}}} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+class Trace:
+    """Timed phases of one chat turn, in the order they finished"""
+
+    def __init__(self, kind, **attributes):
+        self.id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, phase, started, seconds, attributes):
+        with self._lock:
+            self.spans.append({
+                "phase": phase,
+                "offset_ms": round((started - self.started) * 1000, 3),
+                "ms": round(seconds * 1000, 3),
+                **attributes
+            })
+
+    def to_dict(self):
+        return {
+            "trace_id": self.id,
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "ms": round((time.perf_counter() - self.started) * 1000, 3),
+            **self.attributes,
+            "spans": self.spans
+        }
+
+
+metrics = Metrics()
+current_trace = contextvars.ContextVar('current_trace', default=None)
+# Set by configure(); one JSON line per finished trace is appended to it
+trace_file = None
+_trace_file_lock = threading.Lock()
+
+
+def configure(path=None):
+    global trace_file
+    trace_file = path
+
+
+def record(phase, seconds, started=None, traced=True, **attributes):
+    """Add one timed phase to its histogram and, if traced, to the current trace"""
+    metrics.observe('chat_phase_seconds', seconds, phase=phase)
+    trace = current_trace.get()
+    if trace is not None and traced:
+        trace.add(phase, started if started is not None else time.perf_counter() - seconds, seconds, attributes)
+
+
+@contextmanager
+def span(phase, **attributes):
+    """Time a block as one phase of the current turn"""
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        record(phase, time.perf_counter() - started, started, **attributes)
+
+
+@contextmanager
+def trace_turn(kind, **attributes):
+    """Collect the phases of one chat turn; set trace.attributes['path'] to say how it was answered"""
+    trace = Trace(kind, **{'path': 'model', 'status': 'ok', **attributes})
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    except Exception:
+        trace.attributes['status'] = 'error'
+        raise
+    finally:
+        try:
+            current_trace.reset(token)
+        except ValueError:
+            # A streamed response's generator closed from another context
+            pass
+        seconds = time.perf_counter() - trace.started
+        metrics.observe('chat_turn_seconds', seconds, kind=kind,
+                        path=trace.attributes['path'], status=trace.attributes['status'])
+        logger.info("%s turn %s answered by %s in %.0fms", kind, trace.id, trace.attributes['path'], seconds * 1000)
+        if trace_file:
+            export(trace)
+
+
+def export(trace):
+    line = json.dumps(trace.to_dict())
+    try:
+        with _trace_file_lock, open(trace_file, 'a') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        logger.warning("Could not write trace to %s: %s", trace_file, e)
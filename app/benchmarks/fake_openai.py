@@ -0,0 +1,455 @@
+# fake_openai.py
+"""Local stand-in for the OpenAI Assistants endpoints used by the chat app.
+
+Serves just enough of /v1/threads, /v1/threads/*/messages, /v1/threads/*/runs
+(polling and streaming) and /v1/threads/*/runs/*/steps for the app's code
+paths. Each run is a scripted conversation: ``rounds`` requires_action
+pauses with ``fanout`` function calls each, then an assistant message.
+With ``prompt_cost`` the model also takes longer the more of the thread a
+run reads, like a real one, and completed runs report their token usage
+the way the real API does: summed over every model pass, each rereading
+the thread plus ``overhead_tokens`` of instructions and tool schemas.
+``upload_cost`` does the same for creating threads and messages.
+``fail_rate`` of POSTs are answered with a 429 and a short Retry-After,
+like a rate-limited account.
+
+Run from the app/ directory:
+
+    python -m benchmarks.fake_openai --port 8765 --run-latency 0.3 --rounds 2
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python run.py
+
+GET /stats returns per-endpoint request counts.
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+_ids = itertools.count(1)
+
+
+def new_id(prefix):
+    return f"{prefix}_{next(_ids):08d}"
+
+
+class FakeAssistantsState:
+    """In-memory threads, messages and runs, plus the scripted run behaviour"""
+
+    def __init__(self, run_latency=0.2, rounds=1, fanout=1, token_delay=0.0, tokens=12, prompt_cost=0.0,
+                 upload_cost=0.0, fail_rate=0.0, overhead_tokens=2000):
+        self.run_latency = run_latency
+        self.overhead_tokens = overhead_tokens
+        self.fail_rate = fail_rate
+        self.prompt_cost = prompt_cost
+        self.upload_cost = upload_cost
+        self.rounds = rounds
+        self.fanout = fanout
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.lock = threading.RLock()
+        self.threads = {}
+        self.runs = {}
+        self.assistants = {}
+        self.request_counts = {}
+
+    def count(self, route):
+        with self.lock:
+            self.request_counts[route] = self.request_counts.get(route, 0) + 1
+
+    # -- objects -----------------------------------------------------------
+
+    def create_thread(self):
+        thread_id = new_id("thread")
+        with self.lock:
+            self.threads[thread_id] = []
+        return {"id": thread_id, "object": "thread", "created_at": int(time.time()),
+                "metadata": {}, "tool_resources": None}
+
+    def delete_thread(self, thread_id):
+        with self.lock:
+            deleted = self.threads.pop(thread_id, None) is not None
+        return {"id": thread_id, "object": "thread.deleted", "deleted": deleted}
+
+    def upload_delay(self, texts):
+        """Seconds to 'upload' messages of texts"""
+        return self.upload_cost * sum(len(text) // 4 + 1 for text in texts) / 1000
+
+    def get_assistant(self, assistant_id):
+        with self.lock:
+            return self.assistants.setdefault(assistant_id, {
+                "id": assistant_id, "object": "assistant", "created_at": int(time.time()),
+                "model": "fake-model", "name": None, "description": None, "tools": [],
+                "metadata": {}, "instructions": "You help people find things in the lab."})
+
+    def add_message(self, thread_id, role, text, run_id=None, assistant_id=None):
+        message = {
+            "id": new_id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": role,
+            "status": "completed",
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+            "assistant_id": assistant_id,
+            "run_id": run_id,
+            "attachments": [],
+            "metadata": {},
+            "incomplete_details": None,
+            "completed_at": int(time.time()),
+            "incomplete_at": None,
+        }
+        with self.lock:
+            self.threads.setdefault(thread_id, []).append(message)
+        return message
+
+    def list_messages(self, thread_id, run_id=None, order="desc", limit=20):
+        with self.lock:
+            messages = list(self.threads.get(thread_id, []))
+        if run_id:
+            messages = [m for m in messages if m["run_id"] == run_id]
+        if order == "desc":
+            messages.reverse()
+        return page(messages[:limit])
+
+    def prompt_tokens(self, messages, truncation_strategy):
+        """Approximate tokens of the thread a run reads, after its truncation_strategy"""
+        if truncation_strategy and truncation_strategy.get("type") == "last_messages":
+            messages = messages[-truncation_strategy["last_messages"]:]
+        return sum(len(m["content"][0]["text"]["value"]) // 4 + 1 for m in messages if m["content"])
+
+    def create_run(self, thread_id, assistant_id, body):
+        with self.lock:
+            messages = self.threads.get(thread_id, [])
+            user_messages = [m for m in messages if m["role"] == "user"]
+            prompt_tokens = self.prompt_tokens(messages, body.get("truncation_strategy"))
+        query = user_messages[-1]["content"][0]["text"]["value"] if user_messages else "item"
+        run = {
+            "id": new_id("run"),
+            "object": "thread.run",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "assistant_id": assistant_id,
+            "status": "queued",
+            "required_action": None,
+            "last_error": None,
+            "expires_at": None,
+            "started_at": None,
+            "cancelled_at": None,
+            "failed_at": None,
+            "completed_at": None,
+            "incomplete_details": None,
+            "model": "fake-model",
+            "instructions": body.get("instructions") or "",
+            "tools": [],
+            "metadata": {},
+            "usage": None,
+            "temperature": 1.0,
+            "top_p": 1.0,
+            "max_prompt_tokens": None,
+            "max_completion_tokens": None,
+            "truncation_strategy": body.get("truncation_strategy") or {"type": "auto", "last_messages": None},
+            "response_format": "auto",
+            "tool_choice": "auto",
+            "parallel_tool_calls": True,
+        }
+        # Every model pass rereads the prompt
+        latency = self.run_latency + self.prompt_cost * prompt_tokens / 1000
+        state = {"run": run, "round": 0, "query": query, "steps": [], "latency": latency,
+                 "prompt_tokens": prompt_tokens, "ready_at": time.monotonic() + latency}
+        with self.lock:
+            self.runs[run["id"]] = state
+        return state
+
+    def tool_calls_for_round(self, state):
+        query = re.sub(r"[^a-z0-9 ]", "", state["query"].lower()).strip()[:40] or "item"
+        last_round = state["round"] == self.rounds - 1
+        calls = []
+        for i in range(self.fanout):
+            if last_round:
+                name, args = "highlight_object", {"mesh_name": f"mesh_{i}", "color": "#FF0000"}
+            else:
+                name, args = "get_mesh_by_description", {"query": query}
+            calls.append({"id": new_id("call"), "type": "function",
+                          "function": {"name": name, "arguments": json.dumps(args)}})
+        return calls
+
+    def step(self, state, step_type, details, status="in_progress"):
+        run = state["run"]
+        step = {
+            "id": new_id("step"),
+            "object": "thread.run.step",
+            "created_at": int(time.time()),
+            "run_id": run["id"],
+            "assistant_id": run["assistant_id"],
+            "thread_id": run["thread_id"],
+            "type": step_type,
+            "status": status,
+            "cancelled_at": None, "completed_at": None, "expired_at": None,
+            "failed_at": None, "last_error": None, "metadata": {}, "usage": None,
+            "step_details": details,
+        }
+        state["steps"].append(step)
+        return step
+
+    def advance(self, state):
+        """Move a run to its next resting state; returns the events emitted"""
+        run = state["run"]
+        events = []
+        if run["status"] == "queued":
+            run["status"] = "in_progress"
+            run["started_at"] = int(time.time())
+            events.append(("thread.run.in_progress", dict(run)))
+        if state["round"] < self.rounds:
+            calls = self.tool_calls_for_round(state)
+            step = self.step(state, "tool_calls", {"type": "tool_calls", "tool_calls": []})
+            events.append(("thread.run.step.created", dict(step)))
+            for index, call in enumerate(calls):
+                events.append(("thread.run.step.delta", {
+                    "id": step["id"], "object": "thread.run.step.delta",
+                    "delta": {"step_details": {"type": "tool_calls", "tool_calls": [
+                        dict(call, index=index)]}}}))
+            step["step_details"] = {"type": "tool_calls", "tool_calls": calls}
+            run["status"] = "requires_action"
+            run["required_action"] = {"type": "submit_tool_outputs",
+                                      "submit_tool_outputs": {"tool_calls": calls}}
+            state["pending_step"] = step
+            events.append(("thread.run.requires_action", dict(run)))
+            return events
+
+        text = f"The {state['query']} is highlighted in the scene."
+        message = self.add_message(run["thread_id"], "assistant", "", run["id"], run["assistant_id"])
+        step = self.step(state, "message_creation", {
+            "type": "message_creation", "message_creation": {"message_id": message["id"]}})
+        events.append(("thread.run.step.created", dict(step)))
+        streaming_message = dict(message, status="in_progress", content=[])
+        events.append(("thread.message.created", streaming_message))
+        words = text.split(" ")
+        chunk = max(1, len(words) // max(1, self.tokens))
+        for i in range(0, len(words), chunk):
+            piece = " ".join(words[i:i + chunk]) + (" " if i + chunk < len(words) else "")
+            events.append(("thread.message.delta", {
+                "id": message["id"], "object": "thread.message.delta",
+                "delta": {"content": [{"index": 0, "type": "text",
+                                       "text": {"value": piece, "annotations": []}}]}}))
+        message["content"][0]["text"]["value"] = text
+        events.append(("thread.message.completed", dict(message)))
+        step["status"] = "completed"
+        events.append(("thread.run.step.completed", dict(step)))
+        run["status"] = "completed"
+        run["required_action"] = None
+        run["completed_at"] = int(time.time())
+        completion_tokens = len(text) // 4 + 1
+        # One pass per requires_action round plus the one that answers
+        prompt_tokens = (self.rounds + 1) * (self.overhead_tokens + state["prompt_tokens"])
+        run["usage"] = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens}
+        events.append(("thread.run.completed", dict(run)))
+        return events
+
+    def submit_tool_outputs(self, state, tool_outputs):
+        run = state["run"]
+        step = state.pop("pending_step")
+        outputs = {o["tool_call_id"]: o["output"] for o in tool_outputs}
+        for call in step["step_details"]["tool_calls"]:
+            call["function"]["output"] = outputs.get(call["id"])
+        step["status"] = "completed"
+        run["status"] = "in_progress"
+        run["required_action"] = None
+        state["round"] += 1
+        state["ready_at"] = time.monotonic() + state["latency"]
+        return [("thread.run.step.completed", dict(step))]
+
+
+def page(items):
+    return {"object": "list", "data": items,
+            "first_id": items[0]["id"] if items else None,
+            "last_id": items[-1]["id"] if items else None,
+            "has_more": False}
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # FakeAssistantsState, set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _json(self, payload, status=200, headers=()):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, events_source):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(chunk):
+            data = chunk.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        for event, data in events_source:
+            if event == "thread.message.delta" and self.state.token_delay:
+                time.sleep(self.state.token_delay)
+            write(f"event: {event}\ndata: {json.dumps(data)}\n\n")
+        write("event: done\ndata: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _wait_until_ready(self, run_state):
+        delay = run_state["ready_at"] - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _run_events(self, run_state, opening):
+        yield from opening
+        self._wait_until_ready(run_state)
+        with self.state.lock:
+            events = self.state.advance(run_state)
+        yield from events
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")[1:]  # drop "v1"
+        state = self.state
+        if len(parts) == 3 and parts[0] == "threads" and parts[2] == "messages":
+            state.count("messages.list")
+            return self._json(state.list_messages(
+                parts[1], query.get("run_id"), query.get("order", "desc"),
+                int(query.get("limit", 20))))
+        if len(parts) == 4 and parts[0] == "threads" and parts[2] == "runs":
+            state.count("runs.retrieve")
+            run_state = state.runs[parts[3]]
+            if run_state["run"]["status"] in ("queued", "in_progress"):
+                if time.monotonic() >= run_state["ready_at"]:
+                    with state.lock:
+                        state.advance(run_state)
+                elif run_state["run"]["status"] == "queued":
+                    run_state["run"]["status"] = "in_progress"
+            return self._json(run_state["run"])
+        if len(parts) == 5 and parts[0] == "threads" and parts[4] == "steps":
+            state.count("runs.steps.list")
+            steps = list(reversed(state.runs[parts[3]]["steps"]))
+            return self._json(page(steps))
+        if len(parts) == 2 and parts[0] == "assistants":
+            state.count("assistants.retrieve")
+            return self._json(state.get_assistant(parts[1]))
+        if parts == ["stats"]:
+            return self._json(state.request_counts)
+        self._json({"error": {"message": f"unknown route {url.path}"}}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")[1:]
+        body = self._body()
+        state = self.state
+        if state.fail_rate and random.random() < state.fail_rate:
+            state.count("rate_limited")
+            return self._json({"error": {"message": "Rate limit reached", "type": "requests"}}, 429,
+                              [("Retry-After", "0.1")])
+        if parts == ["threads"]:
+            state.count("threads.create")
+            time.sleep(state.upload_delay(m["content"] for m in body.get("messages") or []))
+            thread = state.create_thread()
+            for message in body.get("messages") or []:
+                state.add_message(thread["id"], message["role"], message["content"])
+            return self._json(thread)
+        if len(parts) == 3 and parts[0] == "threads" and parts[2] == "messages":
+            state.count("messages.create")
+            time.sleep(state.upload_delay([body["content"]]))
+            return self._json(state.add_message(parts[1], body.get("role", "user"), body["content"]))
+        if len(parts) == 3 and parts[0] == "threads" and parts[2] == "runs":
+            run_state = state.create_run(parts[1], body["assistant_id"], body)
+            if body.get("stream"):
+                state.count("runs.stream")
+                run = run_state["run"]
+                return self._stream(self._run_events(run_state, [
+                    ("thread.run.created", dict(run)), ("thread.run.queued", dict(run))]))
+            state.count("runs.create")
+            return self._json(run_state["run"])
+        if len(parts) == 5 and parts[0] == "threads" and parts[4] == "submit_tool_outputs":
+            run_state = state.runs[parts[3]]
+            with state.lock:
+                opening = state.submit_tool_outputs(run_state, body["tool_outputs"])
+            if body.get("stream"):
+                state.count("runs.submit_tool_outputs_stream")
+                return self._stream(self._run_events(run_state, opening))
+            state.count("runs.submit_tool_outputs")
+            return self._json(run_state["run"])
+        if len(parts) == 2 and parts[0] == "assistants":
+            state.count("assistants.update")
+            assistant = state.get_assistant(parts[1])
+            assistant.update({k: v for k, v in body.items()
+                              if k in ("instructions", "tools", "tool_resources", "metadata")})
+            return self._json(assistant)
+        self._json({"error": {"message": f"unknown route {url.path}"}}, 404)
+
+
+    def do_DELETE(self):
+        parts = urlparse(self.path).path.strip("/").split("/")[1:]
+        if len(parts) == 2 and parts[0] == "threads":
+            self.state.count("threads.delete")
+            return self._json(self.state.delete_thread(parts[1]))
+        self._json({"error": {"message": f"unknown route {self.path}"}}, 404)
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # load tests open hundreds of connections at once
+
+
+def make_server(host="127.0.0.1", port=8765, **options):
+    """Server bound to host:port (0 picks a free port); its state is server.state"""
+    state = FakeAssistantsState(**options)
+    handler = type("BoundFakeOpenAIHandler", (FakeOpenAIHandler,), {"state": state})
+    server = FakeOpenAIServer((host, port), handler)
+    server.state = state
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--run-latency", type=float, default=0.2,
+                        help="seconds the fake model 'thinks' before each pause or answer")
+    parser.add_argument("--rounds", type=int, default=1, help="requires_action rounds per run")
+    parser.add_argument("--fanout", type=int, default=1, help="tool calls per round")
+    parser.add_argument("--token-delay", type=float, default=0.0,
+                        help="seconds between streamed text deltas")
+    parser.add_argument("--prompt-cost", type=float, default=0.0,
+                        help="extra seconds per model pass for every 1000 prompt tokens")
+    parser.add_argument("--upload-cost", type=float, default=0.0,
+                        help="seconds per 1000 tokens of messages created")
+    parser.add_argument("--overhead-tokens", type=int, default=2000,
+                        help="prompt tokens of instructions and tool schemas each model pass reports")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="fraction of POSTs answered with 429 Too Many Requests")
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, run_latency=args.run_latency,
+                         rounds=args.rounds, fanout=args.fanout, token_delay=args.token_delay,
+                         prompt_cost=args.prompt_cost, upload_cost=args.upload_cost,
+                         fail_rate=args.fail_rate, overhead_tokens=args.overhead_tokens)
+    print(f"Fake Assistants API listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
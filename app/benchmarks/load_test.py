@@ -0,0 +1,341 @@
+# load_test.py
+"""Load test /api/chat against the fake Assistants API.
+
+Compares the WSGI app on a fixed thread pool (what gunicorn --threads N
+gives you) with the ASGI entry point (app.asgi) on a single event loop.
+The fake API, the app server and the load generator each get their own
+process. Run from the app/ directory:
+
+    python -m benchmarks.load_test --mode both --concurrency 200 --requests 400
+
+--concurrency takes a comma separated list to sweep several levels against
+the same app process. After each level the app's /metrics histograms are
+diffed to show where a turn's time went, phase by phase.
+
+With --turns N every client holds conversations of N turns instead of
+starting a new thread per request, and latency is also reported by turn
+number. --prompt-cost makes the fake model slower the longer the thread it
+reads, so this shows whether long conversations slow down:
+
+    python -m benchmarks.load_test --mode asgi --concurrency 10 --requests 1000 --turns 100 \
+        --prompt-cost 0.05 --app-env CHAT_FAST_PATH=0 --app-env CHAT_SESSION_STRATEGY=off
+
+Every client sends its own X-Client-Id; it only picks the per-client rate
+limit bucket with --app-env CHAT_CLIENT_ID_HEADER=X-Client-Id, as all
+clients share one address. The rate limits are off unless set with
+--app-env; requests turned away with a 429 or 503 are counted as rejected
+rather than as errors. To see how the app
+sheds load it can't take, and how it rides out an upstream that rate
+limits it (--fail-rate):
+
+    python -m benchmarks.load_test --mode asgi --concurrency 400 --requests 1200 --fail-rate 0.05 \
+        --app-env CHAT_FAST_PATH=0 --app-env CHAT_MAX_RUNNING=32 --app-env CHAT_MAX_QUEUE=64 \
+        --app-env CHAT_QUEUE_TIMEOUT=2
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+from werkzeug.serving import BaseWSGIServer
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server with a fixed number of worker threads, like gunicorn --threads"""
+
+    request_queue_size = 1024
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+def spawn(args, port, env=None, quiet=True):
+    """Start a child process and wait until it listens on port"""
+    output = subprocess.DEVNULL if quiet else None
+    process = subprocess.Popen([sys.executable, *args], env=env, stdout=output, stderr=output)
+    wait_for_port(port)
+    return process
+
+
+def start_fake_openai(args):
+    """Fake Assistants API in its own process so it doesn't share the app's GIL"""
+    port = free_port()
+    process = spawn(['-m', 'benchmarks.fake_openai', '--port', str(port),
+                     '--run-latency', str(args.run_latency), '--rounds', str(args.rounds),
+                     '--fanout', str(args.fanout), '--token-delay', str(args.token_delay),
+                     '--prompt-cost', str(args.prompt_cost), '--upload-cost', str(args.upload_cost),
+                     '--fail-rate', str(args.fail_rate)], port)
+    return f"http://127.0.0.1:{port}/v1", process
+
+
+def start_app(mode, openai_url, args):
+    port = free_port()
+    env = dict(os.environ, OPENAI_BASE_URL=openai_url,
+               OPENAI_API_KEY=os.environ.get('OPENAI_API_KEY', 'fake'),
+               CHAT_RATE_LIMIT_PER_CLIENT='0', CHAT_RATE_LIMIT_GLOBAL='0')
+    env.update(setting.split('=', 1) for setting in args.app_env)
+    process = spawn(['-m', 'benchmarks.load_test', '--serve', mode, '--port', str(port),
+                     '--wsgi-threads', str(args.wsgi_threads)], port, env, quiet=not args.verbose)
+    return f"http://127.0.0.1:{port}", process
+
+
+def serve(mode, port, threads):
+    """Child process entry point: serve the app the way production would"""
+    if mode == 'wsgi':
+        from app import create_app
+        PooledWSGIServer('127.0.0.1', port, create_app(), threads).serve_forever()
+    else:
+        import uvicorn
+        uvicorn.run('app.asgi:application', host='127.0.0.1', port=port,
+                    log_level='warning', backlog=4096)
+
+
+async def drive(base_url, concurrency, total, message, turns=1, by_turn=None, distinct=0):
+    """Fire ``total`` chat requests, ``concurrency`` at a time; returns (latencies, errors, wall, rejected).
+
+    Each client continues its thread for ``turns`` requests before starting
+    a new one; by_turn, if given, collects latencies by turn number. With
+    ``distinct``, only that many different messages are sent, round robin.
+    """
+    latencies = []
+    errors = 0
+    rejected = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker(client_id):
+            nonlocal errors, rejected
+            thread_id = None
+            turn = 0
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                if turn == turns:
+                    thread_id, turn = None, 0
+                turn += 1
+                started = time.perf_counter()
+                try:
+                    r = await client.post('/api/chat', json={
+                        "message": f"{message} {i % distinct if distinct else i}",
+                        "thread_id": thread_id
+                    }, headers={"X-Client-Id": client_id})
+                    if r.status_code in (429, 503) and 'Retry-After' in r.headers:
+                        rejected += 1
+                        continue
+                    r.raise_for_status()
+                    thread_id = r.json().get('thread_id')
+                    latencies.append(time.perf_counter() - started)
+                    if by_turn is not None:
+                        by_turn[turn].append(latencies[-1])
+                except Exception:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(f"client-{n}") for n in range(concurrency)))
+        wall = time.perf_counter() - started
+    return latencies, errors, wall, rejected
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+METRIC_LINE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+
+
+def scrape_metrics(base_url):
+    """Histogram sums and counts from the app's /metrics, keyed by (name, labels)"""
+    values = {}
+    for line in httpx.get(f"{base_url}/metrics", timeout=30).text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match and match.group(1).endswith(('_sum', '_count')):
+            labels = tuple(sorted(re.findall(r'(\w+)="([^"]*)"', match.group(2))))
+            values[match.group(1), labels] = float(match.group(3))
+    return values
+
+
+def phase_breakdown(before, after):
+    """Per-phase totals between two scrapes, plus how many turns took each path"""
+    delta = {key: value - before.get(key, 0.0) for key, value in after.items()}
+    phases = defaultdict(dict)
+    paths = defaultdict(int)
+    for (name, labels), value in delta.items():
+        labels = dict(labels)
+        if name.startswith('chat_phase_seconds_'):
+            phases[labels['phase']][name.rsplit('_', 1)[1]] = value
+        elif name == 'chat_turn_seconds_count' and value:
+            paths[f"{labels['path']}/{labels['status']}"] += int(value)
+    return {phase: totals for phase, totals in phases.items() if totals.get('count')}, dict(paths)
+
+
+def summarize(latencies, errors, wall, rejected=0):
+    ok = len(latencies)
+    return {
+        "ok": ok,
+        "errors": errors,
+        "rejected": rejected,
+        "seconds": round(wall, 3),
+        "throughput": round(ok / wall, 2) if wall else 0.0,
+        **{f"p{pct}_ms": round(percentile(latencies, pct) * 1000, 1) for pct in (50, 95, 99)},
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else float('nan'),
+    }
+
+
+def report(name, summary):
+    print(f"{name:>10}: {summary['ok']} ok, {summary['errors']} errors, {summary['rejected']} rejected "
+          f"in {summary['seconds']:.2f}s "
+          f"-> {summary['throughput']:.1f} req/s | p50 {summary['p50_ms']:.0f}ms "
+          f"p95 {summary['p95_ms']:.0f}ms p99 {summary['p99_ms']:.0f}ms mean {summary['mean_ms']:.0f}ms")
+
+
+def report_phases(phases, paths, turns):
+    """Mean time per turn in each phase; tool.* phases run inside tool_batch and overlap each other"""
+    if not phases:
+        return
+    print(f"{'':>12}answered by: {', '.join(f'{path} {count}' for path, count in sorted(paths.items()))}")
+    print(f"{'':>12}{'phase':<32}{'calls/turn':>11}{'ms/turn':>10}{'ms/call':>10}")
+    for phase, totals in sorted(phases.items(), key=lambda item: -item[1]['sum']):
+        print(f"{'':>12}{phase:<32}{totals['count'] / turns:>11.2f}{totals['sum'] * 1000 / turns:>10.1f}"
+              f"{totals['sum'] * 1000 / totals['count']:>10.2f}")
+
+
+def turn_latencies(by_turn, groups=10):
+    """p50 and p95 latency over consecutive ranges of turn numbers"""
+    turns = sorted(by_turn)
+    size = max(1, -(-len(turns) // groups))
+    rows = []
+    for start in range(0, len(turns), size):
+        chunk = turns[start:start + size]
+        values = [latency for turn in chunk for latency in by_turn[turn]]
+        rows.append({"turns": f"{chunk[0]}-{chunk[-1]}",
+                     "p50_ms": round(percentile(values, 50) * 1000, 1),
+                     "p95_ms": round(percentile(values, 95) * 1000, 1)})
+    return rows
+
+
+def report_turns(rows):
+    print(f"{'':>12}{'turns':<12}{'p50':>10}{'p95':>10}")
+    for row in rows:
+        print(f"{'':>12}{row['turns']:<12}{row['p50_ms']:>8.0f}ms{row['p95_ms']:>8.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=['wsgi', 'asgi', 'both'], default='both')
+    parser.add_argument('--concurrency', default='100',
+                        help='concurrent clients, or a comma separated list of levels to sweep')
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--wsgi-threads', type=int, default=8,
+                        help='worker threads for the WSGI server (gunicorn --threads)')
+    parser.add_argument('--run-latency', type=float, default=0.5)
+    parser.add_argument('--rounds', type=int, default=1)
+    parser.add_argument('--fanout', type=int, default=1)
+    parser.add_argument('--token-delay', type=float, default=0.0)
+    parser.add_argument('--prompt-cost', type=float, default=0.0,
+                        help="fake model's extra seconds per 1000 prompt tokens")
+    parser.add_argument('--upload-cost', type=float, default=0.0,
+                        help="fake API's seconds per 1000 tokens of messages created")
+    parser.add_argument('--fail-rate', type=float, default=0.0,
+                        help="fraction of the fake API's POSTs answered with 429 Too Many Requests")
+    parser.add_argument('--turns', type=int, default=1, help='turns per conversation')
+    parser.add_argument('--distinct-messages', type=int, default=0,
+                        help='send only this many different messages, like kiosks asking the same question')
+    parser.add_argument('--message', default='where are the calipers')
+    parser.add_argument('--app-env', action='append', default=[], metavar='KEY=VALUE',
+                        help='extra environment for the app, e.g. CHAT_FAST_PATH=0 (repeatable)')
+    parser.add_argument('--no-phases', action='store_true', help="skip the per-phase breakdown")
+    parser.add_argument('--output', help='also write the results and settings as JSON to this file')
+    parser.add_argument('--verbose', action='store_true', help="show the app server's own logging")
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.port, args.wsgi_threads)
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    openai_url, fake = start_fake_openai(args)
+    modes = ['wsgi', 'asgi'] if args.mode == 'both' else [args.mode]
+    results = []
+    try:
+        for mode in modes:
+            base_url, app_process = start_app(mode, openai_url, args)
+            try:
+                for concurrency in levels:
+                    before = {} if args.no_phases else scrape_metrics(base_url)
+                    # A fresh message per level, so one level can't warm the response cache for the next
+                    message = args.message if len(levels) == 1 else f"{args.message} c{concurrency}"
+                    by_turn = defaultdict(list)
+                    summary = summarize(*asyncio.run(drive(base_url, concurrency, args.requests, message,
+                                                           args.turns, by_turn, args.distinct_messages)))
+                    report(f"{mode} x{concurrency}", summary)
+                    result = {"mode": mode, "concurrency": concurrency, **summary}
+                    if args.turns > 1:
+                        result['by_turn'] = turn_latencies(by_turn)
+                        report_turns(result['by_turn'])
+                    if not args.no_phases:
+                        phases, paths = phase_breakdown(before, scrape_metrics(base_url))
+                        report_phases(phases, paths, max(sum(paths.values()), 1))
+                        result.update(phases=phases, paths=paths)
+                    results.append(result)
+            finally:
+                app_process.terminate()
+                app_process.wait()
+    finally:
+        fake.terminate()
+        fake.wait()
+
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ('serve', 'port', 'output')}
+        with open(args.output, 'w') as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+# search_bench.py
+"""Microbenchmarks for the MeshDataManager lookups on synthetic catalogs.
+
+Each catalog size gets a fresh manager over a generated catalog, so the
+real mesh_metadata.json is never touched, and every search the tools use
+is timed over the same seeded queries: exact names, single words, typos
+and misses. Run from the app/ directory:
+
+    python -m benchmarks.search_bench --sizes 100,1000,10000,100000,1000000
+
+Semantic search keeps a dense embedding matrix (16KB per entry with the
+hashed TF-IDF embedder), so it is skipped above --semantic-limit.
+
+With --memory, the bytes per entry of the search index (measured with
+tracemalloc, which slows that build down several times) and of the
+catalog snapshot are reported too.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.mesh_data import MeshDataManager
+from app.mesh_search import MeshSearchIndex
+from app.mesh_store import JSONMeshStore, SQLiteMeshStore
+
+ADJECTIVES = ['red', 'large', 'small', 'digital', 'cordless', 'benchtop', 'portable', 'precision',
+              'heavy', 'spare', 'metric', 'imperial', 'old', 'new', 'steel', 'plastic', 'wooden', 'blue']
+NOUNS = ['calipers', 'soldering iron', 'oscilloscope', 'multimeter', 'drill press', 'laser cutter',
+         'vinyl cutter', 'glue gun', 'heat gun', 'bandsaw', 'sander', 'vise', 'clamp', 'screwdriver set',
+         'wrench', 'hammer', 'tape measure', '3d printer', 'filament', 'power supply', 'microscope',
+         'shelf', 'workbench', 'cabinet', 'drawer', 'bin', 'toolbox', 'fume extractor', 'router', 'lathe']
+PLACES = ['north wall', 'electronics bench', 'wood shop', 'back room', 'storage rack', 'front desk',
+          'paint booth', 'loading bay', 'metal shop', 'project shelf']
+PURPOSES = ['cutting', 'measuring', 'joining', 'shaping', 'inspecting', 'holding', 'powering',
+            'finishing', 'storing', 'printing']
+CATEGORIES = ['tool', 'equipment', 'storage', 'furniture', 'consumable', 'electronics']
+
+
+def synthetic_catalog(size, seed=0):
+    """size catalog entries in the mesh_metadata.json format, the same for the same seed"""
+    rng = random.Random(seed)
+    catalog = {}
+    for i in range(size):
+        noun = rng.choice(NOUNS)
+        display_name = f"{rng.choice(ADJECTIVES).title()} {noun.title()} {i}"
+        catalog[f"Item_{i:07d}"] = {
+            "mesh_name": f"mesh_{i}",
+            "display_name": display_name,
+            "description": (f"A {rng.choice(ADJECTIVES)} {noun} used for {rng.choice(PURPOSES)}, "
+                            f"kept near the {rng.choice(PLACES)}"),
+            "category": rng.choice(CATEGORIES),
+            "properties": {"location": rng.choice(PLACES), "asset_tag": f"AT-{rng.randrange(10 ** 6):06d}"},
+        }
+    return catalog
+
+
+def typo(word, rng):
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def sample_queries(catalog, count, seed=0):
+    """(kind, query) pairs, a quarter each of exact names, words, typos and misses"""
+    rng = random.Random(seed)
+    entries = rng.sample(list(catalog.values()), min(count, len(catalog)))
+    queries = []
+    for i in range(count):
+        entry = entries[i % len(entries)]
+        noun = entry['display_name'].split(' ', 1)[1].rsplit(' ', 1)[0].lower()
+        kind = ('exact', 'word', 'typo', 'miss')[i % 4]
+        if kind == 'exact':
+            queries.append((kind, entry['display_name'].lower()))
+        elif kind == 'word':
+            queries.append((kind, noun))
+        elif kind == 'typo':
+            queries.append((kind, ' '.join(typo(word, rng) for word in noun.split())))
+        else:
+            queries.append((kind, f"zq{rng.randrange(10 ** 6)} widget"))
+    return queries
+
+
+class MemoryMeshStore:
+    """Catalog held only in memory, so benchmarks time the searches and not the disk"""
+
+    path = ':memory:'
+
+    def __init__(self, mesh_data=None):
+        self.mesh_data = mesh_data or {}
+        self.writes = 0
+
+    def load(self):
+        return self.mesh_data
+
+    def is_empty(self):
+        return not self.mesh_data
+
+    def stamp(self):
+        return self.writes
+
+    def upsert(self, mesh_data, entries):
+        mesh_data.update(entries)
+        self.mesh_data = mesh_data
+        self.writes += 1
+        return mesh_data
+
+    def save(self, mesh_data):
+        pass
+
+
+def make_store(kind, catalog, directory):
+    if kind == 'memory':
+        return MemoryMeshStore(catalog)
+    if kind == 'json':
+        store = JSONMeshStore(directory / 'catalog.json')
+    else:
+        store = SQLiteMeshStore(directory / 'catalog.sqlite3')
+    store.upsert({}, catalog)
+    return store
+
+
+def time_calls(function, arguments, budget):
+    """Seconds per call over arguments, stopping early once budget seconds have been spent"""
+    timings = []
+    spent = 0.0
+    for args in arguments:
+        started = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - started
+        timings.append(elapsed)
+        spent += elapsed
+        if spent > budget and len(timings) >= 3:
+            break
+    return timings
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def bench_size(size, args, directory):
+    catalog = synthetic_catalog(size, args.seed)
+    queries = sample_queries(catalog, args.queries, args.seed)
+    store = make_store(args.store, catalog, directory)
+    del catalog
+
+    results = {}
+    started = time.perf_counter()
+    manager = MeshDataManager(store=store)
+    results['load_and_index'] = [time.perf_counter() - started]
+
+    texts = [(query,) for _, query in queries]
+    results['get_mesh_by_description'] = time_calls(manager.get_mesh_by_description, texts, args.budget)
+    results['search_mesh_by_description'] = time_calls(manager.search_mesh_by_description, texts, args.budget)
+    results['rank_meshes (limit 5)'] = time_calls(lambda query: manager.search_mesh_by_description(query, 5),
+                                                  texts, args.budget)
+    for kind in ('exact', 'typo', 'miss'):
+        results[f"rank_meshes, {kind} only"] = time_calls(
+            lambda query: manager.search_mesh_by_description(query, 5),
+            [(query,) for k, query in queries if k == kind], args.budget / 3)
+    # Shorter than an n-gram, so these scan every entry
+    short = [(query[:2],) for k, query in queries if k == 'word']
+    results['get_mesh_by_description, 2 chars'] = time_calls(manager.get_mesh_by_description, short, args.budget / 2)
+    results['search_mesh_by_description, 2 chars'] = time_calls(manager.search_mesh_by_description, short,
+                                                               args.budget / 2)
+
+    if size <= args.semantic_limit:
+        started = time.perf_counter()
+        manager.semantic_search("warm up", 1)
+        results['semantic index build'] = [time.perf_counter() - started]
+        results['semantic_search (limit 5)'] = time_calls(manager.semantic_search, texts, args.budget)
+
+    results['catalog version hash'] = time_calls(lambda: (manager.catalog_changed(), manager.version),
+                                                 [()] * 20, args.budget)
+    updates = [(f"Bench_{i}", f"Bench Part {i}", "A part added by the benchmark", "tool")
+               for i in range(args.queries)]
+    results['add_mesh_info'] = time_calls(manager.add_mesh_info, updates, args.budget)
+    memory = measure_memory(manager) if args.memory else {}
+    return results, memory
+
+
+def measure_memory(manager):
+    """Bytes per entry of a freshly built search index and of the catalog snapshot"""
+    entries = max(len(manager.mesh_data), 1)
+    tracemalloc.start()
+    try:
+        index = MeshSearchIndex()
+        index.rebuild(manager.mesh_data)
+        index_bytes = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return {"search index": index_bytes / entries, "catalog snapshot": manager.snapshot_path.stat().st_size / entries}
+
+
+def report(size, results, memory):
+    print(f"\n{size:,} entries")
+    for name, per_entry in memory.items():
+        print(f"  {name}: {per_entry:,.0f} bytes/entry")
+    print(f"  {'operation':<38}{'calls':>7}{'p50':>12}{'p95':>12}{'ops/s':>12}")
+    for name, timings in results.items():
+        p50, p95 = percentile(timings, 50), percentile(timings, 95)
+        rate = 1 / statistics.fmean(timings)
+        print(f"  {name:<38}{len(timings):>7}{format_seconds(p50):>12}{format_seconds(p95):>12}"
+              f"{rate:>12,.{0 if rate >= 100 else 2}f}")
+
+
+def format_seconds(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='100,1000,10000,100000')
+    parser.add_argument('--store', choices=['memory', 'json', 'sqlite'], default='memory')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--budget', type=float, default=5.0, help='seconds to spend per operation and size')
+    parser.add_argument('--semantic-limit', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--memory', action='store_true', help='also measure bytes per entry')
+    parser.add_argument('--output', help='also write every timing as JSON to this file')
+    args = parser.parse_args()
+
+    all_results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in [int(size) for size in args.sizes.split(',')]:
+            directory = Path(tmp) / str(size)
+            directory.mkdir()
+            # Embedding caches go to the scratch directory too
+            os.environ['MESH_CACHE_DIR'] = str(directory / 'cache')
+            results, memory = bench_size(size, args, directory)
+            report(size, results, memory)
+            all_results[size] = {name: {"calls": len(timings), "p50": percentile(timings, 50),
+                                        "p95": percentile(timings, 95), "mean": statistics.fmean(timings)}
+                                 for name, timings in results.items()}
+            if memory:
+                all_results[size]["bytes_per_entry"] = memory
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"settings": vars(args), "results": all_results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,3 +7,67 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+    # Use the streaming run API; set to 0 to fall back to polling with backoff
+    CHAT_STREAMING = os.environ.get('CHAT_STREAMING', '1') != '0'
+    # Answer plain "where is X" lookups from the catalog without an Assistants run
+    CHAT_FAST_PATH = os.environ.get('CHAT_FAST_PATH', '1') != '0'
+    # Cache of answers to first messages: 'memory' (per process), 'sqlite'
+    # (shared by the workers on a host, under MESH_CACHE_DIR) or 'off'
+    CHAT_RESPONSE_CACHE = os.environ.get('CHAT_RESPONSE_CACHE', 'memory')
+    CHAT_RESPONSE_CACHE_TTL = int(os.environ.get('CHAT_RESPONSE_CACHE_TTL', '3600'))
+    CHAT_RESPONSE_CACHE_SIZE = int(os.environ.get('CHAT_RESPONSE_CACHE_SIZE', '1000'))
+    # Identical first messages arriving while one is being answered share its
+    # run: 'memory' (within a worker process), 'sqlite' (across the workers on
+    # a host, under MESH_CACHE_DIR) or 'off'. Waiters give up and run their own
+    # turn after CHAT_COALESCE_TIMEOUT seconds
+    CHAT_COALESCE = os.environ.get('CHAT_COALESCE', 'memory')
+    CHAT_COALESCE_TIMEOUT = float(os.environ.get('CHAT_COALESCE_TIMEOUT', '60'))
+    # Admission control for model turns, per worker process. Turns per minute
+    # and bursts allowed per client (its address) and in total; 0 turns a
+    # limit off. Behind a reverse proxy every kiosk has the proxy's address:
+    # set TRUSTED_PROXIES so it is read from X-Forwarded-For (under uvicorn,
+    # also pass --forwarded-allow-ips)
+    CHAT_RATE_LIMIT_PER_CLIENT = float(os.environ.get('CHAT_RATE_LIMIT_PER_CLIENT', '30'))
+    CHAT_RATE_BURST_PER_CLIENT = int(os.environ.get('CHAT_RATE_BURST_PER_CLIENT', '10'))
+    CHAT_RATE_LIMIT_GLOBAL = float(os.environ.get('CHAT_RATE_LIMIT_GLOBAL', '600'))
+    CHAT_RATE_BURST_GLOBAL = int(os.environ.get('CHAT_RATE_BURST_GLOBAL', '60'))
+    # Runs in flight at once; up to CHAT_MAX_QUEUE more wait for a slot for at
+    # most CHAT_QUEUE_TIMEOUT seconds, the rest get a 503 with Retry-After
+    CHAT_MAX_RUNNING = int(os.environ.get('CHAT_MAX_RUNNING', '64'))
+    CHAT_MAX_QUEUE = int(os.environ.get('CHAT_MAX_QUEUE', '128'))
+    CHAT_QUEUE_TIMEOUT = float(os.environ.get('CHAT_QUEUE_TIMEOUT', '10'))
+    # Reverse proxies in front of the app whose X-Forwarded-For is trusted
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', '0'))
+    # Header naming the client for rate limits instead of its address. Only
+    # set it if a proxy or gateway in front of the app sets (and overwrites)
+    # it, since clients could otherwise pick their own rate limit bucket
+    CHAT_CLIENT_ID_HEADER = os.environ.get('CHAT_CLIENT_ID_HEADER', '')
+    # Retries of OpenAI requests failing with 429/5xx, with jittered exponential backoff
+    OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', '4'))
+    # Size of the shared HTTP connection pool used by the ASGI chat path
+    OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', '500'))
+    # Where the mesh catalog context goes: 'thread' (first message of every new
+    # thread), 'instructions' or 'vector_store' (synced to the assistant once
+    # per catalog version)
+    CHAT_CONTEXT_MODE = os.environ.get('CHAT_CONTEXT_MODE', 'thread')
+    # Threads kept ready, already seeded with the mesh context, for the first
+    # message of new conversations (per worker process), filled from the first
+    # chat turn on. Off by default: every warm thread is created on the OpenAI
+    # account whether or not a conversation ever uses it
+    CHAT_THREAD_POOL_SIZE = int(os.environ.get('CHAT_THREAD_POOL_SIZE', '0'))
+    # DEBUG also logs raw messages and tool outputs of every turn
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    # Append a JSON line with the phase timings of every chat turn to this file
+    CHAT_TRACE_FILE = os.environ.get('CHAT_TRACE_FILE')
+    # Keeps long conversations from slowing down as their thread grows:
+    # 'truncate' (runs only read the last CHAT_SESSION_LAST_MESSAGES
+    # messages), 'roll' (after CHAT_SESSION_MAX_TURNS turns or about
+    # CHAT_SESSION_MAX_TOKENS tokens, continue in a new thread seeded with a
+    # summary), 'auto' (roll if CHAT_CONTEXT_MODE is 'thread', else truncate) or 'off'
+    CHAT_SESSION_STRATEGY = os.environ.get('CHAT_SESSION_STRATEGY', 'auto')
+    CHAT_SESSION_MAX_TURNS = int(os.environ.get('CHAT_SESSION_MAX_TURNS', '20'))
+    CHAT_SESSION_MAX_TOKENS = int(os.environ.get('CHAT_SESSION_MAX_TOKENS', '8000'))
+    CHAT_SESSION_LAST_MESSAGES = int(os.environ.get('CHAT_SESSION_LAST_MESSAGES', '12'))
+    # Sessions idle this many seconds, or beyond the most recent CHAT_SESSION_MAX, are forgotten
+    CHAT_SESSION_IDLE_TTL = int(os.environ.get('CHAT_SESSION_IDLE_TTL', '1800'))
+    CHAT_SESSION_MAX = int(os.environ.get('CHAT_SESSION_MAX', '10000'))
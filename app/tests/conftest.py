@@ -0,0 +1,42 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# The app is run from app/, with `app` and `config` importable from there
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.mesh_data import MeshDataManager
+from app.mesh_store import JSONMeshStore
+
+CATALOG = {
+    "Item_001": {"mesh_name": "calipers_1", "display_name": "Calipers",
+                 "description": "Digital calipers for measuring parts", "category": "tools",
+                 "aliases": ["vernier"], "properties": {}},
+    "Item_002": {"mesh_name": "solder_station", "display_name": "Soldering Station",
+                 "description": "Hakko soldering iron and stand", "category": "electronics",
+                 "properties": {}},
+    "Item_003": {"mesh_name": "glue_gun", "display_name": "Hot Glue Gun",
+                 "description": "For quick prototypes", "category": "tools", "properties": {}},
+    "Item_004": {"mesh_name": "laser_cutter", "display_name": "Laser Cutter",
+                 "description": "Cuts acrylic and plywood sheets", "category": "equipment",
+                 "properties": {}},
+    "Item_005": {"mesh_name": "drill_press", "display_name": "Drill Press",
+                 "description": "Bench drill for precise holes", "category": "equipment",
+                 "properties": {}},
+}
+
+
+@pytest.fixture
+def catalog():
+    return json.loads(json.dumps(CATALOG))
+
+
+@pytest.fixture
+def mesh_manager(tmp_path, monkeypatch, catalog):
+    """MeshDataManager over a small JSON catalog, with its cache in tmp_path"""
+    monkeypatch.setenv('MESH_CACHE_DIR', str(tmp_path / 'cache'))
+    path = tmp_path / 'mesh_metadata.json'
+    path.write_text(json.dumps(catalog))
+    return MeshDataManager(JSONMeshStore(path))
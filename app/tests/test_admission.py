@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+from app.admission import AdmissionControl, Overloaded, TokenBucket, upstream_failure, upstream_overload
+
+
+def admission(**limits):
+    settings = dict(client_rate=0, client_burst=1, global_rate=0, global_burst=1,
+                    max_running=0, max_queue=0, queue_timeout=0.1)
+    settings.update(limits)
+    return AdmissionControl(**settings)
+
+
+def turned_away(control, client_id='kiosk'):
+    with pytest.raises(Overloaded) as caught:
+        control.acquire(client_id)
+    return caught.value
+
+
+def test_token_bucket_refills():
+    bucket = TokenBucket(rate=2, burst=2)
+    now = bucket.updated
+    assert bucket.take(now) == 0 and bucket.take(now) == 0
+    assert bucket.take(now) == pytest.approx(0.5)
+    assert bucket.take(now + 0.5) == 0
+
+
+def test_client_rate_limit_is_per_client():
+    control = admission(client_rate=0.5, client_burst=2)
+    control.acquire('a').release()
+    control.acquire('a').release()
+    error = turned_away(control, 'a')
+    assert (error.reason, error.status, error.retry_after) == ('client_rate', 429, 2)
+    control.acquire('b').release()
+    assert control.stats()['rejected'] == {'client_rate': 1}
+
+
+def test_global_rate_limit_refunds_the_client_token():
+    control = admission(client_rate=1, client_burst=1, global_rate=1, global_burst=1)
+    control.acquire('a').release()
+    assert turned_away(control, 'b').reason == 'global_rate'
+    assert control.clients['b'].tokens == pytest.approx(1, abs=0.01)
+
+
+def test_queue_full_fails_fast_and_refunds_tokens():
+    control = admission(client_rate=1, client_burst=2, global_rate=1, global_burst=2, max_running=1)
+    running = control.acquire('a')
+    started = time.perf_counter()
+    error = turned_away(control, 'b')
+    assert time.perf_counter() - started < 0.05
+    assert (error.reason, error.status) == ('queue_full', 503)
+    assert error.retry_after >= 1
+    # Retrying during the overload didn't cost b or the global budget anything
+    assert control.clients['b'].tokens == pytest.approx(2, abs=0.01)
+    assert control.global_bucket.tokens == pytest.approx(1, abs=0.01)
+    running.release()
+    control.acquire('b').release()
+
+
+def test_queued_turn_gets_the_next_free_slot():
+    control = admission(max_running=1, max_queue=1, queue_timeout=5)
+    running = control.acquire('a')
+    threading.Timer(0.1, running.release).start()
+    control.acquire('b').release()
+    stats = control.stats()
+    assert stats['queued'] == 1 and stats['running'] == 0
+    assert stats['mean_queue_ms'] >= 90
+
+
+def test_queue_timeout_refunds_tokens():
+    control = admission(client_rate=1, client_burst=1, max_running=1, max_queue=1, queue_timeout=0.05)
+    running = control.acquire('a')
+    error = turned_away(control, 'b')
+    assert (error.reason, error.status) == ('queue_timeout', 503)
+    assert control.clients['b'].tokens == pytest.approx(1, abs=0.1)
+    assert control.stats()['queued_now'] == 0
+    running.release()
+
+
+def test_release_is_idempotent():
+    control = admission(max_running=1)
+    slot = control.acquire('a')
+    slot.release()
+    slot.release()
+    assert control.stats()['running'] == 0
+    control.acquire('a')
+    assert turned_away(control).reason == 'queue_full'
+
+
+def test_async_waiter_cancelled_in_queue_passes_its_slot_on():
+    async def main():
+        control = admission(max_running=1, max_queue=5, queue_timeout=1)
+
+        async def turn(seconds):
+            async with control.admit_async('kiosk'):
+                await asyncio.sleep(seconds)
+
+        tasks = [asyncio.create_task(turn(0.05)) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        tasks[2].cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert [type(result).__name__ for result in results] == ['NoneType', 'NoneType', 'CancelledError', 'NoneType']
+        assert control.stats()['running'] == 0 and control.stats()['queued_now'] == 0
+    asyncio.run(main())
+
+
+def api_error(cls, status, code=None, headers=None):
+    request = httpx.Request('POST', 'https://api.openai.com/v1/threads/runs')
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return cls("upstream", response=response, body={"code": code} if code else None)
+
+
+def test_upstream_rate_limits_and_5xx_are_overload():
+    overload = upstream_overload(api_error(openai.RateLimitError, 429, headers={'retry-after': '2.5'}))
+    assert (overload.reason, overload.status, overload.retry_after) == ('openai_rate_limit', 429, 3)
+    overload = upstream_overload(api_error(openai.InternalServerError, 503))
+    assert (overload.reason, overload.status) == ('openai_unavailable', 503)
+    assert upstream_failure(api_error(openai.InternalServerError, 503)) is None
+
+
+def test_unreachable_api_and_exhausted_quota_are_not_overload():
+    unreachable = openai.APIConnectionError(request=httpx.Request('POST', 'https://api.openai.com/v1/threads'))
+    quota = api_error(openai.RateLimitError, 429, code='insufficient_quota')
+    for error in (unreachable, quota):
+        assert upstream_overload(error) is None
+        assert upstream_failure(error)
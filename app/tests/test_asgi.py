@@ -0,0 +1,35 @@
+import asyncio
+import os
+import tempfile
+
+import httpx
+import pytest
+
+# app.asgi builds the Flask app and its OpenAI clients on import
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('MESH_CACHE_DIR', tempfile.mkdtemp(prefix='chat3d-test-cache-'))
+
+from app import asgi  # noqa: E402
+
+
+def post_chat(body):
+    async def post():
+        transport = httpx.ASGITransport(app=asgi.application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.post('/api/chat', content=body, headers={'content-type': 'application/json'})
+    return asyncio.run(post())
+
+
+@pytest.mark.parametrize('body, error', [
+    (b'[]', "Invalid JSON body"),
+    (b'"hi"', "Invalid JSON body"),
+    (b'1', "Invalid JSON body"),
+    (b'not json', "Invalid JSON body"),
+    (b'\xff', "Invalid JSON body"),
+    (b'{}', "message must be a non-empty string"),
+    (b'{"message": ["hi"]}', "message must be a non-empty string"),
+])
+def test_malformed_chat_request_is_a_400(body, error):
+    response = post_chat(body)
+    assert response.status_code == 400
+    assert response.json() == {"error": error, "thread_id": None}
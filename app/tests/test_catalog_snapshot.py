@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from app.mesh_data import MeshDataManager
+from app.mesh_store import JSONMeshStore, SQLiteMeshStore
+
+LATHE = {"mesh_name": "lathe", "display_name": "Lathe", "description": "Metal lathe for turning parts",
+         "category": "equipment", "properties": {}}
+
+
+@pytest.fixture
+def sqlite_path(tmp_path, monkeypatch, catalog):
+    monkeypatch.setenv('MESH_CACHE_DIR', str(tmp_path / 'cache'))
+    path = tmp_path / 'mesh_metadata.sqlite3'
+    SQLiteMeshStore(path).upsert({}, catalog)
+    return path
+
+
+def test_unchanged_store_reuses_the_snapshot(sqlite_path):
+    generation = MeshDataManager(SQLiteMeshStore(sqlite_path)).mesh_data.generation
+    assert MeshDataManager(SQLiteMeshStore(sqlite_path)).mesh_data.generation == generation
+
+
+def test_other_worker_picks_up_an_upsert_on_reload(sqlite_path):
+    writer = MeshDataManager(SQLiteMeshStore(sqlite_path))
+    reader = MeshDataManager(SQLiteMeshStore(sqlite_path))
+    version = reader.version
+
+    writer.upsert_meshes({"Item_006": LATHE})
+    assert reader.get_mesh_info("Item_006") is None
+    reader.reload()
+    assert reader.mesh_data.generation == writer.mesh_data.generation
+    assert reader.get_mesh_info("Item_006")["display_name"] == "Lathe"
+    assert reader.get_mesh_by_description("metal lathe") == "lathe"
+    assert reader.version != version
+
+
+def test_json_edited_outside_the_app_is_republished(mesh_manager, catalog):
+    generation = mesh_manager.mesh_data.generation
+    path = mesh_manager.store.path
+    path.write_text(json.dumps({**catalog, "Item_006": LATHE}, indent=2))
+
+    restarted = MeshDataManager(JSONMeshStore(path))
+    assert restarted.mesh_data.generation == generation + 1
+    assert "Item_006" in restarted.mesh_data
@@ -0,0 +1,179 @@
+import json
+import os
+import tempfile
+import threading
+
+import httpx
+import openai
+import pytest
+
+# app.routes builds its OpenAI client and mesh manager on import
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('MESH_CACHE_DIR', tempfile.mkdtemp(prefix='chat3d-test-cache-'))
+
+from app import create_app, routes  # noqa: E402
+from app.admission import AdmissionControl  # noqa: E402
+from app.response_cache import make_response_cache  # noqa: E402
+from app.routes import TurnStart  # noqa: E402
+from config import Config  # noqa: E402
+
+
+class TestConfig(Config):
+    TESTING = True
+    CHAT_FAST_PATH = True
+    CHAT_RESPONSE_CACHE = 'off'
+    CHAT_THREAD_POOL_SIZE = 0
+    CHAT_RATE_LIMIT_PER_CLIENT = 0
+    CHAT_RATE_LIMIT_GLOBAL = 0
+    CHAT_MAX_RUNNING = 1
+    CHAT_MAX_QUEUE = 0
+
+
+@pytest.fixture
+def app():
+    return create_app(TestConfig)
+
+
+@pytest.fixture
+def busy(app):
+    """Every model slot taken"""
+    slot = app.extensions['admission'].acquire('someone else')
+    yield
+    slot.release()
+
+
+@pytest.mark.parametrize('endpoint', ['/api/chat', '/api/chat/stream'])
+def test_overloaded_turn_gets_retry_after(app, busy, endpoint):
+    response = app.test_client().post(endpoint, json={"message": "what can I build with the laser cutter",
+                                                      "thread_id": None})
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.json['retry_after'] == int(response.headers['Retry-After'])
+    assert app.extensions['admission'].stats()['rejected'] == {'queue_full': 1}
+
+
+def rate_limited(app, client_id):
+    """Admission with one turn a minute per client, already used by client_id"""
+    app.extensions['admission'] = AdmissionControl(client_rate=1 / 60, client_burst=1, global_rate=0, max_running=0)
+    app.extensions['admission'].acquire(client_id).release()
+
+
+def test_rate_limited_stream_is_429(app):
+    rate_limited(app, '127.0.0.1')
+    # A client can't get a fresh bucket by naming itself
+    response = app.test_client().post('/api/chat/stream', json={"message": "what can I build", "thread_id": None},
+                                      headers={"X-Client-Id": "someone-new"})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert app.extensions['admission'].stats()['rejected'] == {'client_rate': 1}
+
+
+def test_client_id_header_set_by_a_trusted_proxy(app):
+    app.config['CHAT_CLIENT_ID_HEADER'] = 'X-Kiosk'
+    rate_limited(app, 'kiosk-1')
+    client = app.test_client()
+    response = client.post('/api/chat/stream', json={"message": "what can I build", "thread_id": None},
+                           headers={"X-Kiosk": "kiosk-1"})
+    assert response.status_code == 429
+
+
+def test_fast_path_answers_skip_admission(app, busy):
+    response = app.test_client().post('/api/chat/stream', json={"message": "where are the calipers",
+                                                                "thread_id": None})
+    assert response.status_code == 200
+    assert 'event: done' in response.get_data(as_text=True)
+
+
+class FakePool:
+    def __init__(self, warm):
+        self.warm = warm
+
+    def take(self):
+        warm, self.warm = self.warm, None
+        return warm
+
+
+def test_turn_start_uses_a_warm_thread_for_new_conversations():
+    seed = [{"role": "user", "content": "catalog"}]
+    turn = TurnStart(None, "hello", pool=FakePool(("thread_warm", seed)))
+    assert turn.thread_id == "thread_warm"
+    assert turn.seed_messages == seed
+    assert not turn.rolled
+
+    # An existing conversation keeps its thread and leaves the pool alone
+    pool = FakePool(("thread_warm", seed))
+    assert TurnStart("thread_1", "hello", pool=pool).thread_id == "thread_1"
+    assert pool.warm is not None
+
+
+def test_turn_start_new_thread_messages():
+    turn = TurnStart(None, "hello")
+    assert turn.thread_id is None
+    context = [{"role": "user", "content": "catalog"}]
+    assert turn.thread_messages(context) == context + [{"role": "user", "content": "hello"}]
+    turn.thread_created("thread_new", turn.thread_messages(context))
+    assert turn.thread_id == "thread_new"
+
+
+@pytest.mark.parametrize('endpoint', ['/api/chat', '/api/chat/stream'])
+def test_unreachable_api_is_a_502_without_retry_after(app, monkeypatch, endpoint):
+    def unreachable(*args, **kwargs):
+        raise openai.APIConnectionError(request=httpx.Request('POST', 'https://api.openai.com/v1/threads'))
+
+    monkeypatch.setattr(routes, 'start_turn', unreachable)
+    response = app.test_client().post(endpoint, json={"message": "what can I build", "thread_id": None})
+    assert 'Retry-After' not in response.headers
+    if endpoint == '/api/chat':
+        assert response.status_code == 502
+        assert response.json['error'] == "Could not reach the OpenAI API"
+    else:
+        assert 'Could not reach the OpenAI API' in response.get_data(as_text=True)
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """routes.client talking to the benchmark's fake Assistants API, two rounds of two calls per run"""
+    from benchmarks.fake_openai import make_server
+
+    server = make_server(port=0, run_latency=0.01, rounds=2, fanout=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(routes, 'client', openai.OpenAI(api_key='test', base_url=f'http://127.0.0.1:{server.server_port}/v1'))
+    yield server
+    server.shutdown()
+
+
+def sse_events(body):
+    return [(chunk.split('\n')[0][len('event: '):], json.loads(chunk.split('\n')[1][len('data: '):]))
+            for chunk in body.strip().split('\n\n')]
+
+
+def test_stream_and_chat_answer_with_the_same_actions(app, fake_openai):
+    client = app.test_client()
+    message = {"message": "what can I build with the laser cutter", "thread_id": None}
+    chat = client.post('/api/chat', json=message).json
+    done = dict(sse_events(client.post('/api/chat/stream', json=message).get_data(as_text=True)))['done']
+    assert len(chat['actions']) == 4
+    assert done['actions'] == chat['actions']
+
+
+def test_stream_finishes_the_turn_before_done(app, fake_openai):
+    app.extensions['response_cache'] = make_response_cache({'CHAT_RESPONSE_CACHE': 'memory',
+                                                            'CHAT_RESPONSE_CACHE_SIZE': 10,
+                                                            'CHAT_RESPONSE_CACHE_TTL': 60}, routes.mesh_manager)
+    response = app.test_client().post('/api/chat/stream', json={"message": "what can I build", "thread_id": None},
+                                      buffered=False)
+    for chunk in response.response:
+        if chunk.startswith(b'event: done'):
+            # The browser hangs up as soon as it has the answer
+            response.close()
+            break
+    assert app.extensions['response_cache'].get("what can I build", routes.mesh_manager.version) is not None
+
+
+@pytest.mark.parametrize('endpoint', ['/api/chat', '/api/chat/stream'])
+@pytest.mark.parametrize('body', ['[]', '"hi"', '1', 'not json', '{}', '{"message": 5}',
+                                  '{"message": "hi", "thread_id": 7}'])
+def test_malformed_chat_request_is_a_400(app, endpoint, body):
+    response = app.test_client().post(endpoint, data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert response.json['thread_id'] is None
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.chat_sessions import SessionManager, approximate_tokens, make_session_manager
+
+CONTEXT = [{"role": "user", "content": "x" * 12000}]  # a ~3k token catalog context
+
+
+def start(sessions, thread_id='thread_1', previous=None):
+    sessions.started(thread_id, CONTEXT + [{"role": "user", "content": "where are the calipers"}], previous)
+
+
+def test_rolls_after_max_turns():
+    sessions = SessionManager('roll', max_turns=3, max_tokens=100000)
+    start(sessions)
+    for turn in range(3):
+        assert sessions.next_thread('thread_1') == ('thread_1', [])
+        sessions.record_turn('thread_1', f"question {turn}", f"answer {turn}")
+    thread_id, carried = sessions.next_thread('thread_1')
+    assert thread_id is None
+    assert "question 2" in carried[0]['content'] and "answer 2" in carried[0]['content']
+
+
+def test_thread_size_counts_messages_not_run_usage():
+    sessions = SessionManager('roll', max_turns=100, max_tokens=8000)
+    start(sessions)
+    # Tool-heavy turns report far more prompt tokens than they add to the thread;
+    # the session only grows by what was appended
+    for turn in range(10):
+        sessions.record_turn('thread_1', "zoom to the drill press", "Zooming to the **Drill Press**.")
+        assert sessions.next_thread('thread_1') == ('thread_1', [])
+    expected = sum(approximate_tokens(m['content']) for m in CONTEXT) + approximate_tokens("where are the calipers")
+    expected += 10 * (approximate_tokens("zoom to the drill press") + approximate_tokens("Zooming to the **Drill Press**."))
+    assert sessions.stats()['max_tokens'] == expected
+
+
+def test_rolls_past_max_tokens():
+    sessions = SessionManager('roll', max_turns=100, max_tokens=4000)
+    start(sessions)
+    sessions.record_turn('thread_1', "tell me everything", "y" * 4000)
+    assert sessions.next_thread('thread_1')[0] is None
+
+
+def test_rolled_thread_starts_fresh_and_keeps_history():
+    sessions = SessionManager('roll', max_turns=1)
+    start(sessions)
+    sessions.record_turn('thread_1', "where are the calipers", "On the bench.")
+    assert sessions.next_thread('thread_1')[0] is None
+    start(sessions, 'thread_2', previous='thread_1')
+    assert sessions.next_thread('thread_2') == ('thread_2', [])
+    sessions.record_turn('thread_2', "and the glue", "In the drawer.")
+    _, carried = sessions.next_thread('thread_2')
+    assert "calipers" in carried[0]['content'] and "glue" in carried[0]['content']
+    assert sessions.stats()['rolled'] == 1
+
+
+def test_truncate_never_rolls():
+    sessions = SessionManager('truncate', max_turns=1, last_messages=6)
+    start(sessions)
+    sessions.record_turn('thread_1', "a", "b")
+    sessions.record_turn('thread_1', "c", "d")
+    assert sessions.next_thread('thread_1') == ('thread_1', [])
+    assert sessions.run_options() == {"truncation_strategy": {"type": "last_messages", "last_messages": 6}}
+
+
+def test_idle_sessions_expire(monkeypatch):
+    sessions = SessionManager('roll', max_turns=1, idle_ttl=10)
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr('app.chat_sessions.time.monotonic', lambda: clock.now)
+    start(sessions)
+    sessions.record_turn('thread_1', "a", "b")
+    clock.now += 11
+    assert sessions.stats()['sessions'] == 0
+    # A thread this process no longer knows is picked up, not refused
+    assert sessions.next_thread('thread_1') == ('thread_1', [])
+
+
+@pytest.mark.parametrize('context_mode, strategy', [('thread', 'roll'), ('instructions', 'truncate')])
+def test_auto_strategy(context_mode, strategy):
+    config = {'CHAT_SESSION_STRATEGY': 'auto', 'CHAT_CONTEXT_MODE': context_mode, 'CHAT_SESSION_MAX_TURNS': 20,
+              'CHAT_SESSION_MAX_TOKENS': 8000, 'CHAT_SESSION_LAST_MESSAGES': 12, 'CHAT_SESSION_MAX': 100,
+              'CHAT_SESSION_IDLE_TTL': 60}
+    assert make_session_manager(config).strategy == strategy
+    assert make_session_manager(dict(config, CHAT_SESSION_STRATEGY='off')) is None
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+
+from app.coalescing import RequestCoalescer, SQLiteFlights
+from app.response_cache import ResponseCache
+
+ANSWER = {"response": "It's on the bench.", "actions": [{"name": "highlight_object", "parameters": {}}],
+          "thread_id": "thread_leader"}
+
+
+def test_identical_messages_share_one_turn():
+    coalescer = RequestCoalescer(timeout=5)
+    release = threading.Event()
+    turns = []
+
+    def turn():
+        turns.append(1)
+        release.wait(5)
+        return dict(ANSWER), 200
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(coalescer.run("Where is the lathe?", 'v1', turn)))
+    leader.start()
+    while not coalescer.flights:
+        threading.Event().wait(0.001)
+    follower = threading.Thread(target=lambda: results.append(coalescer.run("where is the lathe", 'v1', turn)))
+    follower.start()
+    threading.Event().wait(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(turns) == 1
+    followed = next(result for result in results if result[2])
+    assert followed == ({"response": ANSWER["response"], "actions": ANSWER["actions"], "thread_id": None}, 200, True)
+    assert coalescer.stats()["coalesced"] == 1
+    assert coalescer.flights == {}
+
+
+def test_failed_turn_is_not_shared():
+    coalescer = RequestCoalescer(timeout=5)
+    release = threading.Event()
+    turns = []
+
+    def turn():
+        turns.append(1)
+        if len(turns) == 1:
+            release.wait(5)
+            return {"error": "Run failed"}, 500
+        return dict(ANSWER), 200
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(coalescer.run("lathe", 'v1', turn)))
+    leader.start()
+    while not coalescer.flights:
+        threading.Event().wait(0.001)
+    follower = threading.Thread(target=lambda: results.append(coalescer.run("lathe", 'v1', turn)))
+    follower.start()
+    threading.Event().wait(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(turns) == 2
+    assert sorted(status for _, status, _ in results) == [200, 500]
+    assert coalescer.stats()["fallbacks"] == 1
+
+
+def test_async_followers_share_the_leaders_turn():
+    coalescer = RequestCoalescer(timeout=5)
+    turns = []
+
+    async def turn():
+        turns.append(1)
+        await asyncio.sleep(0.05)
+        return dict(ANSWER), 200
+
+    async def main():
+        return await asyncio.gather(*(coalescer.run_async("lathe", 'v1', turn) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(turns) == 1
+    assert [coalesced for _, _, coalesced in results].count(True) == 4
+
+
+def no_turn():
+    raise AssertionError("ran a model turn")
+
+
+def test_other_workers_answer_is_shared_through_sqlite(tmp_path):
+    path = tmp_path / 'inflight.sqlite3'
+    flights = SQLiteFlights(path)
+    key = ResponseCache.key("lathe", 'v1')
+    assert flights.claim(key)
+    flights.finish(key, {"response": ANSWER["response"], "actions": ANSWER["actions"]})
+
+    # A second worker, with its own connection, finds the answer instead of running a turn
+    coalescer = RequestCoalescer(SQLiteFlights(path), timeout=1)
+    payload, status, coalesced = coalescer.run("lathe", 'v1', no_turn)
+    assert coalesced and status == 200 and payload["thread_id"] is None
+    assert coalescer.stats()["coalesced_across_workers"] == 1
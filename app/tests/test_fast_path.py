@@ -0,0 +1,54 @@
+import pytest
+
+from app.fast_path import HIGHLIGHT_COLOR, FastPath, parse_lookup
+
+
+class FakeSceneIndex:
+    def check_mesh_name(self, mesh_name):
+        return None
+
+    def camera_target(self, mesh_name):
+        return {"target": [1.0, 2.0, 3.0], "radius": 0.5}
+
+
+@pytest.fixture(params=[None, FakeSceneIndex()], ids=['no_scene_index', 'scene_index'])
+def fast_path(request, mesh_manager):
+    return FastPath(mesh_manager, client=None, scene_index=request.param)
+
+
+def test_parse_lookup():
+    assert parse_lookup("Where are the calipers?") == ('highlight_object', 'the calipers')
+    assert parse_lookup("please zoom to the laser cutter") == ('zoom_to_object', 'the laser cutter')
+    assert parse_lookup("where are the calipers and the glue") is None
+    assert parse_lookup("how does the laser cutter work") is None
+
+
+def test_highlight_text_matches_action(fast_path):
+    answer = fast_path.answer("where are the calipers")
+    action = answer['actions'][0]
+    assert action['name'] == 'highlight_object'
+    assert action['parameters']['mesh_name'] == 'calipers_1'
+    assert action['parameters']['color'] == HIGHLIGHT_COLOR
+    assert answer['response'].startswith("I've highlighted the **Calipers** in red.")
+
+
+def test_zoom_text_matches_action(fast_path):
+    answer = fast_path.answer("zoom to the calipers")
+    action = answer['actions'][0]
+    assert action['name'] == 'zoom_to_object'
+    assert 'color' not in action['parameters']
+    assert answer['response'].startswith("Zooming to the **Calipers**.")
+
+
+def test_camera_target_only_with_scene_index(fast_path):
+    parameters = fast_path.answer("zoom to the calipers")['actions'][0]['parameters']
+    if fast_path.scene_index is None:
+        assert 'target' not in parameters
+    else:
+        assert parameters['target'] == [1.0, 2.0, 3.0] and parameters['radius'] == 0.5
+
+
+def test_unknown_or_complex_goes_to_model(fast_path):
+    assert fast_path.answer("where is the spaceship") is None
+    assert fast_path.answer("what can I build here") is None
+    assert fast_path.stats.snapshot()['requests'] == 2
@@ -0,0 +1,118 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.mesh_search import MeshSearchIndex
+from app.tools import mesh_tool_registry
+
+BUNDLED_CATALOG = Path(__file__).resolve().parent.parent / 'app' / 'static' / 'mesh_metadata.json'
+
+
+def scan_search(mesh_data, query):
+    """The linear scan search_mesh_by_description used to do"""
+    query = query.lower()
+    return [mesh_id for mesh_id, data in mesh_data.items()
+            if query in data['description'].lower() or query in data['display_name'].lower()]
+
+
+def scan_first_match(mesh_data, query):
+    """The linear scan get_mesh_by_description used to do"""
+    query = query.lower()
+    for mesh_id, data in mesh_data.items():
+        if (query in data['display_name'].lower() or query in data['description'].lower()
+                or any(query in alias.lower() for alias in data.get('aliases', []))):
+            return mesh_id
+    return None
+
+
+def sample_queries(mesh_data):
+    queries = {'', 'a', 'xyzzy', 'CUT', ' ', 'the '}
+    for data in mesh_data.values():
+        for text in [data['display_name'], data['description'], *data.get('aliases', [])]:
+            lowered = text.lower()
+            queries.update(lowered[i:i + n] for n in (1, 2, 3, 5, 9) for i in range(0, len(lowered), 3))
+    return sorted(queries)
+
+
+@pytest.fixture(scope='module')
+def bundled():
+    mesh_data = json.loads(BUNDLED_CATALOG.read_text())
+    index = MeshSearchIndex()
+    index.rebuild(mesh_data)
+    return mesh_data, index
+
+
+def test_substring_search_matches_linear_scan(bundled):
+    mesh_data, index = bundled
+    for query in sample_queries(mesh_data):
+        assert index.search(query) == scan_search(mesh_data, query), query
+        assert index.first_match(query) == scan_first_match(mesh_data, query), query
+
+
+def test_substring_search_follows_edits(catalog):
+    index = MeshSearchIndex()
+    index.rebuild(catalog)
+    catalog['Item_002'] = dict(catalog['Item_002'], display_name="Rework Station")
+    index.add('Item_002', catalog['Item_002'])
+    del catalog['Item_003']
+    index.remove('Item_003')
+    for query in ['station', 'solder', 'glue', 'rework', 'e']:
+        assert index.search(query) == scan_search(catalog, query), query
+
+
+def test_rank_orders_by_relevance(catalog):
+    index = MeshSearchIndex()
+    index.rebuild(catalog)
+    assert [mesh_id for mesh_id, _ in index.rank("laser cutter")][0] == 'Item_004'
+    # Typos and prefixes still find the entry
+    assert index.rank("calipres")[0][0] == 'Item_001'
+    assert index.rank("solder")[0][0] == 'Item_002'
+    scores = [score for _, score in index.rank("drill press for holes", limit=5)]
+    assert scores == sorted(scores, reverse=True)
+    assert index.rank("xyzzy") == []
+
+
+def test_rank_ties_break_by_category_then_catalog_order():
+    index = MeshSearchIndex()
+    index.rebuild({
+        "b": {"mesh_name": "b", "display_name": "Clamp", "description": "", "category": "tools"},
+        "a": {"mesh_name": "a", "display_name": "Clamp", "description": "", "category": "equipment"},
+        "c": {"mesh_name": "c", "display_name": "Clamp", "description": "", "category": "tools"},
+    })
+    assert [mesh_id for mesh_id, _ in index.rank("clamp")] == ['a', 'b', 'c']
+
+    # A category added later that sorts first moves ahead on the next query
+    index.add("d", {"mesh_name": "d", "display_name": "Clamp", "description": "", "category": "agriculture"})
+    assert [mesh_id for mesh_id, _ in index.rank("clamp")] == ['d', 'a', 'b', 'c']
+
+
+def test_rank_limit(catalog):
+    index = MeshSearchIndex()
+    index.rebuild(catalog)
+    assert len(index.rank("calipers laser drill glue", limit=5)) == 4
+    assert len(index.rank("calipers laser drill glue", limit=2)) == 2
+    for limit in (0, -1):
+        with pytest.raises(ValueError):
+            index.rank("tools", limit=limit)
+
+
+def test_search_tool_rejects_bad_limit(mesh_manager):
+    registry = mesh_tool_registry(mesh_manager)
+    assert [entry['mesh_id'] for entry in registry.run("search_mesh_by_description",
+                                                       {"query": "calipers", "limit": 1})] == ['Item_001']
+    # null keeps the plain substring search
+    results = registry.run("search_mesh_by_description", {"query": "station", "limit": None})
+    assert [entry['mesh_name'] for entry in results] == ['solder_station']
+    for limit in (0, -1):
+        result = registry.run("search_mesh_by_description", {"query": "calipers", "limit": limit})
+        assert result['status'] == 'error' and 'limit must be at least 1' in result['message']
+
+
+def test_get_mesh_by_description_typo_fallback(mesh_manager):
+    assert mesh_manager.get_mesh_by_description("Calipers") == 'calipers_1'
+    assert mesh_manager.get_mesh_by_description("calipres") == 'calipers_1'
+    assert mesh_manager.get_mesh_by_description("lazer cutter") == 'laser_cutter'
+    # A weak partial match is not a match
+    assert mesh_manager.get_mesh_by_description("laser spaceship") is None
+    assert mesh_manager.get_mesh_by_description("spaceship") is None
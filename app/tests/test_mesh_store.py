@@ -0,0 +1,28 @@
+from app.mesh_store import JSONMeshStore, SQLiteMeshStore
+
+LATHE = {"mesh_name": "lathe", "display_name": "Lathe", "description": "Metal lathe for turning parts",
+         "category": "equipment", "properties": {}}
+
+
+def test_sqlite_stamp_counts_upserts(tmp_path, catalog):
+    store = SQLiteMeshStore(tmp_path / 'meshes.sqlite3')
+    assert store.is_empty()
+    store.upsert({}, catalog)
+    stamp = store.stamp()
+    store.upsert({}, {"Item_006": LATHE})
+    assert store.stamp() == stamp + 1
+    assert list(store.load())[-1] == "Item_006"
+    # Replacing an entry keeps its place in the catalog
+    store.upsert({}, {"Item_001": {**catalog["Item_001"], "description": "Worn out"}})
+    assert list(store.load())[0] == "Item_001"
+    assert store.load()["Item_001"]["description"] == "Worn out"
+
+
+def test_json_stamp_follows_the_file(tmp_path, catalog):
+    store = JSONMeshStore(tmp_path / 'mesh_metadata.json')
+    assert store.is_empty() and store.stamp() is None
+    store.upsert({}, catalog)
+    stamp = store.stamp()
+    store.upsert(store.load(), {"Item_006": LATHE})
+    assert store.stamp() != stamp
+    assert "Item_006" in store.load()
@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from app import model_pipeline
+from app.model_pipeline import ModelPipeline, write_atomic
+
+MODEL = b'glTF' + b'\0' * 4096
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    # Publish the models as they are, whether or not gltfpack is installed
+    monkeypatch.setattr(model_pipeline.shutil, 'which', lambda name: None)
+    source_dir = tmp_path / 'models'
+    source_dir.mkdir()
+    (source_dir / 'shop.glb').write_bytes(MODEL)
+    return ModelPipeline(source_dir, tmp_path / 'build')
+
+
+def wait_built(pipeline):
+    for _ in range(200):
+        with pipeline._lock:
+            if not pipeline._building:
+                return
+        threading.Event().wait(0.01)
+    raise AssertionError("background build never finished")
+
+
+def test_unbuilt_models_are_served_raw_while_building(pipeline, monkeypatch):
+    release = threading.Event()
+    build = pipeline.build
+    monkeypatch.setattr(pipeline, 'build', lambda: release.wait(5) and build())
+
+    assert pipeline.manifest()['models'] == {}
+    release.set()
+    wait_built(pipeline)
+    manifest = pipeline.manifest()
+    assert manifest['models']['shop.glb']['url'].startswith('/models/shop.')
+    assert pipeline.resolve(manifest['models']['shop.glb']['file'], {'gzip'})[1] == 'gzip'
+
+
+def test_deploy_time_build_is_used_without_rebuilding(pipeline, monkeypatch):
+    built = pipeline.build()
+    monkeypatch.setattr(pipeline, 'build', lambda: pytest.fail("rebuilt on request"))
+    assert pipeline.manifest() == built
+    assert not pipeline._building
+
+
+def test_changed_source_is_left_out_until_rebuilt(pipeline):
+    pipeline.build()
+    (pipeline.source_dir / 'shop.glb').write_bytes(MODEL + b'changed')
+    assert pipeline.manifest()['models'] == {}
+    wait_built(pipeline)
+    assert pipeline.manifest()['models']['shop.glb']['bytes'] == len(MODEL) + 7
+
+
+def test_touched_source_is_not_rebuilt(pipeline, monkeypatch):
+    built = pipeline.build()
+    source = pipeline.source_dir / 'shop.glb'
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    monkeypatch.setattr(pipeline, 'build', lambda: pytest.fail("rebuilt a touched model"))
+    assert pipeline.manifest()['models'] == built['models']
+
+
+def test_manifest_without_source_stats_is_still_used(pipeline, monkeypatch):
+    built = pipeline.build()
+    for entry in built['models'].values():
+        del entry['source_stat']
+    pipeline.manifest_path.write_text(json.dumps(built))
+    monkeypatch.setattr(pipeline, 'build', lambda: pytest.fail("rebuilt an unchanged model"))
+    assert pipeline.manifest()['models'] == built['models']
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_cleanup_keeps_lock_and_live_temp_files(pipeline):
+    pipeline.output_dir.mkdir()
+    in_progress = pipeline.output_dir / f'shop.0123456789ab.glb.{os.getppid()}.tmp'
+    in_progress.write_bytes(b'partial')
+    orphan = pipeline.output_dir / f'manifest.json.{dead_pid()}.tmp'
+    orphan.write_bytes(b'')
+    stale = pipeline.output_dir / 'shop.000000000000.glb'
+    stale.write_bytes(b'old')
+
+    manifest = pipeline.build()
+    assert in_progress.exists()
+    assert not orphan.exists()
+    assert (pipeline.output_dir / 'manifest.json.lock').exists()
+    assert not stale.exists()
+    assert (pipeline.output_dir / manifest['models']['shop.glb']['file']).exists()
+
+
+def test_failed_write_leaves_no_temp_file(tmp_path, monkeypatch):
+    def interrupted(src, dst):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(model_pipeline.os, 'replace', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        write_atomic(tmp_path / 'manifest.json', b'{}')
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,33 @@
+from app.response_cache import MemoryCacheBackend, ResponseCache, SQLiteCacheBackend
+
+ANSWER = {"response": "It's on the bench.", "actions": [{"name": "highlight_object", "parameters": {}}],
+          "thread_id": "thread_1"}
+CACHED = {"response": ANSWER["response"], "actions": ANSWER["actions"]}
+
+
+class FakeCatalog:
+    def __init__(self):
+        self.version = 'v1'
+        self.listeners = []
+
+
+def test_response_cache_is_keyed_by_normalized_message_and_version():
+    catalog = FakeCatalog()
+    cache = ResponseCache(MemoryCacheBackend(), catalog)
+    cache.put("Where is the lathe?", 'v1', ANSWER)
+    assert cache.get("where is the lathe", 'v1') == CACHED
+    assert cache.get("where is the lathe", 'v2') is None
+
+    catalog.version = 'v2'
+    for listener in catalog.listeners:
+        listener(catalog)
+    assert cache.get("where is the lathe", 'v1') is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_sqlite_backend_evicts_the_oldest_entries(tmp_path):
+    cache = ResponseCache(SQLiteCacheBackend(tmp_path / 'responses.sqlite3', max_entries=2), FakeCatalog())
+    for message in ("lathe", "drill", "glue"):
+        cache.put(message, 'v1', ANSWER)
+    assert cache.get("lathe", 'v1') is None
+    assert cache.get("glue", 'v1') == CACHED
@@ -0,0 +1,60 @@
+import json
+import threading
+
+from app.semantic_index import HashedTfidfEmbedder, SemanticMeshIndex
+
+
+def top(index, text):
+    return index.query(text, limit=1)[0][0]
+
+
+def test_rebuild_embeds_only_changed_entries(tmp_path, catalog):
+    embedder = HashedTfidfEmbedder(dim=256)
+    calls = []
+    embed = embedder.embed
+    embedder.embed = lambda texts: calls.append(len(texts)) or embed(texts)
+    index = SemanticMeshIndex(tmp_path, embedder)
+    index.build(catalog)
+    assert top(index, "measuring parts") == 'Item_001'
+    assert calls == [5, 1]  # the catalog, then the query
+    calls.clear()
+    catalog['Item_006'] = {"mesh_name": "vinyl_cutter", "display_name": "Vinyl Cutter",
+                           "description": "Cuts stickers and decals", "category": "equipment"}
+    index.build(catalog)
+    index.build(catalog)
+    assert calls == [1]
+    assert top(index, "stickers") == 'Item_006'
+    # Only the matrix the keys file names is left
+    published = json.loads(index.keys_path.read_text())
+    assert [path.name for path in tmp_path.glob('*.npy')] == [published['vectors']]
+
+
+def test_reordered_catalog_gets_its_own_rows(tmp_path, catalog):
+    embedder = HashedTfidfEmbedder(dim=256)
+    SemanticMeshIndex(tmp_path, embedder).build(catalog)
+    reordered = dict(reversed(list(catalog.items())))
+    index = SemanticMeshIndex(tmp_path, embedder)
+    index.build(reordered)
+    assert top(index, "acrylic plywood") == 'Item_004'
+    assert top(index, "digital calipers") == 'Item_001'
+
+
+def test_workers_building_different_catalogs_stay_consistent(tmp_path, catalog):
+    embedder = HashedTfidfEmbedder(dim=256)
+    smaller = {mesh_id: catalog[mesh_id] for mesh_id in ('Item_004', 'Item_001')}
+    indexes = []
+
+    def worker(mesh_data):
+        for _ in range(10):
+            index = SemanticMeshIndex(tmp_path, embedder)
+            index.build(mesh_data)
+            indexes.append((index, mesh_data))
+
+    threads = [threading.Thread(target=worker, args=(mesh_data,)) for mesh_data in (catalog, smaller)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+    for index, mesh_data in indexes:
+        assert index.matrix.shape[0] == len(mesh_data)
+        assert top(index, "acrylic plywood") == 'Item_004'
+        assert top(index, "digital calipers") == 'Item_001'
+    assert not list(tmp_path.glob('*.tmp*'))
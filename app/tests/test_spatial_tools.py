@@ -0,0 +1,93 @@
+import pytest
+
+from app.spatial_index import SpatialIndex
+from app.tools import compile_schema, load_function_schemas, mesh_tool_registry
+
+BOXES = {
+    "bench": ([0, 0, 0], [10, 1, 4]),
+    "calipers_1": ([1, 1, 1], [2, 1.2, 1.5]),
+    "solder_station": ([4, 1, 1], [5, 2, 2]),
+    "laser_cutter": ([20, 0, 0], [24, 3, 3]),
+}
+
+
+class FakeSceneIndex:
+    def __init__(self):
+        self.index = SpatialIndex(list(BOXES), [low for low, _ in BOXES.values()],
+                                  [high for _, high in BOXES.values()])
+
+    def spatial(self):
+        return self.index
+
+    def check_mesh_name(self, mesh_name):
+        return None if mesh_name in BOXES else {"status": "error", "message": f"No object named {mesh_name}"}
+
+
+@pytest.fixture
+def registry(mesh_manager):
+    mesh_manager.scene_index = FakeSceneIndex()
+    return mesh_tool_registry(mesh_manager, mesh_manager.scene_index)
+
+
+def region(**args):
+    return {"mesh_name": None, "min": None, "max": None, "margin": None, "contained": None, "limit": None, **args}
+
+
+def names(result):
+    return [found['mesh_name'] for found in result]
+
+
+def test_region_around_a_mesh(registry):
+    assert names(registry.run("find_meshes_in_region", region(mesh_name="bench", margin=0.5))) == [
+        'solder_station', 'calipers_1']
+
+
+def test_explicit_region(registry):
+    result = registry.run("find_meshes_in_region", region(min=[0, 0, 0], max=[3, 3, 3], contained=True))
+    assert names(result) == ['calipers_1']
+    assert names(registry.run("find_meshes_in_region", region(min=[19, 0, 0], max=[30, 5, 5], limit=1))) == [
+        'laser_cutter']
+
+
+@pytest.mark.parametrize('corners, message', [
+    (dict(min=[0, 0], max=[3, 3, 3]), "arguments.min must have exactly 3 items"),
+    (dict(min=[0, 0, 0], max=[3, 3, 3, 3]), "arguments.max must have exactly 3 items"),
+    (dict(min=[5, 0, 0], max=[3, 3, 3]), "at most"),
+    (dict(min=[0, 0, 0]), "Give either mesh_name or both min and max"),
+    (dict(min=[0, 0, 0], max=[3, 3, 3], limit=0), "arguments.limit must be at least 1"),
+])
+def test_bad_regions_are_reported(registry, corners, message):
+    result = registry.run("find_meshes_in_region", region(**corners))
+    assert result['status'] == 'error' and message in result['message']
+
+
+def test_meshes_in_region_checks_corners(mesh_manager):
+    mesh_manager.scene_index = FakeSceneIndex()
+    assert mesh_manager.meshes_in_region([0, 0], [1, 1, 1])['status'] == 'error'
+    assert mesh_manager.meshes_in_region([0, 0, float('nan')], [1, 1, 1])['status'] == 'error'
+    assert mesh_manager.meshes_in_region([2, 0, 0], [1, 1, 1])['status'] == 'error'
+
+
+def test_nearby(registry):
+    result = registry.run("find_nearby_meshes", {"mesh_name": "calipers_1", "limit": None})
+    assert names(result)[0] == 'bench'
+    assert len(registry.run("find_nearby_meshes", {"mesh_name": "calipers_1", "limit": 2})) == 2
+
+
+def test_strict_schemas_list_every_property():
+    for name, schema in load_function_schemas().items():
+        assert sorted(schema['required']) == sorted(schema['properties']), name
+        assert schema['additionalProperties'] is False, name
+
+
+def test_validator():
+    validate = compile_schema({"type": "object", "properties": {
+        "limit": {"type": ["integer", "null"], "minimum": 1},
+        "corner": {"type": "array", "items": {"type": "number"}, "minItems": 3, "maxItems": 3},
+    }, "required": ["limit"], "additionalProperties": False})
+    assert validate({"limit": None, "corner": [1, 2, 3]}) == []
+    assert validate({"limit": 0}) == ["arguments.limit must be at least 1"]
+    assert validate({"limit": True}) == ["arguments.limit must be integer or null"]
+    assert validate({"corner": [1, "2"]}) == ["arguments.limit is required", "arguments.corner must have exactly 3 items",
+                                              "arguments.corner[] must be number"]
+    assert validate({"limit": 1, "extra": 1}) == ["arguments.extra is not allowed"]
@@ -0,0 +1,83 @@
+import threading
+from types import SimpleNamespace
+
+from app.thread_pool import make_thread_pool
+
+
+class FakeThreads:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.created = []
+        self.deleted = []
+
+    def create(self, messages):
+        with self.lock:
+            thread_id = f"thread_{len(self.created)}"
+            self.created.append(thread_id)
+        return SimpleNamespace(id=thread_id)
+
+    def delete(self, thread_id):
+        with self.lock:
+            self.deleted.append(thread_id)
+
+
+class FakeContext:
+    def thread_messages(self, mode):
+        return [{"role": "user", "content": "catalog"}]
+
+
+class FakeCatalog:
+    def __init__(self):
+        self.version = 'v1'
+        self.listeners = []
+
+    def change(self, version):
+        self.version = version
+        for listener in self.listeners:
+            listener(self)
+
+
+def wait_filled(pool):
+    for _ in range(200):
+        with pool._lock:
+            if not pool._filling:
+                return
+        threading.Event().wait(0.01)
+    raise AssertionError("pool never finished filling")
+
+
+def make(size=2):
+    threads = FakeThreads()
+    client = SimpleNamespace(beta=SimpleNamespace(threads=threads))
+    catalog = FakeCatalog()
+    config = {'CHAT_THREAD_POOL_SIZE': size, 'CHAT_CONTEXT_MODE': 'thread'}
+    return make_thread_pool(config, client, FakeContext(), catalog), threads, catalog
+
+
+def test_off_by_default_size():
+    config = {'CHAT_THREAD_POOL_SIZE': 0, 'CHAT_CONTEXT_MODE': 'thread'}
+    assert make_thread_pool(config, None, None, FakeCatalog()) is None
+
+
+def test_nothing_created_until_the_first_take():
+    pool, threads, _ = make()
+    threading.Event().wait(0.05)
+    assert threads.created == []
+
+    assert pool.take() is None
+    wait_filled(pool)
+    assert len(threads.created) == 2
+    assert pool.take()[0] in threads.created
+
+
+def test_catalog_change_deletes_the_old_threads():
+    pool, threads, catalog = make()
+    pool.take()
+    wait_filled(pool)
+    old = list(threads.created)
+
+    catalog.change('v2')
+    wait_filled(pool)
+    assert sorted(threads.deleted) == sorted(old)
+    thread_id, _ = pool.take()
+    assert thread_id not in old
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from app.assistant_runs import async_collect_tool_outputs, collect_tool_outputs
+from app.tools import ToolRegistry
+
+SCHEMAS = {
+    "wait": {
+        "type": "object",
+        "properties": {"seconds": {"type": "number"}},
+        "required": ["seconds"],
+        "additionalProperties": False
+    }
+}
+
+
+def tool_call(call_id, name, arguments):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+
+def registry():
+    registry = ToolRegistry(schemas=SCHEMAS, max_workers=4)
+
+    @registry.tool("wait", timeout=0.2)
+    def wait(args):
+        time.sleep(args["seconds"])
+        return {"thread": threading.current_thread().name}
+
+    return registry
+
+
+def outputs(results):
+    return {result["tool_call_id"]: json.loads(result["output"]) for result in results}
+
+
+def test_batch_runs_on_the_registry_pool_side_by_side():
+    tools = registry()
+    calls = [tool_call(f"call_{i}", "wait", {"seconds": 0.1}) for i in range(3)]
+    started = time.perf_counter()
+    results = outputs(collect_tool_outputs(calls, tools.start))
+    assert time.perf_counter() - started < 0.25
+    assert all(result["thread"].startswith("tool_") for result in results.values())
+
+
+def test_timed_out_and_invalid_calls_get_error_outputs():
+    tools = registry()
+    results = outputs(collect_tool_outputs([
+        tool_call("slow", "wait", {"seconds": 1}),
+        tool_call("bad", "wait", {"seconds": "soon"}),
+        tool_call("missing", "nope", {}),
+    ], tools.start))
+    assert results["slow"] == {"status": "error", "message": "wait timed out after 0.2s"}
+    assert results["bad"]["message"].startswith("Invalid arguments")
+    assert results["missing"]["message"] == "Function failed or not found"
+
+
+def test_async_batch_awaits_the_registry_pool():
+    tools = registry()
+    calls = [tool_call("fast", "wait", {"seconds": 0.05}), tool_call("slow", "wait", {"seconds": 1})]
+    results = outputs(asyncio.run(async_collect_tool_outputs(calls, tools.start)))
+    assert results["fast"]["thread"].startswith("tool_")
+    assert results["slow"]["status"] == "error"